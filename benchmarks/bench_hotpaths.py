@@ -0,0 +1,406 @@
+"""Hot-path benchmark: throughput and latency of the simulation's inner loops.
+
+Every benchmark uses fixed seeds and the chromosome stored in
+best_chromosome.txt, so runs on different commits measure the same work.
+Each run appends one JSON record per benchmark to the results file, tagged
+with the commit it was run on. Usage:
+
+    python benchmarks/bench_hotpaths.py [--quick] [--only NAME ...]
+                                        [--output FILE] [--compare COMMIT]
+"""
+
+import argparse
+import ast
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import tetris
+
+DEFAULT_OUTPUT = os.path.join(ROOT, 'benchmarks', 'results.jsonl')
+
+SEED = 1234
+
+
+def load_best_chromosome(filename=os.path.join(ROOT, 'best_chromosome.txt')):
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.startswith('Best Chromosome:'):
+                return ast.literal_eval(line.split(':', 1)[1].strip())
+    raise ValueError("Best Chromosome not found in file.")
+
+
+def git_commit():
+    """Return the short hash of the checked out commit, with a '+' when the
+    tree has local changes"""
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + '+' if dirty else commit
+
+
+##############################################################################
+#                               WORKLOADS
+##############################################################################
+
+def record_game(chromosome, pieces, seed=SEED):
+    """Play a greedy game and return the (board, piece) pair the search saw
+    before every move"""
+
+    source = tetris.PieceSource(seed)
+    board  = tetris.BoardState()
+    positions = []
+    for _ in range(pieces):
+        piece = source.next_piece()
+        if not board.is_valid_position(piece):
+            break
+        positions.append(([column[:] for column in board.board], piece))
+        move = tetris.find_best_move(board, piece, chromosome)
+        if move is None:
+            break
+        piece['rotation'], piece['x'] = move
+        board.drop_piece(piece)
+        board.add_piece(piece)
+    return positions
+
+
+def candidate_calls(positions):
+    """Return every (board, test piece) the move search rates, in search order"""
+
+    calls = []
+    for board, piece in positions:
+        for r in range(len(tetris.PIECES[piece['shape']])):
+            for x in tetris.PIECE_X_RANGE[piece['shape']][r]:
+                calls.append((board, dict(piece, rotation=r, x=x, y=0)))
+    return calls
+
+
+def boards_with_lines(count, seed=SEED):
+    """Return count random boards with 1 to 4 complete rows each"""
+
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(count):
+        board = tetris.get_blank_board()
+        top = rng.randint(8, tetris.BOARDHEIGHT - 4)
+        for y in range(top, tetris.BOARDHEIGHT):
+            for x in range(tetris.BOARDWIDTH):
+                if rng.random() < 0.7:
+                    board[x][y] = rng.randrange(6)
+        for y in rng.sample(range(top, tetris.BOARDHEIGHT), rng.randint(1, 4)):
+            for x in range(tetris.BOARDWIDTH):
+                board[x][y] = 0
+        boards.append(board)
+    return boards
+
+
+##############################################################################
+#                               BENCHMARKS
+##############################################################################
+
+def time_batches(function, batch, repeats):
+    """Call function(batch) repeats times and return the elapsed seconds of
+    each call"""
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(batch)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def call_stats(times, calls):
+    """Throughput and per-call latency of batches of calls"""
+
+    per_call = sorted(elapsed / calls * 1e9 for elapsed in times)
+    return {
+        'calls': calls,
+        'repeats': len(times),
+        'ops_per_s': calls / min(times),
+        'latency_ns_median': statistics.median(per_call),
+        'latency_ns_min': per_call[0],
+        'latency_ns_p95': per_call[min(len(per_call) - 1, int(len(per_call) * 0.95))],
+    }
+
+
+def bench_is_valid_position(context, repeats):
+    calls = context['calls']
+
+    def run(batch):
+        is_valid_position = tetris.is_valid_position
+        for board, piece in batch:
+            is_valid_position(board, piece, adj_Y=1)
+
+    return call_stats(time_batches(run, calls, repeats), len(calls))
+
+
+def bench_rate_move(context, repeats):
+    calls = context['calls']
+    chromosome = context['chromosome']
+
+    def run(batch):
+        rate_move = tetris.rate_move
+        for board, piece in batch:
+            rate_move(board, piece, chromosome)
+
+    return call_stats(time_batches(run, calls, repeats), len(calls))
+
+
+def bench_remove_complete_lines(context, repeats):
+    boards = context['line_boards']
+    times  = []
+    for _ in range(repeats):
+        # remove_complete_lines works in place, time it on fresh copies
+        batch = [[column[:] for column in board] for board in boards]
+        start = time.perf_counter()
+        for board in batch:
+            tetris.remove_complete_lines(board)
+        times.append(time.perf_counter() - start)
+    return call_stats(times, len(boards))
+
+
+def count_pieces_played(chromosome, iterations, sequence, engine, lookahead):
+    """Replay the game untimed and return the number of pieces it played, the
+    game can end before iterations pieces"""
+
+    consumed = []
+
+    def counted():
+        for code in sequence:
+            consumed.append(code)
+            yield code
+
+    tetris.run_tetris_simulation(chromosome, iterations, engine=engine, pieces=counted(),
+                                 lookahead=lookahead)
+    # The current and the next piece are drawn before the first move
+    return len(consumed) - 2
+
+
+def bench_simulation(context, repeats, engine='list', lookahead=False):
+    chromosome = context['chromosome']
+    sequence   = context['sequence']
+    iterations = context['iterations']
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        score = tetris.run_tetris_simulation(chromosome, iterations, engine=engine, pieces=sequence,
+                                             lookahead=lookahead)
+        times.append(time.perf_counter() - start)
+
+    pieces_played = count_pieces_played(chromosome, iterations, sequence, engine, lookahead)
+    return {
+        'pieces': pieces_played,
+        'score': score,
+        'repeats': repeats,
+        'pieces_per_s': pieces_played / min(times),
+        'seconds_median': statistics.median(times),
+        'seconds_min': min(times),
+    }
+
+
+def bench_genetic_algorithm(context, repeats, engine='list', racing=None):
+    generations = context['generations']
+    times = []
+    for _ in range(repeats):
+        random.seed(SEED)
+        # train_genetic_algorithm writes best_chromosome.txt and prints every
+        # generation, keep both out of the way
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                start = time.perf_counter()
+                tetris.train_genetic_algorithm(iterations=context['ga_iterations'], population_size=8,
+                                               generations=generations, eval_runs=2, engine=engine,
+                                               racing=racing)
+                times.append(time.perf_counter() - start)
+            finally:
+                os.chdir(cwd)
+
+    return {
+        'generations': generations,
+        'repeats': repeats,
+        'seconds_per_generation': min(times) / generations,
+        'seconds_per_generation_median': statistics.median(times) / generations,
+    }
+
+
+def bench_time_to_target(context, repeats, optimizer='ga'):
+    """Time the training until the best chromosome of a generation reaches the
+    target score, confirmed on held-out games, on repeats runs seeded
+    differently. A run missing the target counts with the time of all its
+    generations, and the held-out games count with the training games."""
+
+    target = context['target_score']
+    runs = []
+    for run in range(repeats):
+        random.seed(SEED + run)
+        with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+            cwd = os.getcwd()
+            os.chdir(directory)
+            try:
+                start = time.perf_counter()
+                tetris.train_genetic_algorithm(iterations=context['target_iterations'], population_size=15,
+                                               generations=context['target_generations'], eval_runs=3,
+                                               metrics='metrics.jsonl', optimizer=optimizer, target=target)
+                seconds = time.perf_counter() - start
+                summary = tetris.summarize_metrics('metrics.jsonl')[0]
+                checks  = list(tetris.read_metrics('metrics.jsonl', 'target'))
+            finally:
+                os.chdir(cwd)
+        runs.append((seconds, summary['generations'], summary['games'] + sum(check['games'] for check in checks),
+                     any(check['reached'] for check in checks)))
+
+    return {
+        'target': target,
+        'iterations': context['target_iterations'],
+        'repeats': repeats,
+        'reached': sum(reached for *_, reached in runs),
+        'seconds_to_target': statistics.median(seconds for seconds, *_ in runs),
+        'generations_to_target': statistics.median(generations for _, generations, _, _ in runs),
+        'games_to_target': statistics.median(games for _, _, games, _ in runs),
+    }
+
+
+# Benchmark name -> (function, keyword arguments)
+BENCHMARKS = {
+    'is_valid_position':         (bench_is_valid_position, {}),
+    'rate_move':                 (bench_rate_move, {}),
+    'remove_complete_lines':     (bench_remove_complete_lines, {}),
+    'simulation_list':           (bench_simulation, {'engine': 'list'}),
+    'simulation_bitboard':       (bench_simulation, {'engine': 'bitboard'}),
+    'simulation_numpy':          (bench_simulation, {'engine': 'numpy'}),
+    'simulation_cached':         (bench_simulation, {'engine': 'cached'}),
+    'simulation_lookahead':      (bench_simulation, {'engine': 'list', 'lookahead': True}),
+    'train_genetic_algorithm':   (bench_genetic_algorithm, {}),
+    'train_genetic_lockstep':    (bench_genetic_algorithm, {'engine': 'lockstep'}),
+    'train_genetic_racing':      (bench_genetic_algorithm, {'racing': True}),
+    'target_ga':                 (bench_time_to_target, {}),
+    'target_ga_array':           (bench_time_to_target, {'optimizer': 'ga-array'}),
+    'target_cem':                (bench_time_to_target, {'optimizer': 'cem'}),
+    'target_cmaes':              (bench_time_to_target, {'optimizer': 'cmaes'}),
+}
+
+
+def build_context(quick):
+    chromosome = load_best_chromosome()
+    iterations = 100 if quick else 500
+    positions  = record_game(chromosome, 60 if quick else 200)
+    return {
+        'chromosome': chromosome,
+        'iterations': iterations,
+        'sequence': tetris.generate_piece_sequence(SEED, iterations + 2),
+        'calls': candidate_calls(positions),
+        'line_boards': boards_with_lines(200 if quick else 1000),
+        'generations': 1 if quick else 2,
+        'ga_iterations': 50 if quick else 150,
+        'target_iterations': 200 if quick else 500,
+        'target_score': 3500 if quick else 6000,
+        'target_generations': 10 if quick else 20,
+    }
+
+
+##############################################################################
+#                               RESULTS
+##############################################################################
+
+def load_results(filename):
+    if not os.path.exists(filename):
+        return []
+    with open(filename, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main_metric(record):
+    """Return the (name, value, higher is better) of the metric compared
+    across commits"""
+
+    for key, higher in (('ops_per_s', True), ('pieces_per_s', True), ('seconds_per_generation', False),
+                        ('seconds_to_target', False)):
+        if key in record:
+            return key, record[key], higher
+    return None
+
+
+def compare(records, baseline_records):
+    """Print the change of every benchmark against the newest baseline record"""
+
+    baseline = {}
+    for record in baseline_records:
+        baseline[(record['benchmark'], record['quick'])] = record
+
+    print(f"\n{'benchmark':<26} {'metric':<24} {'baseline':>12} {'now':>12} {'speedup':>8}")
+    for record in records:
+        old = baseline.get((record['benchmark'], record['quick']))
+        if old is None:
+            continue
+        key, value, higher = main_metric(record)
+        old_value = old[key]
+        speedup = value / old_value if higher else old_value / value
+        print(f"{record['benchmark']:<26} {key:<24} {old_value:>12.4g} {value:>12.4g} {speedup:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--quick', action='store_true', help='smaller workloads, for a fast check')
+    parser.add_argument('--repeats', type=int, default=5, help='timed repeats per benchmark')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON lines file the results are appended to')
+    parser.add_argument('--no-save', action='store_true', help="don't write the results")
+    parser.add_argument('--compare', metavar='COMMIT', help='compare with the results of a commit in the output file')
+    args = parser.parse_args(argv)
+
+    context = build_context(args.quick)
+    commit  = git_commit()
+    stamp   = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+    records = []
+    for name in args.only or BENCHMARKS:
+        function, kwargs = BENCHMARKS[name]
+        try:
+            result = function(context, args.repeats, **kwargs)
+        except ImportError as error:
+            print(f"{name:<26} skipped: {error}")
+            continue
+        record = dict(benchmark=name, commit=commit, timestamp=stamp, quick=args.quick,
+                      python=platform.python_version(), **result)
+        records.append(record)
+
+        key, value, _ = main_metric(record)
+        print(f"{name:<26} {key:<24} {value:>12.4g}")
+
+    if not args.no_save:
+        with open(args.output, 'a') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+        print(f"\nResults appended to {args.output}")
+
+    if args.compare:
+        baseline = [record for record in load_results(args.output)
+                    if record['commit'].rstrip('+').startswith(args.compare) and record['timestamp'] != stamp]
+        if not baseline:
+            print(f"\nNo results for commit {args.compare} in {args.output}")
+        else:
+            compare(records, baseline)
+
+
+if __name__ == '__main__':
+    main()
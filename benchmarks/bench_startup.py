@@ -0,0 +1,61 @@
+"""Startup-time benchmark: cost of importing the headless package vs the UI.
+
+Every import is timed in a fresh interpreter, so nothing is cached between
+runs. Usage:
+
+    python benchmarks/bench_startup.py [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module imported in a fresh interpreter -> description
+TARGETS = [('tetris',      'headless package'),
+           ('tetris_game', 'game module, pygame not loaded'),
+           ('pygame',      'pygame alone')]
+
+SNIPPET = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, 'pygame' in sys.modules)
+'''
+
+
+def time_import(module):
+    """Return the import time of module in a fresh interpreter and whether
+    pygame ended up loaded"""
+
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    output = subprocess.run([sys.executable, '-c', SNIPPET.format(module=module)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout.split()
+
+    return float(output[0]), output[1] == 'True'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters per module')
+    args = parser.parse_args(argv)
+
+    print(f"{'module':<12} {'median ms':>10} {'min ms':>8}  pygame loaded")
+    for module, description in TARGETS:
+        try:
+            results = [time_import(module) for _ in range(args.runs)]
+        except subprocess.CalledProcessError:
+            print(f"{module:<12} {'not importable':>20}")
+            continue
+
+        times = [elapsed * 1000 for elapsed, _ in results]
+        print(f"{module:<12} {statistics.median(times):>10.1f} {min(times):>8.1f}  "
+              f"{str(results[0][1]):<6} ({description})")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,35 @@
-import tetris_game
-import ast
+"""Final test of the best chromosome on many seeded games.
+
+A thin wrapper around tetris.evaluate: the chromosome of best_chromosome.txt
+plays the 600 piece games of seeds 0 to 99, the result of every game goes to
+final_test_games.csv and the summary to final_test_score.txt. Run
+`python -m tetris evaluate --help` for more games, seeds or chromosomes.
+"""
+
+import tetris
+from tetris.evaluate import load_chromosomes
+
 
 def load_best_chromosome(filename='best_chromosome.txt'):
-    with open(filename, 'r') as f:
-        for line in f:
-            if line.startswith('Best Chromosome:'):
-                # Extract the list part and safely evaluate it
-                chromo_str = line.split(':', 1)[1].strip()
-                chromosome = ast.literal_eval(chromo_str)
-                return chromosome
-    raise ValueError("Best Chromosome not found in file.")
-
-# Example usage:
-best_chromosome = load_best_chromosome()
-print("Extracted chromosome:", best_chromosome)
-
-final_score = tetris_game.run_tetris_simulation(best_chromosome, iterations=600)
-
-with open('final_test_score.txt', 'w') as f:
-    f.write(f"Best Chromosome: {best_chromosome}\n")
-    f.write(f"Final Score (600 iterations): {final_score}\n")
-
-print("Final test complete. Results saved to final_test_score.txt")
-print(f"Final Score (600 iterations): {final_score}\n")
\ No newline at end of file
+    return load_chromosomes(filename)[0]
+
+
+if __name__ == '__main__':
+    best_chromosome = load_best_chromosome()
+    print("Extracted chromosome:", best_chromosome)
+
+    seeds   = range(100)
+    summary = tetris.evaluate_chromosomes([best_chromosome], seeds, iterations=600,
+                                          output='final_test_games.csv', progress=True)[0]
+
+    with open('final_test_score.txt', 'w') as f:
+        f.write(f"Best Chromosome: {best_chromosome}\n")
+        f.write(f"Games: {summary['games']} (seeds {seeds.start} to {seeds.stop - 1}, 600 iterations)\n")
+        f.write(f"Mean Score: {summary['mean']:.1f} (95% CI {summary['mean_ci'][0]:.1f} - "
+                f"{summary['mean_ci'][1]:.1f})\n")
+        f.write(f"Median Score: {summary['median']} (95% CI {summary['median_ci'][0]} - "
+                f"{summary['median_ci'][1]})\n")
+        f.write(f"Score Percentiles: 5% {summary['p5']:.1f}, 95% {summary['p95']:.1f}\n")
+
+    print("Final test complete. Results saved to final_test_score.txt and final_test_games.csv")
+    print(f"Mean Score (600 iterations): {summary['mean']:.1f}\n")
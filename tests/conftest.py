@@ -0,0 +1,44 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The tests import the tetris package from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tetris
+
+
+def play_random_board(rng, pieces):
+    """Return the board left by dropping up to pieces random pieces at random
+    columns, clearing lines like a game does"""
+
+    board = tetris.get_blank_board()
+    for _ in range(pieces):
+        piece = tetris.get_new_piece(rng)
+        piece['x'] = rng.choice(tetris.PIECE_X_RANGE[piece['shape']][piece['rotation']])
+        piece['y'] = 0
+        if not tetris.is_valid_position(board, piece):
+            break
+        tetris.drop_piece_stepwise(board, piece)
+        tetris.add_to_board(board, piece)
+        tetris.remove_complete_lines(board)
+    return board
+
+
+@pytest.fixture(scope='session')
+def boards():
+    """Boards a game can reach, from empty to nearly topped out, with holes and
+    overhangs"""
+
+    rng = random.Random(2024)
+    return [play_random_board(rng, rng.randrange(60)) for _ in range(150)]
+
+
+@pytest.fixture(scope='session')
+def chromosomes():
+    rng = random.Random(7)
+    return [[rng.uniform(-5, 5) for _ in range(5)] for _ in range(4)] + \
+           [[0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144,
+             -1.7681253322204626]]
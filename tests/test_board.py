@@ -0,0 +1,108 @@
+import copy
+
+import pytest
+
+import tetris
+from tetris.bitboard import bb_add_to_board, bb_apply_piece, bb_remove_complete_lines, bb_undo_piece
+
+
+def dropped_pieces(board):
+    """Yield every piece that fits at the top of the board, dropped to where it
+    lands"""
+
+    for shape in tetris.SHAPES:
+        for rotation in range(len(tetris.PIECES[shape])):
+            for x in tetris.PIECE_X_RANGE[shape][rotation]:
+                piece = tetris.make_piece(shape, rotation, 3) | {'x': x, 'y': 0}
+                if tetris.is_valid_position(board, piece):
+                    tetris.drop_piece_stepwise(board, piece)
+                    yield piece
+
+
+def to_bitboard(board):
+    return [sum(1 << x for x in range(tetris.BOARDWIDTH) if board[x][y] != tetris.BLANK)
+            for y in range(tetris.BOARDHEIGHT)]
+
+
+def state_of(state):
+    """Return a copy of the attributes of an engine state, arrays as lists"""
+
+    return {name: value.tolist() if hasattr(value, 'tolist') else copy.deepcopy(value)
+            for name, value in vars(state).items() if name != 'cache'}
+
+
+def test_apply_piece_matches_add_and_remove(boards):
+    for board in boards:
+        for piece in dropped_pieces(board):
+            expected = copy.deepcopy(board)
+            tetris.add_to_board(expected, piece)
+            lines = tetris.remove_complete_lines(expected)
+
+            played = copy.deepcopy(board)
+            record = tetris.apply_piece(played, piece)
+            assert played == expected
+            assert len(record[1]) == lines
+
+
+def test_undo_piece_restores_the_board(boards):
+    for board in boards:
+        before = copy.deepcopy(board)
+        for piece in dropped_pieces(board):
+            record = tetris.apply_piece(board, piece)
+            tetris.undo_piece(board, record)
+            assert board == before
+
+
+def test_bitboard_apply_and_undo(boards):
+    for board in boards:
+        bitboard = to_bitboard(board)
+        before   = bitboard[:]
+        for piece in dropped_pieces(board):
+            expected = bitboard[:]
+            bb_add_to_board(expected, piece)
+            lines = bb_remove_complete_lines(expected)
+
+            record = bb_apply_piece(bitboard, piece)
+            assert bitboard == expected
+            assert len(record[1]) == lines
+            bb_undo_piece(bitboard, record)
+            assert bitboard == before
+
+
+@pytest.mark.parametrize('engine', ['list', 'bitboard', 'numpy', 'cached'])
+def test_engine_apply_and_undo(engine, boards):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    for board in boards[::5]:
+        if engine == 'bitboard':
+            make = lambda: tetris.BitBoardState(to_bitboard(board))
+        else:
+            make = lambda: tetris.SIMULATION_ENGINES[engine](copy.deepcopy(board))
+        state  = make()
+        before = state_of(state)
+        for piece in dropped_pieces(copy.deepcopy(board)):
+            lines, undo = state.apply_piece(dict(piece))
+
+            expected = make()
+            assert lines == expected.add_piece(dict(piece))
+            assert state_of(state) == state_of(expected)
+
+            state.undo_piece(undo)
+            assert state_of(state) == before
+
+
+def test_drop_piece_matches_drop_piece_stepwise(boards):
+    for board in boards:
+        heights = tetris.get_column_heights(board)
+        assert heights == [tetris.column_height(board, x) for x in range(tetris.BOARDWIDTH)]
+        for shape in tetris.SHAPES:
+            for rotation in range(len(tetris.PIECES[shape])):
+                for x in tetris.PIECE_X_RANGE[shape][rotation]:
+                    for y in (-2, 0):
+                        piece = tetris.make_piece(shape, rotation, 3) | {'x': x, 'y': y}
+                        if not tetris.is_valid_position(board, piece):
+                            continue
+                        stepwise = dict(piece)
+                        tetris.drop_piece_stepwise(board, stepwise)
+                        tetris.drop_piece(board, piece, heights)
+                        assert piece['y'] == stepwise['y'], (shape, rotation, x, y)
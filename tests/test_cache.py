@@ -0,0 +1,62 @@
+import copy
+
+import tetris
+
+
+def small_cache(entries):
+    return tetris.FeatureCache(entries * tetris.FeatureCache.ENTRY_BYTES)
+
+
+def test_lru_eviction():
+    cache = small_cache(3)
+    assert cache.max_entries == 3
+    for key in 'abc':
+        cache.put(key, key.upper())
+    # Reading a makes b the least recently used entry
+    assert cache.get('a') == 'A'
+    cache.put('d', 'D')
+    assert len(cache) == 3
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['A', 'C', 'D']
+    cache.put('e', 'E')
+    assert cache.get('a') is None and cache.get('e') == 'E'
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (5, 2, 2, 3)
+    assert stats['hit_rate'] == 5 / 7
+    assert stats['bytes'] == 3 * tetris.FeatureCache.ENTRY_BYTES
+
+
+def test_clear_resets_the_counters():
+    cache = small_cache(1)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.get('b')
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()['hits'] == cache.stats()['misses'] == cache.stats()['evictions'] == 0
+    assert cache.stats()['hit_rate'] == 0.0
+
+
+def test_cached_state_counts_hits_and_keeps_the_features(boards):
+    cache = small_cache(50)
+    for board in boards[:20]:
+        state, reference = tetris.CachedBoardState(copy.deepcopy(board), cache), tetris.BoardState(board)
+        piece = tetris.make_piece('T', 0, 1)
+        for rotation in range(4):
+            for x in tetris.PIECE_X_RANGE['T'][rotation]:
+                candidate = dict(piece, rotation=rotation, x=x)
+                first, again = state.evaluate_move(dict(candidate)), state.evaluate_move(dict(candidate))
+                assert first == again == reference.evaluate_move(dict(candidate))
+    stats = cache.stats()
+    assert stats['hits'] > 0 and stats['misses'] > 0 and stats['evictions'] > 0
+    assert stats['entries'] <= 50
+
+
+def test_board_hash_ignores_colors():
+    board = tetris.get_blank_board()
+    board[3][20] = 1
+    recolored = copy.deepcopy(board)
+    recolored[3][20] = 4
+    assert tetris.board_hash(board) == tetris.board_hash(recolored) != tetris.board_hash(tetris.get_blank_board())
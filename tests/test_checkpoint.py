@@ -0,0 +1,90 @@
+import random
+import struct
+
+import pytest
+
+import tetris
+from tetris.checkpoint import VERSION, pack_checkpoint, unpack_checkpoint
+
+
+def make_state(**changes):
+    random.seed(3)
+    state = {'generation':      0,
+             'generations':     10,
+             'iterations':      500,
+             'eval_runs':       2,
+             'engine':          'list',
+             'fitness':         'mean',
+             'racing':          None,
+             'bag':             False,
+             'population':      tetris.init_population(6, 5),
+             'ranking':         [],
+             'best_score':      -1,
+             'best_chromosome': None,
+             'random_state':    random.getstate()}
+    state.update(changes)
+    return state
+
+
+def test_round_trip_initial_state():
+    state = make_state()
+    assert unpack_checkpoint(pack_checkpoint(state)) == state
+
+
+def test_round_trip_after_a_generation():
+    population = tetris.init_population(6, 5)
+    ranking    = [(1500.5, population[0], [1200, 1801]), (900, population[1], [900, 900])]
+    state = make_state(generation=1, ranking=ranking, best_score=1500.5, best_chromosome=population[0],
+                       racing=[(0.1, 0.5), (0.5, 0.75)])
+    assert unpack_checkpoint(pack_checkpoint(state)) == state
+
+
+def test_round_trip_without_best_score():
+    state = make_state(best_score=None)
+    assert unpack_checkpoint(pack_checkpoint(state)) == state
+
+
+def test_best_chromosome_length_is_checked():
+    with pytest.raises(ValueError):
+        pack_checkpoint(make_state(best_score=10, best_chromosome=[1.0, 2.0]))
+
+
+def test_other_versions_are_rejected():
+    data = bytearray(pack_checkpoint(make_state()))
+    struct.pack_into('<H', data, 4, VERSION + 1)
+    with pytest.raises(ValueError):
+        unpack_checkpoint(bytes(data))
+
+
+def test_training_checkpoint_loads(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    random.seed(5)
+    tetris.train_genetic_algorithm(iterations=30, population_size=6, generations=1, eval_runs=1,
+                                   checkpoint='run.ck')
+    state = tetris.load_checkpoint('run.ck')
+    assert state['generation'] == 1
+    assert unpack_checkpoint(pack_checkpoint(state)) == state
+
+
+def best_scores(output):
+    return [line for line in output.splitlines() if 'Best Score' in line]
+
+
+def test_resumed_run_continues_exactly(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    settings = {'iterations': 60, 'population_size': 6, 'eval_runs': 2}
+
+    random.seed(8)
+    straight = tetris.train_genetic_algorithm(generations=4, checkpoint='straight.ck', **settings)
+    straight_scores = best_scores(capsys.readouterr().out)
+
+    random.seed(8)
+    tetris.train_genetic_algorithm(generations=2, checkpoint='resumed.ck', **settings)
+    random.seed(99)
+    resumed = tetris.resume_genetic_algorithm('resumed.ck', generations=4)
+    resumed_scores = best_scores(capsys.readouterr().out)
+
+    assert len(straight_scores) == 4
+    assert resumed == straight
+    assert resumed_scores == straight_scores
+    assert tetris.load_checkpoint('resumed.ck') == tetris.load_checkpoint('straight.ck')
@@ -0,0 +1,166 @@
+"""The engines must give exactly the features and scores of the list board"""
+
+import copy
+import random
+
+import pytest
+
+import tetris
+from tetris.simulation import rate_placements
+
+BEST = [0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144, -1.7681253322204626]
+
+
+def candidates(shape):
+    for rotation in range(len(tetris.PIECES[shape])):
+        for x in tetris.PIECE_X_RANGE[shape][rotation]:
+            yield tetris.make_piece(shape, rotation, 1) | {'x': x, 'y': 0}
+
+
+def to_bitboard(board):
+    return [sum(1 << x for x in range(tetris.BOARDWIDTH) if board[x][y] != tetris.BLANK)
+            for y in range(tetris.BOARDHEIGHT)]
+
+
+def move_features(board, piece):
+    """Features of calc_move_info, in the order of evaluate_move"""
+
+    info = tetris.calc_move_info(board, piece, piece['x'], piece['rotation'], *tetris.calc_initial_move_info(board))
+    if not info[0]:
+        return None
+    return info[2], info[1], info[3], info[4], info[5]
+
+
+def test_board_state_features_match_calc_move_info(boards):
+    for board in boards:
+        state = tetris.BoardState(copy.deepcopy(board))
+        for shape in tetris.SHAPES:
+            for piece in candidates(shape):
+                assert state.evaluate_move(dict(piece)) == move_features(board, dict(piece))
+
+
+@pytest.mark.parametrize('engine', ['bitboard', 'cached'])
+def test_engine_features_match_list(engine, boards):
+    for board in boards:
+        if engine == 'bitboard':
+            state = tetris.BitBoardState(to_bitboard(board))
+        else:
+            state = tetris.CachedBoardState(copy.deepcopy(board), tetris.FeatureCache())
+        reference = tetris.BoardState(copy.deepcopy(board))
+        for shape in tetris.SHAPES:
+            for piece in candidates(shape):
+                assert state.evaluate_move(dict(piece)) == reference.evaluate_move(dict(piece))
+
+
+def test_batch_features_match_rate_move(boards, chromosomes):
+    pytest.importorskip('numpy')
+    from tetris.batch import board_to_array, calc_heuristics_batch, evaluate_placements
+
+    for board in boards:
+        filled = board_to_array(board)
+        holes, blocking, _, _ = calc_heuristics_batch(filled[None])
+        for shape in tetris.SHAPES:
+            moves, valid, _, features = evaluate_placements(filled, shape, holes[0], blocking[0])
+            for (rotation, x), fits, row in zip(moves, valid.tolist(), features.tolist()):
+                piece = tetris.make_piece(shape, rotation, 1) | {'x': x}
+                expected = move_features(board, piece)
+                assert fits == (expected is not None)
+                if fits:
+                    assert tuple(row) == expected
+
+            piece = tetris.make_piece(shape, 0, 1)
+            for chromosome in chromosomes:
+                moves, scores = tetris.rate_moves_batch(board, piece, chromosome)
+                for (rotation, x), score in zip(moves, scores.tolist()):
+                    candidate = dict(piece, rotation=rotation, x=x)
+                    assert score == tetris.rate_move(copy.deepcopy(board), candidate, chromosome)
+
+
+def test_batch_placements_match_list(boards, chromosomes):
+    pytest.importorskip('numpy')
+    for board in boards:
+        batch, state = tetris.BatchBoardState(copy.deepcopy(board)), tetris.BoardState(copy.deepcopy(board))
+        for shape in tetris.SHAPES:
+            piece = tetris.make_piece(shape, 0, 1)
+            for chromosome in chromosomes:
+                assert batch.rate_placements(piece, chromosome) == rate_placements(state, piece, chromosome)
+
+
+@pytest.mark.parametrize('engine', ['bitboard', 'numpy', 'cached'])
+@pytest.mark.parametrize('lookahead', [False, True])
+def test_engine_scores_match_list(engine, lookahead):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    for seed in range(4):
+        iterations = 60 if lookahead else 200
+        expected = tetris.run_tetris_game(BEST, iterations, 'list', seed=seed, lookahead=lookahead)
+        game     = tetris.run_tetris_game(BEST, iterations, engine, seed=seed, lookahead=lookahead)
+        assert (game['score'], game['pieces'], game['lines']) == \
+               (expected['score'], expected['pieces'], expected['lines'])
+
+
+def test_lockstep_matches_per_game_scores(chromosomes):
+    pytest.importorskip('numpy')
+    rng = random.Random(11)
+    # Weights that top out quickly, so some games end before the others
+    population = chromosomes + [[rng.uniform(-1, 1) for _ in range(5)] for _ in range(4)]
+    for seed in range(3):
+        sequence = tetris.generate_piece_sequence(seed, 152)
+        scores = tetris.simulate_population(population, 150, sequence)
+        assert list(scores) == [tetris.run_tetris_simulation(chromosome, 150, pieces=sequence)
+                                for chromosome in population]
+
+
+def topped_out_board():
+    """Row 1 full but column 5, and a lone cell of column 4 on it: an O piece
+    at x 3 then locks at its spawn row on top of that cell and fills row 1"""
+
+    board = tetris.get_blank_board()
+    for x in range(tetris.BOARDWIDTH):
+        if x != 5:
+            board[x][1] = 3
+    return board
+
+
+@pytest.mark.parametrize('engine', sorted(tetris.SIMULATION_ENGINES))
+def test_piece_locked_over_filled_cells_clears_lines(engine):
+    if engine == 'numpy':
+        pytest.importorskip('numpy')
+    piece = tetris.make_piece('O', 0, 2) | {'x': 3, 'y': -2}
+
+    expected = topped_out_board()
+    tetris.add_to_board(expected, piece)
+    lines = tetris.remove_complete_lines(expected)
+    assert lines == 1
+
+    if engine == 'bitboard':
+        state = tetris.BitBoardState(to_bitboard(topped_out_board()))
+    else:
+        state = tetris.SIMULATION_ENGINES[engine](topped_out_board())
+    played = dict(piece)
+    state.drop_piece(played)
+    assert played['y'] == -2
+    applied = state.copy()
+    assert state.add_piece(dict(played)) == lines
+    assert applied.apply_piece(dict(played))[0] == lines
+    if engine != 'bitboard':
+        assert state.board == applied.board == expected
+        assert state.row_counts == tetris.BoardState(expected).row_counts
+
+
+def test_batch_rating_matches_rate_features(chromosomes):
+    np = pytest.importorskip('numpy')
+    from tetris.batch import rate_features_batch
+
+    rng = random.Random(13)
+    features = np.array([[rng.randrange(5), rng.randrange(250), rng.randrange(-6, 12), rng.randrange(60),
+                          rng.randrange(-8, 20)] for _ in range(300)])
+    for chromosome in chromosomes:
+        assert rate_features_batch(features, chromosome).tolist() == \
+               [tetris.rate_features(row, chromosome) for row in features.tolist()]
+
+    # One chromosome per game, as simulate_population rates its games
+    games   = features.reshape(len(chromosomes), -1, 5)
+    ratings = rate_features_batch(games, np.array(chromosomes).T[:, :, None])
+    assert ratings.tolist() == [[tetris.rate_features(row, chromosome) for row in game.tolist()]
+                                for chromosome, game in zip(chromosomes, games)]
@@ -0,0 +1,53 @@
+import argparse
+import statistics
+
+import pytest
+
+from tetris.evaluate import parse_seeds, summarize_scores
+
+
+def test_parse_seeds():
+    assert parse_seeds('3:7') == [3, 4, 5, 6]
+    assert parse_seeds('9,2,5') == [9, 2, 5]
+    assert parse_seeds('-2:1') == [-2, -1, 0]
+
+
+@pytest.mark.parametrize('text', ['5:5', '7:3', '1,1', '0,4,0'])
+def test_parse_seeds_rejects_empty_and_duplicate_seeds(text):
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_seeds(text)
+
+
+def test_cli_reports_bad_seeds(capsys):
+    from tetris.evaluate import main
+
+    with pytest.raises(SystemExit):
+        main(['[1, 2, 3, 4, 5]', '--seeds', '5:5'])
+    assert 'no seed in 5:5' in capsys.readouterr().err
+
+
+def test_summarize_scores():
+    scores  = [120, 40, 0, 300, 1200, 40, 80, 160, 40, 600]
+    summary = summarize_scores(scores)
+    assert summary['games'] == 10
+    assert summary['mean'] == statistics.fmean(scores)
+    assert summary['median'] == 100
+    assert (summary['min'], summary['max']) == (0, 1200)
+    assert summary['stdev'] == statistics.stdev(scores)
+    assert summary['p5'] <= summary['p25'] <= summary['median'] <= summary['p75'] <= summary['p95']
+    low, high = summary['mean_ci']
+    assert low < summary['mean'] < high
+    low, high = summary['median_ci']
+    assert low <= summary['median'] <= high and low in scores and high in scores
+
+
+def test_summarize_single_score():
+    summary = summarize_scores([500])
+    assert summary['stdev'] == summary['stderr'] == 0.0
+    assert summary['mean_ci'] == (500, 500) and summary['median_ci'] == (500, 500)
+    assert summary['p5'] == summary['p95'] == 500
+
+
+def test_summarize_no_scores():
+    with pytest.raises(ValueError):
+        summarize_scores([])
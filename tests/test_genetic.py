@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import random
+import statistics
+import threading
+
+import pytest
+
+import tetris
+
+
+def test_training_writes_the_best_chromosome_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    best = tetris.train_genetic_algorithm(iterations=30, population_size=6, generations=2, eval_runs=2)
+    assert tetris.load_chromosomes('best_chromosome.txt') == [best]
+    assert os.listdir(tmp_path) == ['best_chromosome.txt']
+
+
+def test_failed_pool_setup_releases_the_shared_memory(tmp_path, monkeypatch):
+    from multiprocessing import shared_memory
+    from tetris import genetic
+
+    created = []
+
+    class RecordedEvaluation(tetris.SharedEvaluation):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self.spec[3])
+
+    def failing_pool(*args, **kwargs):
+        raise OSError("no pool")
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(genetic, 'SharedEvaluation', RecordedEvaluation)
+    monkeypatch.setattr(genetic.multiprocessing, 'Pool', failing_pool)
+    with pytest.raises(OSError):
+        tetris.train_genetic_algorithm(iterations=30, population_size=6, generations=1, eval_runs=1, workers=2,
+                                       checkpoint='run.ck')
+    assert len(created) == 1
+    for name in created[0]:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name)
+    assert not any(thread.name == 'checkpoint-writer' for thread in threading.enumerate())
+
+
+BEST = [0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144, -1.7681253322204626]
+# Weights only avoiding height and holes, scoring well below BEST
+WEAK = [0.0, -1.0, -0.3, 0.0, 0.0]
+
+
+def racing_population():
+    rng = random.Random(21)
+    good = [[gene + rng.uniform(-0.1, 0.1) for gene in BEST] for _ in range(4)]
+    bad  = [[gene + rng.uniform(-0.1, 0.1) for gene in WEAK] for _ in range(4)]
+    return [chrom for pair in zip(good, bad) for chrom in pair]
+
+
+def test_racing_drops_the_worse_chromosomes():
+    population = racing_population()
+    sequences  = [tetris.generate_piece_sequence(seed, 402) for seed in range(3)]
+    games = tetris.race_population(population, 400, sequences, statistics.mean, ((0.25, 0.5),), min_keep=2,
+                                   details=True)
+    full  = tetris.evaluate_population(population, 400, sequences, details=True)
+
+    for index, (raced, played) in enumerate(zip(games, full)):
+        if index % 2 == 0:
+            # The good chromosomes play their whole games
+            assert [(game['score'], game['pieces']) for game in raced] == \
+                   [(game['score'], game['pieces']) for game in played]
+        else:
+            # The weak ones stop after the round, though their games go on
+            assert all(game['pieces'] <= 100 for game in raced)
+            assert any(game['pieces'] > 100 for game in played)
+
+
+def test_racing_is_the_same_on_workers():
+    population = racing_population()
+    sequences  = [tetris.generate_piece_sequence(seed, 202) for seed in range(2)]
+    alone = tetris.race_population(population, 200, sequences, statistics.mean, min_keep=2)
+    with multiprocessing.Pool(2) as pool:
+        assert tetris.race_population(population, 200, sequences, statistics.mean, min_keep=2, pool=pool) == alone
+
+
+def train_on_workers(capsys, **settings):
+    """Return the best chromosome and the best scores of the same training
+    run in this process and on 2 workers"""
+
+    results = []
+    for workers in (1, 2):
+        random.seed(17)
+        best = tetris.train_genetic_algorithm(iterations=80, population_size=8, generations=2, eval_runs=2,
+                                              workers=workers, **settings)
+        results.append((best, [line for line in capsys.readouterr().out.splitlines() if 'Best Score' in line]))
+    return results
+
+
+def test_racing_training_is_the_same_on_workers(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    alone, workers = train_on_workers(capsys, racing=True)
+    assert alone == workers
+
+
+@pytest.mark.parametrize('engine', ['list', 'lockstep'])
+def test_training_is_the_same_on_workers(engine, tmp_path, monkeypatch, capsys):
+    if engine == 'lockstep':
+        pytest.importorskip('numpy')
+    monkeypatch.chdir(tmp_path)
+    alone, workers = train_on_workers(capsys, engine=engine)
+    assert alone == workers
+
+
+def test_population_scores_are_the_same_on_workers():
+    population = racing_population()
+    sequences  = [tetris.generate_piece_sequence(seed, 122) for seed in range(3)]
+    alone = tetris.evaluate_population(population, 120, sequences)
+    with multiprocessing.Pool(2) as pool:
+        assert tetris.evaluate_population(population, 120, sequences, pool=pool, chunksize=3) == alone
+    with tetris.SharedEvaluation(len(population), len(sequences), 122) as shared, \
+            multiprocessing.Pool(2, tetris.shared.attach_worker, (shared.spec,)) as pool:
+        assert tetris.evaluate_population(population, 120, sequences, pool=pool, shared=shared) == alone
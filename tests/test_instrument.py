@@ -0,0 +1,71 @@
+import sys
+
+import pytest
+
+import tetris
+from tetris import instrument
+from tetris.simulation import SIMULATION_ENGINES
+
+BEST = [0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144, -1.7681253322204626]
+
+
+def package_attributes():
+    """Every function and engine method instrumentation could patch, by owner"""
+
+    names = set(instrument.HOT_FUNCTIONS) | set(instrument.PHASE_FUNCTIONS)
+    methods = set(instrument.HOT_METHODS) | set(instrument.PHASE_METHODS)
+
+    attributes = {}
+    for module_name, module in list(sys.modules.items()):
+        if module is not None and (module_name == 'tetris' or module_name.startswith('tetris.')):
+            attributes[module_name] = {name: module.__dict__[name] for name in names if name in module.__dict__}
+    for engine in set(SIMULATION_ENGINES.values()):
+        attributes[engine.__name__] = {name: engine.__dict__[name] for name in methods if name in engine.__dict__}
+    return attributes
+
+
+@pytest.fixture(autouse=True)
+def disabled():
+    yield
+    instrument.disable()
+
+
+def test_disable_restores_the_originals():
+    originals = package_attributes()
+
+    profiler = instrument.enable()
+    assert instrument.active_profiler() is profiler
+    assert hasattr(tetris.simulation.find_best_move, '__wrapped__')
+    assert hasattr(tetris.board.is_valid_position, '__wrapped__')
+    assert hasattr(tetris.state.BoardState.evaluate_move, '__wrapped__')
+    assert hasattr(tetris.bitboard.BitBoardState.evaluate_move, '__wrapped__')
+
+    stats = tetris.run_tetris_game(BEST, iterations=20, seed=1)
+    assert stats['profile']['search']['calls'] == stats['pieces']
+    assert profiler.stats['run_tetris_game'][0] == 1
+
+    assert instrument.disable() is profiler
+    assert instrument.active_profiler() is None
+    restored = package_attributes()
+    assert restored.keys() == originals.keys()
+    for owner, attributes in originals.items():
+        for name, original in attributes.items():
+            assert restored[owner][name] is original, f"{owner}.{name}"
+
+
+def test_enabling_twice_restores_the_originals():
+    originals = package_attributes()
+    instrument.enable()
+    instrument.enable()
+    instrument.disable()
+    assert package_attributes() == originals
+
+
+def test_profiling_context():
+    originals = package_attributes()
+    with instrument.profiling() as profiler:
+        score = tetris.run_tetris_simulation(BEST, iterations=20, seed=1)
+    assert instrument.active_profiler() is None
+    assert package_attributes() == originals
+    assert profiler.stats['search'][0] > 0
+    assert tetris.run_tetris_simulation(BEST, iterations=20, seed=1) == score
@@ -0,0 +1,43 @@
+import queue
+import random
+
+import tetris
+from tetris.islands import _evolve_island
+
+BEST = [0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144, -1.7681253322204626]
+
+SETTINGS = {'iterations': 60, 'population_size': 8, 'generations': 3, 'eval_runs': 2, 'engine': 'list',
+            'fitness': 'mean', 'bag': False, 'racing': None, 'migrate_every': 1, 'migrants': 2}
+
+
+def test_island_sends_its_best_and_takes_in_migrants():
+    inbox, outbox, reports = queue.Queue(), queue.Queue(), queue.Queue()
+    # The previous island of the ring sends BEST at both migrations
+    inbox.put([BEST, BEST])
+    inbox.put([BEST, BEST])
+    _evolve_island(0, 5, SETTINGS, inbox, outbox, reports)
+
+    generations = [reports.get() for _ in range(3)]
+    assert reports.get() == ('done', 0) and reports.empty()
+    assert inbox.empty()
+
+    sent = [outbox.get(), outbox.get()]
+    assert outbox.empty()
+    # Each migration sends the best chromosomes of the generation
+    for migrants, (_, _, gen, _, best, _) in zip(sent, generations):
+        assert len(migrants) == 2 and migrants[0] == best
+    # BEST beats the random first population and leads once it migrated in
+    assert generations[0][4] != BEST
+    assert generations[1][4] == BEST
+
+
+def test_islands_are_deterministic(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    runs = []
+    for output in ('first.txt', 'second.txt'):
+        random.seed(9)
+        best = tetris.train_islands(islands=2, iterations=60, population_size=8, generations=4, eval_runs=2,
+                                    migrate_every=2, output=output)
+        runs.append((best, tetris.load_chromosomes(output)))
+    assert runs[0] == runs[1]
+    assert runs[0][1] == [runs[0][0]]
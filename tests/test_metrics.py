@@ -0,0 +1,55 @@
+import random
+
+import tetris
+from tetris.metrics import MetricsLog
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    with MetricsLog(path, buffer_records=2) as log:
+        log.log('run', settings={'generations': 2})
+        log.log('generation', generation=0, best_fitness=120.5, games=4, pieces=300, seconds=0.5)
+        log.log('generation', generation=1, best_fitness=80, games=4, pieces=200, seconds=0.5)
+        log.log('end', best_score=120.5)
+    run = log.run
+
+    records = list(tetris.read_metrics(path))
+    assert [record['event'] for record in records] == ['run', 'generation', 'generation', 'end']
+    assert all(record['run'] == run for record in records)
+    assert records[1]['best_fitness'] == 120.5 and records[2]['best_fitness'] == 80
+    assert records[0]['settings'] == {'generations': 2}
+    assert [record['generation'] for record in tetris.read_metrics(path, 'generation')] == [0, 1]
+
+    # A second run appends to the same file
+    with MetricsLog(path) as other:
+        other.log('run')
+    assert list(tetris.read_metrics(path, run=run)) == records
+    assert len(list(tetris.read_metrics(path, 'run'))) == 2
+
+    first, second = tetris.summarize_metrics(path)
+    assert (first['run'], first['generations'], first['best_fitness'], first['final_fitness']) == (run, 2, 120.5, 80)
+    assert (first['games'], first['pieces'], first['pieces_per_s'], first['finished']) == (8, 500, 500, True)
+    assert (second['run'], second['generations'], second['finished']) == (other.run, 0, False)
+
+
+def test_records_are_buffered(tmp_path):
+    path = str(tmp_path / 'metrics.jsonl')
+    log  = MetricsLog(path, buffer_records=3)
+    log.log('run')
+    log.log('generation', generation=0)
+    assert list(tetris.read_metrics(path)) == []
+    log.log('generation', generation=1)
+    assert len(list(tetris.read_metrics(path))) == 3
+    log.log('end')
+    log.close()
+    assert len(list(tetris.read_metrics(path))) == 4
+
+
+def test_training_log(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    random.seed(2)
+    tetris.train_genetic_algorithm(iterations=40, population_size=6, generations=2, eval_runs=2,
+                                   metrics='metrics.jsonl')
+    summary, = tetris.summarize_metrics('metrics.jsonl')
+    assert summary['generations'] == 2 and summary['games'] == 24 and summary['finished']
+    assert len(list(tetris.read_metrics('metrics.jsonl', 'chromosome'))) == 12
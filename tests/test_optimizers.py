@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+import tetris
+from tetris import genetic
+
+np = pytest.importorskip('numpy')
+
+BEST = [0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144, -1.7681253322204626]
+
+
+def sphere(population):
+    """Fitness peaking at BEST, cheap to compute"""
+
+    return [-float(((np.asarray(chrom) - BEST) ** 2).sum()) for chrom in population]
+
+
+def run(name, seed, generations=6):
+    optimizer = tetris.OPTIMIZERS[name](10, 5, seed)
+    asked = []
+    for _ in range(generations):
+        population = optimizer.ask()
+        asked.append(population.copy())
+        optimizer.tell(sphere(population))
+    return asked
+
+
+@pytest.mark.parametrize('name', sorted(tetris.OPTIMIZERS))
+def test_ask_and_tell_shapes(name):
+    for population in run(name, 1):
+        assert population.shape == (10, 5)
+        assert np.isfinite(population).all()
+
+
+@pytest.mark.parametrize('name', sorted(tetris.OPTIMIZERS))
+def test_optimizers_are_deterministic(name):
+    first, again, other = run(name, 4), run(name, 4), run(name, 5)
+    assert all((a == b).all() for a, b in zip(first, again))
+    assert not all((a == b).all() for a, b in zip(first, other))
+
+
+@pytest.mark.parametrize('name', sorted(tetris.OPTIMIZERS))
+def test_optimizers_improve_on_a_smooth_fitness(name):
+    asked = run(name, 2, generations=30)
+    assert max(sphere(asked[-1])) > max(sphere(asked[0]))
+
+
+def test_array_operators_keep_the_elite():
+    rng        = np.random.default_rng(0)
+    population = tetris.init_population_array(rng, 12, 5)
+    fitness    = sphere(population)
+    children   = tetris.next_generation_array(rng, population, fitness, 12)
+    elite      = population[np.argsort(fitness)[::-1][:genetic.ELITE_SIZE]]
+    assert children.shape == (12, 5)
+    assert (children[:genetic.ELITE_SIZE] == elite).all()
+
+
+def test_holdout_fitness_plays_the_held_out_seeds():
+    scores = [tetris.run_tetris_simulation(BEST, 80, seed=seed)
+              for seed in range(genetic.HOLDOUT_SEED, genetic.HOLDOUT_SEED + 3)]
+    assert genetic.holdout_fitness(BEST, max, 80, 3) == max(scores)
+
+
+def target_checks(tmp_path, optimizer, target):
+    random.seed(6)
+    tetris.train_genetic_algorithm(iterations=60, population_size=8, generations=3, eval_runs=2, optimizer=optimizer,
+                                   metrics=str(tmp_path / 'metrics.jsonl'), target=target, target_games=3)
+    generations = list(tetris.read_metrics(str(tmp_path / 'metrics.jsonl'), 'generation'))
+    return generations, list(tetris.read_metrics(str(tmp_path / 'metrics.jsonl'), 'target'))
+
+
+@pytest.mark.parametrize('optimizer', ['ga', 'cem'])
+def test_target_confirmed_on_held_out_seeds(optimizer, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generations, checks = target_checks(tmp_path, optimizer, 1)
+    assert len(generations) == 1 and len(checks) == 1
+    check = checks[0]
+    assert check['reached'] and check['holdout_fitness'] >= 1 and check['games'] == 3
+    assert check['holdout_fitness'] == genetic.holdout_fitness(generations[0]['best_chromosome'],
+                                                               genetic.FITNESS_STATISTICS['mean'], 60, 3)
+
+
+def test_target_rejected_on_held_out_seeds(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # The held-out games never reach what the training games did
+    monkeypatch.setattr(genetic, 'holdout_fitness', lambda *args: 0)
+    generations, checks = target_checks(tmp_path, 'ga', 1)
+    assert len(generations) == 3
+    assert len(checks) == 3 and not any(check['reached'] for check in checks)
+    assert [check['fitness'] for check in checks] == [gen['best_fitness'] for gen in generations]
@@ -0,0 +1,50 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import tetris
+from tetris.pieces import piece_from_code
+
+BEST = [0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144, -1.7681253322204626]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 42, 'bag'])
+def test_every_bag_deals_the_seven_shapes(seed):
+    sequence = tetris.generate_piece_sequence(seed, 7 * 40, bag=True)
+    shapes   = [tetris.decode_piece(code)[0] for code in sequence]
+    for start in range(0, len(shapes), 7):
+        assert sorted(shapes[start:start + 7]) == sorted(tetris.SHAPES)
+
+
+def test_bags_are_shuffled():
+    sequence = tetris.generate_piece_sequence(3, 7 * 40, bag=True)
+    bags = {sequence[start:start + 7] for start in range(0, len(sequence), 7)}
+    assert len(bags) > 1
+
+
+@pytest.mark.parametrize('bag', [False, True])
+def test_seeded_sequences_replay_exactly(bag):
+    sequence = tetris.generate_piece_sequence(11, 300, bag)
+    assert tetris.generate_piece_sequence(11, 300, bag) == sequence
+    assert tetris.generate_piece_sequence(12, 300, bag) != sequence
+
+    source = tetris.PieceSource(11, bag)
+    assert [next(source) for _ in range(300)] == [piece_from_code(code) for code in sequence]
+
+    # A game on the sequence plays the game of the seed
+    assert tetris.run_tetris_simulation(BEST, 200, pieces=sequence) == \
+           tetris.run_tetris_simulation(BEST, 200, pieces=tetris.PieceSource(11, bag))
+
+
+def test_source_deals_like_get_new_piece():
+    source, rng = tetris.PieceSource(5), random.Random(5)
+    assert [next(source) for _ in range(100)] == [tetris.get_new_piece(rng) for _ in range(100)]
+
+
+def test_import_leaves_the_global_generator_alone():
+    code = ("import random; random.seed(1); expected = random.random(); random.seed(1); "
+            "import tetris, tetris_game; assert random.random() == expected")
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(tetris.__path__[0]))
@@ -0,0 +1,46 @@
+import struct
+
+import pytest
+
+import tetris
+from tetris.replay import VERSION
+
+BEST = [0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144, -1.7681253322204626]
+
+
+@pytest.mark.parametrize('seed', [None, 0, 7, -1, 2 ** 64, -2 ** 70, 'abc', '', b'\x00seed', 1.5])
+def test_replay_round_trip(seed):
+    replay = {'seed': seed, 'chromosome': BEST, 'score': 1240, 'pieces': bytes([1, 2, 3]), 'moves': bytes([17])}
+    assert tetris.unpack_replay(tetris.pack_replay(replay)) == replay
+
+
+def test_other_versions_are_rejected():
+    replay = {'seed': 1, 'chromosome': BEST, 'score': 0, 'pieces': bytes([1, 2]), 'moves': b''}
+    data = bytearray(tetris.pack_replay(replay))
+    struct.pack_into('<H', data, 4, VERSION + 1)
+    with pytest.raises(ValueError):
+        tetris.unpack_replay(bytes(data))
+
+
+@pytest.mark.parametrize('seed', [3, -1, 'abc'])
+def test_recorded_game_replays_to_its_score(seed, tmp_path):
+    path  = str(tmp_path / 'game.tgr')
+    score = tetris.run_tetris_simulation(BEST, 150, seed=seed, replay=path)
+    replay = tetris.load_replay(path)
+    assert replay['seed'] == seed and replay['score'] == score
+    assert tetris.verify_replay(replay)
+
+
+def test_seeking_matches_playing(tmp_path):
+    replay = tetris.run_tetris_game(BEST, 120, seed=4, record=True)['replay']
+    player, reference = tetris.ReplayPlayer(replay), tetris.ReplayPlayer(replay)
+    for position in (120, 3, 77, 50, 0, 101):
+        player.seek(position)
+        reference.seek(0)
+        reference.seek(position)
+        assert player.board.board == reference.board.board and player.score == reference.score
+
+
+def test_unstorable_seed_fails_before_the_game():
+    with pytest.raises(ValueError):
+        tetris.TetrisGame(BEST, seed=(1, 2), record=True)
@@ -0,0 +1,45 @@
+import pytest
+
+import tetris
+import tetris_game
+
+BEST = [0.3946582122120855, -2.753252173494016, -3.1929869397799093, -0.33792013791720144, -1.7681253322204626]
+
+
+@pytest.mark.parametrize('engine', ['bitboard', 'unknown'])
+def test_playback_rejects_engines_without_a_board(engine):
+    with pytest.raises(ValueError):
+        tetris_game.AIPlayback(BEST, engine=engine)
+    with pytest.raises(ValueError):
+        tetris_game.run_ai_game(BEST, engine=engine)
+
+
+@pytest.mark.parametrize('engine', ['list', 'numpy', 'cached'])
+def test_playback_publishes_the_board(engine):
+    playback = tetris_game.AIPlayback(BEST, engine=engine, speed='max')
+    assert playback.snapshot['board'] == tetris_game.get_blank_board()
+
+
+@pytest.mark.parametrize('lookahead', [False, True])
+def test_playback_searches_each_piece_once(lookahead, monkeypatch):
+    playback = tetris_game.AIPlayback(BEST, lookahead=lookahead, speed='10x')
+    playback.game = tetris.TetrisGame(BEST, seed=5, lookahead=lookahead)
+    reference     = tetris.TetrisGame(BEST, seed=5, lookahead=lookahead)
+    searches = []
+
+    def counted(find_best_move):
+        def search(*args):
+            searches.append(args[1]['shape'])
+            if len(searches) == 30:
+                playback.running = False
+            return find_best_move(*args)
+        return search
+
+    monkeypatch.setattr(tetris_game.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(tetris_game, 'find_best_move', counted(tetris_game.find_best_move))
+    monkeypatch.setattr(tetris.simulation, 'find_best_move', counted(tetris.simulation.find_best_move))
+    playback._run()
+
+    assert playback.game.pieces_played == len(searches) == 30
+    reference.advance(30)
+    assert playback.game.board.board == reference.board.board and playback.game.score == reference.score
@@ -0,0 +1,33 @@
+"""Headless Tetris game logic, AI heuristics and genetic algorithm.
+
+Nothing in this package imports pygame, the UI lives in tetris_game.py.
+"""
+
+from .constants import BOARDWIDTH, BOARDHEIGHT, BLANK
+from .pieces import (PIECES, TEMPLATEWIDTH, TEMPLATEHEIGHT, PIECE_CELLS, PIECE_BLANK_CELLS, PIECE_BOUNDS,
+                     PIECE_BOTTOMS, PIECE_X_RANGE, SHAPES, PieceSource, compile_piece_geometry, get_new_piece,
+                     make_piece, encode_piece, decode_piece, encode_move, decode_move, generate_piece_sequence,
+                     iter_pieces)
+from .board import (get_blank_board, add_to_board, apply_piece, undo_piece, is_on_board, is_valid_position,
+                    is_complete_line, remove_complete_lines, column_height, get_column_heights,
+                    update_column_heights, get_landing_y, drop_piece, drop_piece_stepwise)
+from .heuristics import (calc_move_info, calc_initial_move_info, calc_heuristics, calc_sides_in_contact,
+                         rate_move, rate_features, count_holes, calculate_bumpiness)
+from .state import BoardState
+from .bitboard import BitBoardState, get_blank_bitboard
+from .cache import FEATURE_CACHE, FeatureCache, CachedBoardState, board_hash
+from .batch import BatchBoardState, rate_moves_batch, simulate_population
+from .simulation import (SIMULATION_ENGINES, POPULATION_ENGINES, rate_placements, find_best_move, TetrisGame,
+                         run_tetris_game, run_tetris_simulation)
+from .genetic import (FITNESS_STATISTICS, init_population, crossover, mutate, evaluate_chromosome,
+                      evaluate_population, race_population, train_genetic_algorithm,
+                      resume_genetic_algorithm, write_best_chromosome)
+from .shared import SharedEvaluation
+from .optimizers import (OPTIMIZERS, ArrayGeneticOptimizer, CrossEntropyOptimizer, CMAESOptimizer,
+                         init_population_array, crossover_array, mutate_array, next_generation_array)
+from .islands import train_islands
+from .evaluate import (evaluate_chromosomes, evaluate_game, iter_evaluations, load_chromosomes,
+                       summarize_scores)
+from .metrics import MetricsLog, read_metrics, summarize_metrics
+from .checkpoint import CheckpointWriter, load_checkpoint, pack_checkpoint, unpack_checkpoint
+from .replay import ReplayPlayer, load_replay, pack_replay, unpack_replay, verify_replay, write_replay
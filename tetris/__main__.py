@@ -0,0 +1,35 @@
+"""Command line tools of the package
+
+Every command is the main() of its module, given the rest of the arguments:
+
+    evaluate  play chromosomes on many seeded games, see tetris.evaluate
+    metrics   summarize training metrics files, see tetris.metrics
+    replay    check that game replays reproduce their scores, see tetris.replay
+
+The commands run from here rather than with `python -m tetris.MODULE`, as the
+package already imports those modules. Usage:
+
+    python -m tetris COMMAND [ARGS ...]
+"""
+
+import sys
+
+from . import evaluate, metrics, replay
+
+COMMANDS = {'evaluate': evaluate.main,
+            'metrics':  metrics.main,
+            'replay':   replay.main}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(__doc__.strip().split('\n')[-1].strip())
+        print(f"commands: {', '.join(COMMANDS)}")
+        return 2
+    COMMANDS[argv[0]](argv[1:])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,388 @@
+"""NumPy engine rating every placement of a piece in one batch
+
+numpy is only imported when this engine is first used, the rest of the
+package doesn't depend on it.
+"""
+
+import time
+
+from .constants import BOARDWIDTH, BOARDHEIGHT, BLANK
+from .optional import import_numpy
+from .pieces import PIECE_CELLS, PIECE_BOUNDS, PIECE_X_RANGE, decode_piece, make_piece
+from .heuristics import rate_features
+from .state import BoardState
+
+# numpy, see _require_numpy()
+np = None
+
+
+def _build_placement_tables():
+    """Return the candidate placements of every shape, in search order.
+
+    Every shape maps to (moves, cell_x, cell_y), where moves is the list of
+    (rotation, x) candidates and cell_x / cell_y are (candidates x cells)
+    arrays of the board column and template row of every filled cell.
+
+    """
+    tables = {}
+    for shape, rotations in PIECE_CELLS.items():
+        moves, cell_x, cell_y = [], [], []
+        for r, cells in enumerate(rotations):
+            for x in PIECE_X_RANGE[shape][r]:
+                moves.append((r, x))
+                cell_x.append([x + Px for Px, _ in cells])
+                cell_y.append([Py for _, Py in cells])
+        tables[shape] = (moves, np.array(cell_x), np.array(cell_y))
+
+    return tables
+
+
+# Built on first use, so importing the package doesn't need numpy
+ROWS       = None
+PLACEMENTS = None
+
+
+def _require_numpy():
+    """Import numpy and build the placement tables the first time the engine
+    is used"""
+
+    global np, ROWS, PLACEMENTS
+
+    if PLACEMENTS is None:
+        np         = import_numpy("the 'numpy' engine")
+        ROWS       = np.arange(BOARDHEIGHT)
+        PLACEMENTS = _build_placement_tables()
+
+
+def board_to_array(board):
+    """Return the (height x width) filled cells of a board as a bool array"""
+
+    _require_numpy()
+    return np.array([[board[x][y] != BLANK for x in range(BOARDWIDTH)] for y in range(BOARDHEIGHT)])
+
+
+def place_candidates(filled, shape):
+    """Drop every candidate placement of the shape on the board.
+
+    Args:
+        filled: (height x width) bool array of the board
+
+    Return (moves, valid, landing_y, boards): the (rotation, x) candidates,
+    whether each one fits at the top of the board, the row it lands on and the
+    stacked (candidates x height x width) boards with the piece added.
+
+    """
+    _require_numpy()
+    moves, cell_x, cell_y = PLACEMENTS[shape]
+    count = len(moves)
+
+    valid = ~filled[cell_y, cell_x].any(axis=1)
+
+    # Row of the first filled cell at or below each cell, BOARDHEIGHT for the
+    # floor. The piece falls until one of its cells reaches the next one.
+    below = np.where(filled, ROWS[:, None], BOARDHEIGHT)
+    next_filled = np.minimum.accumulate(below[::-1], axis=0)[::-1]
+    landing_y = (next_filled[cell_y, cell_x] - cell_y).min(axis=1) - 1
+
+    boards = np.repeat(filled[None], count, axis=0)
+    boards[np.arange(count)[:, None], cell_y + landing_y[:, None], cell_x] = True
+
+    return moves, valid, landing_y, boards
+
+
+def remove_complete_lines_batch(boards):
+    """Remove the complete lines of stacked boards in place and return the
+    number of lines removed from each"""
+
+    full  = np.count_nonzero(boards, axis=2) == BOARDWIDTH
+    lines = np.count_nonzero(full, axis=1)
+
+    cleared = np.flatnonzero(lines)
+    if len(cleared):
+        # A stable sort moves the full rows to the top and keeps the order of
+        # the others, then the full rows are blanked
+        order   = np.argsort(~full[cleared], axis=1, kind='stable')
+        shifted = np.take_along_axis(boards[cleared], order[:, :, None], axis=1)
+        shifted &= (ROWS[None, :] >= lines[cleared, None])[:, :, None]
+        boards[cleared] = shifted
+
+    return lines
+
+
+def calc_heuristics_batch(boards):
+    """Return the holes, blocks above holes, sum of heights and bumpiness of
+    stacked boards, with the values calc_heuristics and calculate_bumpiness
+    give"""
+
+    # Per column: filled cells, top filled row and lowest blank row
+    cells        = np.count_nonzero(boards, axis=1)
+    top          = boards.argmax(axis=1)
+    lowest_blank = BOARDHEIGHT - 1 - (~boards[:, ::-1]).argmax(axis=1)
+
+    heights      = np.where(cells > 0, BOARDHEIGHT - top, 0)
+    column_holes = heights - cells
+
+    # Every hole lies between the top and the lowest blank, which is a hole
+    # itself, so the cells above the lowest hole are all but the other holes
+    column_blocking = np.where(column_holes > 0, lowest_blank - top - column_holes + 1, 0)
+
+    holes       = column_holes.sum(axis=1)
+    blocking    = column_blocking.sum(axis=1)
+    sum_heights = np.count_nonzero(boards, axis=2) @ (BOARDHEIGHT - ROWS)
+    bumpiness   = np.abs(np.diff(heights, axis=1)).sum(axis=1)
+
+    return holes, blocking, sum_heights, bumpiness
+
+
+def rate_features_batch(features, chromosomes):
+    """Rate the (... x 5) features with heuristics.rate_features, term by
+    term in the same order so the scores are the same floats.
+
+    chromosomes is one chromosome, or 5 weight arrays broadcasting against
+    the features of a candidate.
+
+    """
+    return rate_features([features[..., i] for i in range(5)], chromosomes)
+
+
+def evaluate_placements(filled, shape, total_holes_bef, total_blocking_bef):
+    """Return the moves, valid flags, landing rows and (candidates x 5)
+    features of every placement of the shape, the features being those
+    evaluate_move and calc_move_info give"""
+
+    moves, valid, landing_y, boards = place_candidates(filled, shape)
+    lines = remove_complete_lines_batch(boards)
+    holes, blocking, sum_heights, bumpiness = calc_heuristics_batch(boards)
+
+    features = np.stack([lines, sum_heights, holes - total_holes_bef, bumpiness,
+                         blocking - total_blocking_bef], axis=1)
+    return moves, valid, landing_y, features
+
+
+def rate_moves_batch(board, piece, chromosomes):
+    """Return the (rotation, x) candidates of the piece and their scores.
+
+    Every score is the one rate_move gives for the candidate, -1 for the
+    candidates that don't fit at the top of the board.
+
+    """
+    filled = board_to_array(board)
+    holes, blocking, _, _ = calc_heuristics_batch(filled[None])
+
+    moves, valid, _, features = evaluate_placements(filled, piece['shape'], holes[0], blocking[0])
+    scores = np.where(valid, rate_features_batch(features, chromosomes), -1)
+    return moves, scores
+
+
+class BatchBoardState(BoardState):
+    """BoardState that rates all the placements of a piece in one batch.
+
+    The filled cells are kept in a (height x width) bool array next to the
+    board, so the search doesn't convert the board for every piece.
+
+    """
+
+    def refresh(self):
+        BoardState.refresh(self)
+        self.filled = board_to_array(self.board)
+
+    def copy(self):
+        state = BoardState.copy(self)
+        state.filled = self.filled.copy()
+        return state
+
+    def add_piece(self, piece):
+        shape, rotation = piece['shape'], piece['rotation']
+
+        lines_cleared = BoardState.add_piece(self, piece)
+        if not lines_cleared and piece['y'] + PIECE_BOUNDS[shape][rotation][1] >= 0:
+            # The board wasn't refreshed, add the piece to the array too
+            for Px, Py in PIECE_CELLS[shape][rotation]:
+                self.filled[piece['y'] + Py, piece['x'] + Px] = True
+        return lines_cleared
+
+    def apply_piece(self, piece):
+        filled = self.filled
+        lines_cleared, undo = BoardState.apply_piece(self, piece)
+        if self.filled is filled:
+            # The board wasn't refreshed, add the piece to the array too
+            for x, y, _ in undo[0][0]:
+                filled[y, x] = True
+        return lines_cleared, (undo, filled)
+
+    def undo_piece(self, undo):
+        undo, filled = undo
+        BoardState.undo_piece(self, undo)
+        if self.filled is filled:
+            for x, y, _ in undo[0][0]:
+                filled[y, x] = False
+        else:
+            # A refresh replaced the array, the one from before the move is
+            # still untouched
+            self.filled = filled
+
+    def rate_placements(self, piece, chromosome):
+        """Rate every placement of the piece that fits at the top of the
+        board, in the format of simulation.rate_placements"""
+
+        moves, valid, landing_y, features = evaluate_placements(self.filled, piece['shape'], self.total_holes,
+                                                                self.total_blocking)
+        scores = rate_features_batch(features, chromosome).tolist()
+        features, landing_y = features.tolist(), landing_y.tolist()
+
+        placements = []
+        for i in np.flatnonzero(valid).tolist():
+            r, x = moves[i]
+            placed_piece = {
+                'shape': piece['shape'],
+                'rotation': r,
+                'x': x,
+                'y': landing_y[i],
+                'color': piece['color']
+            }
+            placements.append((scores[i], r, x, tuple(features[i]), placed_piece))
+
+        return placements
+
+
+##############################################################################
+
+# Points for the lines cleared by one piece, as run_tetris_simulation scores them
+LINE_SCORES = (0, 40, 120, 300, 1200)
+
+# Names of the moves clearing 1, 2, 3 and 4 lines in the game statistics
+LINE_CLEAR_NAMES = ('single', 'double', 'triple', 'tetris')
+
+
+def spawn_fits(filled, piece):
+    """Return for each of the stacked boards whether the new piece fits where
+    it spawns, cells above the board never colliding"""
+
+    cells = [(piece['x'] + Px, piece['y'] + Py) for Px, Py in PIECE_CELLS[piece['shape']][piece['rotation']]
+             if piece['y'] + Py >= 0]
+    if not cells:
+        return np.ones(len(filled), dtype=bool)
+
+    xs, ys = zip(*cells)
+    return ~filled[:, list(ys), list(xs)].any(axis=1)
+
+
+def simulate_population(chromosomes, iterations, pieces, details=False):
+    """Play the games of a whole population in lockstep and return their scores.
+
+    Every chromosome plays the same piece sequence, so at each step all the
+    games place the same piece: the placements of all the running games are
+    rated in one (games x candidates x height x width) batch with the (games x
+    5) weight matrix. Games that are over are masked out of the batch. The
+    scores are the ones run_tetris_simulation gives for each chromosome on the
+    sequence.
+
+    Args:
+        chromosomes: heuristic weights of every game
+        iterations:  maximum number of pieces to play
+        pieces:      sequence of piece codes (from generate_piece_sequence),
+                     with at least iterations + 2 pieces
+        details:     return the statistics of every game, as run_tetris_game
+                     does, instead of its score; the wall time is split
+                     evenly between the games
+
+    """
+    start = time.perf_counter()
+    _require_numpy()
+    count   = len(chromosomes)
+    weights = np.array(chromosomes, dtype=float)
+
+    filled   = np.zeros((count, BOARDHEIGHT, BOARDWIDTH), dtype=bool)
+    holes    = np.zeros(count, dtype=int)
+    blocking = np.zeros(count, dtype=int)
+    scores   = np.zeros(count, dtype=int)
+    played   = np.zeros(count, dtype=int)
+    clears   = np.zeros((count, 5), dtype=int)
+    running  = np.arange(count)
+
+    line_scores = np.array(LINE_SCORES)
+    new_pieces  = [make_piece(*decode_piece(code)) for code in pieces[:iterations + 1]]
+
+    for step in range(iterations):
+        if not len(running):
+            break
+
+        shape = new_pieces[step]['shape']
+        moves, cell_x, cell_y = PLACEMENTS[shape]
+        games, candidates = len(running), len(moves)
+        boards = filled[running]
+
+        valid = ~boards[:, cell_y, cell_x].any(axis=2)
+
+        below = np.where(boards, ROWS[:, None], BOARDHEIGHT)
+        next_filled = np.minimum.accumulate(below[:, ::-1], axis=1)[:, ::-1]
+        landing_y = (next_filled[:, cell_y, cell_x] - cell_y).min(axis=2) - 1
+
+        placed = np.repeat(boards[:, None], candidates, axis=1)
+        placed[np.arange(games)[:, None, None], np.arange(candidates)[None, :, None],
+               cell_y + landing_y[:, :, None], cell_x] = True
+
+        placed = placed.reshape(games * candidates, BOARDHEIGHT, BOARDWIDTH)
+        lines  = remove_complete_lines_batch(placed)
+        new_holes, new_blocking, sum_heights, bumpiness = calc_heuristics_batch(placed)
+
+        features = np.stack([lines, sum_heights, new_holes, bumpiness, new_blocking], axis=1)
+        features = features.reshape(games, candidates, 5)
+        features[:, :, 2] -= holes[running, None]
+        features[:, :, 4] -= blocking[running, None]
+
+        # One (games x 1) column of weights per feature
+        ratings = rate_features_batch(features, weights[running].T[:, :, None])
+        ratings[~valid] = -np.inf
+
+        # argmax keeps the first of equal ratings, like the scalar search
+        best  = ratings.argmax(axis=1)
+        moved = valid.any(axis=1)
+        index = np.arange(games)[moved]
+        best  = best[moved]
+        games_moved = running[moved]
+
+        filled[games_moved] = placed.reshape(games, candidates, BOARDHEIGHT, BOARDWIDTH)[index, best]
+        cleared = features[index, best, 0]
+        holes[games_moved]    += features[index, best, 2]
+        blocking[games_moved] += features[index, best, 4]
+
+        # The moves are rated dropping the piece from the top row, but it is
+        # played from where it spawns, two rows above. Near the top it can get
+        # stuck on the way down, and is then played where it stops.
+        spawn_y = new_pieces[step]['y']
+        move_x, move_y = cell_x[best], cell_y[best]
+        played_y = (next_filled[index[:, None], np.maximum(move_y + spawn_y + 1, 0), move_x] - move_y).min(axis=1) - 1
+        for i in np.flatnonzero(played_y != landing_y[index, best]).tolist():
+            game = games_moved[i]
+
+            # Cells above the board wrap around to the bottom rows, as in
+            # add_to_board
+            board = boards[index[i]].copy()
+            board[(move_y[i] + played_y[i]) % BOARDHEIGHT, move_x[i]] = True
+            board = board[None]
+            lines = remove_complete_lines_batch(board)
+            new_holes, new_blocking, _, _ = calc_heuristics_batch(board)
+
+            filled[game]   = board[0]
+            cleared[i]     = lines[0]
+            holes[game]    = new_holes[0]
+            blocking[game] = new_blocking[0]
+
+        scores[games_moved] += line_scores[cleared]
+        clears[games_moved, cleared] += 1
+        played[games_moved] += 1
+
+        # Games without a move are over, and so are those the next piece
+        # doesn't fit in
+        running = games_moved[spawn_fits(filled[games_moved], new_pieces[step + 1])]
+
+    if not details:
+        return scores.tolist()
+
+    seconds = (time.perf_counter() - start) / count
+    return [{'score':   score,
+             'pieces':  pieces_played,
+             'lines':   dict(zip(LINE_CLEAR_NAMES, game_clears[1:])),
+             'seconds': seconds}
+            for score, pieces_played, game_clears in zip(scores.tolist(), played.tolist(), clears.tolist())]
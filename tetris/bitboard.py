@@ -0,0 +1,441 @@
+"""Bitboard engine for headless simulations"""
+
+from .constants import BOARDWIDTH, BOARDHEIGHT
+from .pieces import TEMPLATEWIDTH, TEMPLATEHEIGHT, PIECE_CELLS, PIECE_BLANK_CELLS
+from .board import get_landing_y
+from .state import PIECE_COLUMNS
+
+# BOARDHEIGHT integers, one per row, where bit x is set when the cell (x, y) is
+# filled. Colors are not kept, so this board is only meant for simulations.
+
+FULL_ROW = (1 << BOARDWIDTH) - 1
+
+# Number of filled cells for every possible row value
+ROW_POPCOUNT = [bin(row).count('1') for row in range(FULL_ROW + 1)]
+
+
+def _build_piece_row_masks():
+    """Encode every piece rotation as a tuple of (template row, row mask).
+
+    Bit tx of a row mask is set when the template column tx is filled, so the
+    mask for a piece at board position x is the mask shifted by x.
+
+    """
+    row_masks = {}
+    for shape, rotations in PIECE_CELLS.items():
+        row_masks[shape] = []
+        for cells in rotations:
+            masks = {}
+            for x, y in cells:
+                masks[y] = masks.get(y, 0) | (1 << x)
+            row_masks[shape].append(tuple(sorted(masks.items())))
+
+    return row_masks
+
+
+PIECE_ROW_MASKS = _build_piece_row_masks()
+
+
+def get_blank_bitboard():
+    """Create and return a new blank bitboard"""
+
+    return [0] * BOARDHEIGHT
+
+
+def bb_shift_mask(mask, x):
+    """Move a template row mask to the board column x.
+
+    Return None if any cell of the row falls outside the board horizontally.
+
+    """
+    if x < 0:
+        if mask & ((1 << -x) - 1):
+            return None
+        return mask >> -x
+
+    mask <<= x
+    if mask > FULL_ROW:
+        return None
+
+    return mask
+
+
+def bb_is_valid_position(bitboard, piece, adj_X=0, adj_Y=0):
+    """Return True if the piece is within the bitboard and not colliding"""
+
+    x = piece['x'] + adj_X
+    y = piece['y'] + adj_Y
+
+    for dy, mask in PIECE_ROW_MASKS[piece['shape']][piece['rotation']]:
+        if y + dy < 0:
+            continue
+
+        if y + dy >= BOARDHEIGHT:
+            return False
+
+        mask = bb_shift_mask(mask, x)
+        if mask is None or bitboard[y + dy] & mask:
+            return False
+
+    return True
+
+
+def bb_add_to_board(bitboard, piece):
+    """Fill in the bitboard based on piece's location, shape, and rotation"""
+
+    # Rows are indexed exactly like add_to_board indexes the list board, so
+    # both engines treat a piece locked above the board the same way.
+    x = piece['x']
+    for dy, mask in PIECE_ROW_MASKS[piece['shape']][piece['rotation']]:
+        if x < 0:
+            bitboard[piece['y'] + dy] |= mask >> -x
+        else:
+            bitboard[piece['y'] + dy] |= (mask << x) & FULL_ROW
+
+
+def bb_remove_complete_lines(bitboard):
+    """Remove any completed lines on the bitboard and return how many"""
+
+    kept_rows = [row for row in bitboard if row != FULL_ROW]
+    num_removed_lines = BOARDHEIGHT - len(kept_rows)
+
+    if num_removed_lines:
+        bitboard[:] = [0] * num_removed_lines + kept_rows
+
+    return num_removed_lines
+
+
+def bb_apply_piece(bitboard, piece):
+    """Add a piece to the bitboard and remove the lines it completes, like
+    apply_piece does on the list board.
+
+    Return the record bb_undo_piece takes to put the bitboard back: the (y,
+    previous row) of the rows of the piece and the y of the cleared rows, top
+    first. Only the rows of the piece are checked for complete lines.
+
+    """
+    x       = piece['x']
+    piece_y = piece['y']
+
+    rows, cleared = [], []
+    for dy, mask in PIECE_ROW_MASKS[piece['shape']][piece['rotation']]:
+        y = piece_y + dy
+        if y < 0:
+            # Rows above the board wrap around, as bb_add_to_board indexes them
+            y += BOARDHEIGHT
+        row = bitboard[y]
+        rows.append((y, row))
+        row |= mask >> -x if x < 0 else (mask << x) & FULL_ROW
+        bitboard[y] = row
+        if row == FULL_ROW:
+            cleared.append(y)
+
+    if cleared:
+        # Wrapped rows come last but are the lowest ones
+        cleared.sort()
+        for y in reversed(cleared):
+            del bitboard[y]
+        bitboard[0:0] = [0] * len(cleared)
+
+    return rows, cleared
+
+
+def bb_undo_piece(bitboard, record):
+    """Take a piece added by bb_apply_piece back off the bitboard"""
+
+    rows, cleared = record
+    if cleared:
+        del bitboard[:len(cleared)]
+        for y in cleared:
+            bitboard.insert(y, FULL_ROW)
+
+    for y, row in rows:
+        bitboard[y] = row
+
+
+def bb_is_filled(bitboard, x, y):
+    """Return True if the cell is filled, indexing like the list board does"""
+
+    return (bitboard[y] >> (x % BOARDWIDTH)) & 1 == 1
+
+
+def bb_column_heights(bitboard):
+    """Return the height of every column of the bitboard"""
+
+    heights = [0] * BOARDWIDTH
+    seen    = 0
+
+    for y in range(BOARDHEIGHT):
+        new_cells = bitboard[y] & ~seen
+        if new_cells:
+            for x in range(BOARDWIDTH):
+                if new_cells >> x & 1:
+                    heights[x] = BOARDHEIGHT - y
+            seen |= new_cells
+            if seen == FULL_ROW:
+                break
+
+    return heights
+
+
+def bb_calc_heuristics(bitboard):
+    """Calculate the heuristics of the whole bitboard at once.
+
+    Return the number of holes, the number of blocks above holes, the sum of
+    the heights of all the blocks and the bumpiness, the same values
+    calc_heuristics and calculate_bumpiness give for the list board.
+
+    """
+    heights, total_holes, total_blocking_block, sum_heights, _ = _bb_scan(bitboard)
+    bumpiness = sum(abs(heights[i] - heights[i+1]) for i in range(BOARDWIDTH - 1))
+
+    return total_holes, total_blocking_block, sum_heights, bumpiness
+
+
+def _bb_scan(bitboard):
+    """Return the column heights, holes, blocks above holes and sum of heights
+    of the bitboard, and the mask of the columns holding a hole"""
+
+    total_holes          = 0
+    total_blocking_block = 0
+    sum_heights          = 0
+    heights              = [0] * BOARDWIDTH
+    hole_columns         = 0
+
+    # The empty rows at the top count for nothing
+    top = 0
+    while top < BOARDHEIGHT and not bitboard[top]:
+        top += 1
+
+    # Walk top-down: an empty cell is a hole if a block was seen above it, and
+    # the first block of a column gives its height
+    seen = 0
+    for y in range(top, BOARDHEIGHT):
+        row   = bitboard[y]
+        holes = ~row & seen & FULL_ROW
+        total_holes  += ROW_POPCOUNT[holes]
+        hole_columns |= holes
+        sum_heights += ROW_POPCOUNT[row] * (BOARDHEIGHT - y)
+        new_cells = row & ~seen
+        if new_cells:
+            for x in range(BOARDWIDTH):
+                if new_cells >> x & 1:
+                    heights[x] = BOARDHEIGHT - y
+            seen |= row
+
+    # Walk bottom-up: a block is blocking if an empty cell was seen below it
+    empty_below = 0
+    for y in range(BOARDHEIGHT - 1, top - 1, -1):
+        row = bitboard[y]
+        total_blocking_block += ROW_POPCOUNT[row & empty_below]
+        empty_below |= ~row & FULL_ROW
+
+    return heights, total_holes, total_blocking_block, sum_heights, hole_columns
+
+
+def bb_calc_sides_in_contact(bitboard, piece):
+    """Calculate sides in contact, mirroring calc_sides_in_contact"""
+
+    piece_sides = 0
+    floor_sides = 0
+    wall_sides  = 0
+
+    for Px, Py in PIECE_CELLS[piece['shape']][piece['rotation']]:
+        x = piece['x'] + Px
+        y = piece['y'] + Py
+
+        if x == 0 or x == BOARDWIDTH-1:
+            wall_sides += 1
+
+        if y == BOARDHEIGHT-1:
+            floor_sides += 1
+        elif Py == TEMPLATEHEIGHT-1 and bb_is_filled(bitboard, x, y+1):
+            piece_sides += 1
+
+        if Px == 0 and x > 0 and bb_is_filled(bitboard, x-1, y):
+            piece_sides += 1
+
+        if Px == TEMPLATEWIDTH-1 and x < BOARDWIDTH-1 and bb_is_filled(bitboard, x+1, y):
+            piece_sides += 1
+
+    for (Px, Py), neighbours in PIECE_BLANK_CELLS[piece['shape']][piece['rotation']]:
+        x = piece['x'] + Px
+        y = piece['y'] + Py
+
+        if 0 <= x < BOARDWIDTH and y < BOARDHEIGHT and bb_is_filled(bitboard, x, y):
+            piece_sides += neighbours
+
+    return piece_sides, floor_sides, wall_sides
+
+
+def bb_drop_piece(bitboard, piece, heights):
+    """Move the piece down to where it lands on the bitboard"""
+
+    landing_y = get_landing_y(heights, piece)
+
+    if landing_y is None:
+        bb_drop_piece_stepwise(bitboard, piece)
+    else:
+        piece['y'] = landing_y
+
+
+def bb_drop_piece_stepwise(bitboard, piece):
+    """Move the piece down the bitboard one row at a time until it lands"""
+
+    while bb_is_valid_position(bitboard, piece, adj_Y=1):
+        piece['y'] += 1
+
+
+def bb_calc_move_info(bitboard, piece, x, r, total_holes_bef, total_blocking_bloks_bef, heights=None):
+    """Calculate informations based on the current play, on a bitboard"""
+
+    piece['rotation'] = r
+    piece['y']        = 0
+    piece['x']        = x
+
+    if (not bb_is_valid_position(bitboard, piece)):
+        return [False]
+
+    if heights is None:
+        bb_drop_piece_stepwise(bitboard, piece)
+    else:
+        bb_drop_piece(bitboard, piece, heights)
+
+    piece_sides, floor_sides, wall_sides = bb_calc_sides_in_contact(bitboard, piece)
+
+    # Play the move on the bitboard itself, read the board it leaves and take
+    # the piece back off
+    record = bb_apply_piece(bitboard, piece)
+    num_removed_lines = len(record[1])
+    total_holes, total_blocking_block, max_height, bumpiness = bb_calc_heuristics(bitboard)
+    bb_undo_piece(bitboard, record)
+
+    new_holes           = total_holes - total_holes_bef
+    new_blocking_blocks = total_blocking_block - total_blocking_bloks_bef
+
+    return [True, max_height, num_removed_lines, new_holes, bumpiness, new_blocking_blocks, piece_sides, floor_sides, wall_sides]
+
+
+class BitBoardState:
+    """A bitboard with the column heights, holes, blocks above holes, sum of
+    heights and bumpiness kept for the move search, so a candidate landing on
+    top of the columns without clearing lines is rated from the columns it
+    touches, like BoardState.evaluate_move does"""
+
+    def __init__(self, bitboard=None):
+        self.bitboard = get_blank_bitboard() if bitboard is None else bitboard
+        self.refresh()
+
+    def refresh(self):
+        """Recompute every heuristic from the bitboard"""
+
+        (self.heights, self.total_holes, self.total_blocking, self.total_sum_heights,
+         self.hole_columns) = _bb_scan(self.bitboard)
+        heights = self.heights
+        self.bumpiness = sum(abs(heights[i] - heights[i+1]) for i in range(BOARDWIDTH - 1))
+
+    def copy(self):
+        """Return an independent copy of the bitboard state"""
+
+        state = BitBoardState.__new__(BitBoardState)
+        state.bitboard          = self.bitboard[:]
+        state.heights           = self.heights[:]
+        state.total_holes       = self.total_holes
+        state.total_blocking    = self.total_blocking
+        state.total_sum_heights = self.total_sum_heights
+        state.hole_columns      = self.hole_columns
+        state.bumpiness         = self.bumpiness
+
+        return state
+
+    def is_valid_position(self, piece, adj_X=0, adj_Y=0):
+        return bb_is_valid_position(self.bitboard, piece, adj_X, adj_Y)
+
+    def drop_piece(self, piece):
+        bb_drop_piece(self.bitboard, piece, self.heights)
+
+    def add_piece(self, piece):
+        """Add a dropped piece to the bitboard and return the lines cleared"""
+
+        bb_add_to_board(self.bitboard, piece)
+        lines_cleared = bb_remove_complete_lines(self.bitboard)
+        self.refresh()
+
+        return lines_cleared
+
+    def apply_piece(self, piece):
+        """Add a dropped piece like add_piece, and return the lines cleared
+        and the record undo_piece takes to take it back off"""
+
+        saved  = (self.heights, self.total_holes, self.total_blocking, self.total_sum_heights, self.hole_columns,
+                  self.bumpiness)
+        record = bb_apply_piece(self.bitboard, piece)
+        self.refresh()
+        return len(record[1]), (record, saved)
+
+    def undo_piece(self, undo):
+        """Take back a piece added by apply_piece"""
+
+        record, saved = undo
+        bb_undo_piece(self.bitboard, record)
+        (self.heights, self.total_holes, self.total_blocking, self.total_sum_heights, self.hole_columns,
+         self.bumpiness) = saved
+
+    def evaluate_move(self, piece):
+        """Return the features of dropping the piece, like BoardState does"""
+
+        bitboard = self.bitboard
+        piece['y'] = 0
+        if not bb_is_valid_position(bitboard, piece):
+            return None
+
+        bb_drop_piece(bitboard, piece, self.heights)
+
+        shape, rotation = piece['shape'], piece['rotation']
+        piece_x, piece_y = piece['x'], piece['y']
+
+        for dy, mask in PIECE_ROW_MASKS[shape][rotation]:
+            if bitboard[piece_y + dy] | bb_shift_mask(mask, piece_x) == FULL_ROW:
+                return self._evaluate_placed(piece)
+
+        heights      = self.heights
+        new_heights  = heights[:]
+        new_holes    = 0
+        new_blocking = 0
+        sum_heights  = self.total_sum_heights
+        hole_columns = self.hole_columns
+
+        for x, top_y, bottom_y in PIECE_COLUMNS[shape][rotation]:
+            x += piece_x
+            gap = BOARDHEIGHT - heights[x] - (piece_y + bottom_y) - 1
+            if gap < 0:
+                # The piece slid under an overhang
+                return self._evaluate_placed(piece)
+
+            num_cells  = bottom_y - top_y + 1
+            new_holes += gap
+            if gap or hole_columns >> x & 1:
+                new_blocking += num_cells
+
+            sum_heights += num_cells * (2 * BOARDHEIGHT - 2 * piece_y - top_y - bottom_y) // 2
+            new_heights[x] = BOARDHEIGHT - (piece_y + top_y)
+
+        columns   = PIECE_COLUMNS[shape][rotation]
+        bumpiness = self.bumpiness
+        for i in range(max(piece_x + columns[0][0] - 1, 0), min(piece_x + columns[-1][0] + 1, BOARDWIDTH - 1)):
+            bumpiness += abs(new_heights[i] - new_heights[i+1]) - abs(heights[i] - heights[i+1])
+
+        return 0, sum_heights, new_holes, bumpiness, new_blocking
+
+    def _evaluate_placed(self, piece):
+        """Evaluate a dropped piece by adding it to the bitboard, reading the
+        whole bitboard and taking it back off, for the moves that clear lines
+        or don't land on top of the columns"""
+
+        bitboard = self.bitboard
+        record   = bb_apply_piece(bitboard, piece)
+        total_holes, total_blocking_block, max_height, bumpiness = bb_calc_heuristics(bitboard)
+        bb_undo_piece(bitboard, record)
+
+        return (len(record[1]), max_height, total_holes - self.total_holes,
+                bumpiness, total_blocking_block - self.total_blocking)
@@ -0,0 +1,233 @@
+"""List-of-columns board: collision, placement, line clears and drops"""
+
+from .constants import BOARDWIDTH, BOARDHEIGHT, BLANK
+from .pieces import PIECE_CELLS, PIECE_BOUNDS, PIECE_BOTTOMS
+
+
+def get_blank_board():
+    """Create and return a new blank board data structure"""
+
+    board = []
+    for i in range(BOARDWIDTH):
+        board.append([BLANK] * BOARDHEIGHT)
+
+    return board
+
+
+def add_to_board(board, piece):
+    """Fill in the board based on piece's location, shape, and rotation"""
+
+    for x, y in PIECE_CELLS[piece['shape']][piece['rotation']]:
+        board[x + piece['x']][y + piece['y']] = piece['color']
+
+
+def is_on_board(x, y):
+    """Check if the piece is on the board"""
+
+    return x >= 0 and x < BOARDWIDTH and y < BOARDHEIGHT
+
+
+def is_valid_position(board, piece, adj_X=0, adj_Y=0):
+    """Return True if the piece is within the board and not colliding"""
+
+    piece_x = piece['x'] + adj_X
+    piece_y = piece['y'] + adj_Y
+
+    for x, y in PIECE_CELLS[piece['shape']][piece['rotation']]:
+        x += piece_x
+        y += piece_y
+
+        if y < 0:
+            # Cells above the board never collide
+            continue
+
+        if x < 0 or x >= BOARDWIDTH or y >= BOARDHEIGHT:
+            return False
+
+        if board[x][y] != BLANK:
+            return False
+
+    return True
+
+
+def is_complete_line(board, y):
+    """Return True if the line filled with boxes with no gaps"""
+
+    for x in range(BOARDWIDTH):
+        if board[x][y] == BLANK:
+            return False
+
+    return True
+
+
+def remove_complete_lines(board):
+    """Remove any completed lines on the board.
+
+    After remove any completed lines, move everything above them dowm and
+    return the number of complete lines.
+
+    """
+    num_removed_lines = 0
+    y = BOARDHEIGHT - 1     # Start y at the bottom of the board
+
+    while y >= 0:
+        if is_complete_line(board, y):
+            # Remove the line and pull boxes down by one line.
+            for pullDownY in range(y, 0, -1):
+                for x in range(BOARDWIDTH):
+                    board[x][pullDownY] = board[x][pullDownY-1]
+
+            # Set very top line to blank.
+            for x in range(BOARDWIDTH):
+                board[x][0] = BLANK
+
+            num_removed_lines += 1
+
+            # Note on the next iteration of the loop, y is the same.
+            # This is so that if the line that was pulled down is also
+            # complete, it will be removed.
+        else:
+            y -= 1  # Move on to check next row up
+
+    return num_removed_lines
+
+
+def apply_piece(board, piece):
+    """Add a piece to the board and remove the lines it completes.
+
+    This does what add_to_board and remove_complete_lines do, but returns a
+    record undo_piece takes to put the board back exactly as it was: the (x,
+    y, previous value) of the piece cells and the (y, row values) of the
+    cleared rows, top first. The number of lines cleared is the length of the
+    latter.
+
+    Only the rows of the piece are checked, the board is expected to hold no
+    complete line before the piece is added, as every board of a game does.
+
+    """
+    shape, rotation = piece['shape'], piece['rotation']
+    color   = piece['color']
+    piece_x = piece['x']
+    piece_y = piece['y']
+
+    cells = []
+    for x, y in PIECE_CELLS[shape][rotation]:
+        x += piece_x
+        y += piece_y
+        if y < 0:
+            # Rows above the board wrap around, as add_to_board indexes them
+            y += BOARDHEIGHT
+        column = board[x]
+        cells.append((x, y, column[y]))
+        column[y] = color
+
+    cleared = []
+    _, top, _, bottom = PIECE_BOUNDS[shape][rotation]
+    for y in range(piece_y + top, piece_y + bottom + 1):
+        if y < 0:
+            y += BOARDHEIGHT
+        for column in board:
+            if column[y] == BLANK:
+                break
+        else:
+            cleared.append(y)
+
+    if cleared:
+        # Wrapped rows come last but are the lowest ones
+        cleared.sort()
+        cleared = [(y, [column[y] for column in board]) for y in cleared]
+        for column in board:
+            for y, _ in reversed(cleared):
+                del column[y]
+            column[0:0] = [BLANK] * len(cleared)
+
+    return cells, cleared
+
+
+def undo_piece(board, record):
+    """Take a piece added by apply_piece back off the board"""
+
+    cells, cleared = record
+    if cleared:
+        for x, column in enumerate(board):
+            del column[:len(cleared)]
+            for y, row in cleared:
+                column.insert(y, row[x])
+
+    for x, y, value in cells:
+        board[x][y] = value
+
+
+def column_height(board, x):
+    for y in range(BOARDHEIGHT):
+        if board[x][y] != BLANK:
+            return BOARDHEIGHT - y
+    return 0
+
+
+def get_column_heights(board):
+    """Return the height of every column of the board"""
+
+    return [column_height(board, x) for x in range(BOARDWIDTH)]
+
+
+def update_column_heights(heights, piece):
+    """Raise the column heights to include a piece just added to the board.
+
+    Return False if the heights can't be updated in place (the piece was
+    locked partly above the board) and must be recomputed from the board.
+
+    """
+    if piece['y'] + PIECE_BOUNDS[piece['shape']][piece['rotation']][1] < 0:
+        return False
+
+    for x, y in PIECE_CELLS[piece['shape']][piece['rotation']]:
+        height = BOARDHEIGHT - (piece['y'] + y)
+        if height > heights[piece['x'] + x]:
+            heights[piece['x'] + x] = height
+
+    return True
+
+
+def get_landing_y(heights, piece):
+    """Return the row where the piece lands if dropped straight down.
+
+    The landing row comes from the column heights and the bottom-most cell of
+    each column of the piece, so it costs one step per piece column. Return
+    None when a block of some column is at or above the bottom of the piece
+    (an overhang), since the heights alone can't tell where it stops then.
+
+    """
+    landing_y = BOARDHEIGHT
+    piece_x   = piece['x']
+    piece_y   = piece['y']
+
+    for x, y in PIECE_BOTTOMS[piece['shape']][piece['rotation']]:
+        top = BOARDHEIGHT - heights[piece_x + x]
+        if top <= piece_y + y:
+            return None
+        if top - y - 1 < landing_y:
+            landing_y = top - y - 1
+
+    return landing_y
+
+
+def drop_piece(board, piece, heights):
+    """Move the piece down to where it lands, using the column heights"""
+
+    landing_y = get_landing_y(heights, piece)
+
+    if landing_y is None:
+        drop_piece_stepwise(board, piece)
+    else:
+        piece['y'] = landing_y
+
+
+def drop_piece_stepwise(board, piece):
+    """Move the piece down one row at a time until it lands.
+
+    This is the reference behavior drop_piece must match.
+
+    """
+    while is_valid_position(board, piece, adj_Y=1):
+        piece['y'] += 1
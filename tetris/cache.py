@@ -0,0 +1,174 @@
+"""Transposition cache of move features keyed by a Zobrist board hash"""
+
+import random
+import sys
+from collections import OrderedDict
+
+from .constants import BOARDWIDTH, BOARDHEIGHT, BLANK
+from .pieces import PIECE_CELLS, PIECE_BOUNDS
+from .state import BoardState
+
+
+# One random 64 bit key per cell, the hash of a board is the XOR of the keys of
+# its filled cells. Colors don't change the features, so they aren't hashed.
+# The keys come from their own generator so they don't depend on, or change,
+# the global random state.
+_zobrist_rng = random.Random(0x7e7215)
+ZOBRIST = [[_zobrist_rng.getrandbits(64) for _ in range(BOARDHEIGHT)] for _ in range(BOARDWIDTH)]
+del _zobrist_rng
+
+
+def board_hash(board):
+    """Return the Zobrist hash of the filled cells of a board"""
+
+    h = 0
+    for x in range(BOARDWIDTH):
+        column, keys = board[x], ZOBRIST[x]
+        for y in range(BOARDHEIGHT):
+            if column[y] != BLANK:
+                h ^= keys[y]
+    return h
+
+
+def _estimate_entry_bytes():
+    """Rough size of one cache entry: its key, its value and the dict slot and
+    linked list node the OrderedDict keeps for it"""
+
+    key      = ((1 << 63) + 1, 'T', 3, 7)
+    features = (4, 1000, 10, 100, 10)
+    value    = (features, 20)
+    return sum(sys.getsizeof(obj) for obj in (key, key[0], value, features)) + 100
+
+
+class FeatureCache:
+    """Bounded LRU cache mapping (board hash, shape, rotation, x) to the
+    features of the move and the row the piece lands on.
+
+    Args:
+        max_bytes: approximate memory the entries may use, the least recently
+                   used entries are evicted past it
+
+    """
+
+    ENTRY_BYTES = _estimate_entry_bytes()
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes   = max_bytes
+        self.max_entries = max(1, max_bytes // self.ENTRY_BYTES)
+        self.entries     = OrderedDict()
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Return the entry of key, or None on a miss"""
+
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        entries = self.entries
+        entries[key] = entry
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return the counters and the size of the cache"""
+
+        lookups = self.hits + self.misses
+        return {'hits':      self.hits,
+                'misses':    self.misses,
+                'evictions': self.evictions,
+                'hit_rate':  self.hits / lookups if lookups else 0.0,
+                'entries':   len(self.entries),
+                'bytes':     len(self.entries) * self.ENTRY_BYTES,
+                'max_bytes': self.max_bytes}
+
+
+# Cache shared by the CachedBoardState of a process, so the games of every
+# chromosome evaluated there reuse each other's positions
+FEATURE_CACHE = FeatureCache()
+
+
+class CachedBoardState(BoardState):
+    """BoardState looking up the features of a move in a FeatureCache before
+    computing them.
+
+    The Zobrist hash of the board is kept up to date as pieces are added, and
+    recomputed when the board is refreshed.
+
+    """
+
+    def __init__(self, board=None, cache=None):
+        self.cache = FEATURE_CACHE if cache is None else cache
+        BoardState.__init__(self, board)
+
+    def refresh(self):
+        BoardState.refresh(self)
+        self.hash = board_hash(self.board)
+
+    def __getstate__(self):
+        # The cache stays in its process, an unpickled state uses the one of
+        # the process it lands in
+        state = self.__dict__.copy()
+        del state['cache']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.cache = FEATURE_CACHE
+
+    def copy(self):
+        state = BoardState.copy(self)
+        state.cache = self.cache
+        state.hash  = self.hash
+        return state
+
+    def add_piece(self, piece):
+        shape, rotation = piece['shape'], piece['rotation']
+
+        lines_cleared = BoardState.add_piece(self, piece)
+        if not lines_cleared and piece['y'] + PIECE_BOUNDS[shape][rotation][1] >= 0:
+            # The board wasn't refreshed, hash the new cells in
+            for Px, Py in PIECE_CELLS[shape][rotation]:
+                self.hash ^= ZOBRIST[piece['x'] + Px][piece['y'] + Py]
+        return lines_cleared
+
+    def apply_piece(self, piece):
+        shape, rotation = piece['shape'], piece['rotation']
+
+        old_hash = self.hash
+        lines_cleared, undo = BoardState.apply_piece(self, piece)
+        if not lines_cleared and piece['y'] + PIECE_BOUNDS[shape][rotation][1] >= 0:
+            for Px, Py in PIECE_CELLS[shape][rotation]:
+                self.hash ^= ZOBRIST[piece['x'] + Px][piece['y'] + Py]
+        return lines_cleared, (undo, old_hash)
+
+    def undo_piece(self, undo):
+        undo, self.hash = undo
+        BoardState.undo_piece(self, undo)
+
+    def evaluate_move(self, piece):
+        key   = (self.hash, piece['shape'], piece['rotation'], piece['x'])
+        entry = self.cache.get(key)
+        if entry is None:
+            features = BoardState.evaluate_move(self, piece)
+            self.cache.put(key, (features, piece['y']))
+            return features
+
+        features, piece['y'] = entry
+        return features
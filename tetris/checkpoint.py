@@ -0,0 +1,223 @@
+"""Binary checkpoints of a genetic algorithm run
+
+A checkpoint holds everything train_genetic_algorithm needs to carry on from
+the start of a generation: its settings, the population about to be
+evaluated, the ranking of the previous generation and the state of the global
+random generator. The layout, all little endian:
+
+    header      magic, version, generation, generations, population size,
+                genes, eval runs, iterations, bag
+    strings     engine and fitness names and racing schedule (JSON, empty
+                without racing), length prefixed UTF-8
+    best        kind (0 none, 1 int, 2 float), score, flag set when the best
+                chromosome follows, best chromosome
+    population  population size x genes doubles
+    ranking     count, then per ranked chromosome: fitness (kind and value),
+                genes doubles and eval runs int64 game scores
+    random      version, 625 words, gauss_next flag and value
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+
+MAGIC   = b'TGCK'
+VERSION = 1
+
+HEADER   = struct.Struct('<4sHIIIIII?')
+STRING   = struct.Struct('<H')
+NUMBER   = struct.Struct('<Bd')
+INTEGER  = struct.Struct('<Bq')
+COUNT    = struct.Struct('<I')
+FLAG     = struct.Struct('<?')
+RANDOM   = struct.Struct('<I625I?d')
+
+# Kinds of a stored score, so ints come back as ints
+NONE, INT, FLOAT = 0, 1, 2
+
+
+def _pack_number(value):
+    if value is None:
+        return NUMBER.pack(NONE, 0.0)
+    if isinstance(value, int):
+        return INTEGER.pack(INT, value)
+    return NUMBER.pack(FLOAT, value)
+
+
+def _unpack_number(data, offset):
+    kind, = struct.unpack_from('<B', data, offset)
+    if kind == INT:
+        return INTEGER.unpack_from(data, offset)[1], offset + INTEGER.size
+    value = NUMBER.unpack_from(data, offset)[1]
+    return (value if kind == FLOAT else None), offset + NUMBER.size
+
+
+def _pack_string(text):
+    encoded = text.encode('utf-8')
+    return STRING.pack(len(encoded)) + encoded
+
+
+def _unpack_string(data, offset):
+    length, = STRING.unpack_from(data, offset)
+    offset += STRING.size
+    return data[offset:offset + length].decode('utf-8'), offset + length
+
+
+def pack_checkpoint(checkpoint):
+    """Return the bytes of a checkpoint dict.
+
+    The dict has the keys generation, generations, iterations, eval_runs,
+    engine, fitness, racing, bag, population, ranking (list of (fitness,
+    chromosome, games) of the last generation, best first), best_score,
+    best_chromosome and random_state (from random.getstate()).
+
+    """
+    population = checkpoint['population']
+    genes      = len(population[0])
+    eval_runs  = checkpoint['eval_runs']
+
+    parts = [HEADER.pack(MAGIC, VERSION, checkpoint['generation'], checkpoint['generations'], len(population),
+                         genes, eval_runs, checkpoint['iterations'], checkpoint['bag']),
+             _pack_string(checkpoint['engine']),
+             _pack_string(checkpoint['fitness']),
+             _pack_string(json.dumps(checkpoint['racing']) if checkpoint['racing'] else ''),
+             _pack_number(checkpoint['best_score'])]
+
+    best_chromosome = checkpoint['best_chromosome']
+    parts.append(FLAG.pack(best_chromosome is not None))
+    if best_chromosome is not None:
+        if len(best_chromosome) != genes:
+            raise ValueError(f"the best chromosome needs {genes} genes like the population")
+        parts.append(struct.pack(f'<{genes}d', *best_chromosome))
+
+    parts.append(struct.pack(f'<{len(population) * genes}d', *[gene for chrom in population for gene in chrom]))
+
+    ranking = checkpoint['ranking']
+    parts.append(COUNT.pack(len(ranking)))
+    for score, chrom, games in ranking:
+        parts.append(_pack_number(score))
+        parts.append(struct.pack(f'<{genes}d{eval_runs}q', *chrom, *games))
+
+    version, words, gauss_next = checkpoint['random_state']
+    parts.append(RANDOM.pack(version, *words, gauss_next is not None, gauss_next or 0.0))
+
+    return b''.join(parts)
+
+
+def unpack_checkpoint(data):
+    """Return the checkpoint dict packed in data"""
+
+    magic, version, generation, generations, population_size, genes, eval_runs, iterations, bag = \
+        HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a training checkpoint")
+    if version != VERSION:
+        raise ValueError(f"unsupported checkpoint version {version}")
+
+    offset = HEADER.size
+    engine, offset     = _unpack_string(data, offset)
+    fitness, offset    = _unpack_string(data, offset)
+    racing, offset     = _unpack_string(data, offset)
+    racing = [tuple(round_) for round_ in json.loads(racing)] if racing else None
+    best_score, offset = _unpack_number(data, offset)
+    has_best, = FLAG.unpack_from(data, offset)
+    offset += FLAG.size
+
+    best_chromosome = None
+    if has_best:
+        best_chromosome = list(struct.unpack_from(f'<{genes}d', data, offset))
+        offset += 8 * genes
+
+    flat = struct.unpack_from(f'<{population_size * genes}d', data, offset)
+    offset += 8 * population_size * genes
+    population = [list(flat[i:i + genes]) for i in range(0, len(flat), genes)]
+
+    ranking = []
+    count, = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    entry = struct.Struct(f'<{genes}d{eval_runs}q')
+    for _ in range(count):
+        score, offset = _unpack_number(data, offset)
+        values = entry.unpack_from(data, offset)
+        offset += entry.size
+        ranking.append((score, list(values[:genes]), list(values[genes:])))
+
+    values = RANDOM.unpack_from(data, offset)
+    random_state = (values[0], tuple(values[1:626]), values[627] if values[626] else None)
+
+    return {'generation':      generation,
+            'generations':     generations,
+            'iterations':      iterations,
+            'eval_runs':       eval_runs,
+            'engine':          engine,
+            'fitness':         fitness,
+            'racing':          racing,
+            'bag':             bag,
+            'population':      population,
+            'ranking':         ranking,
+            'best_score':      best_score,
+            'best_chromosome': best_chromosome,
+            'random_state':    random_state}
+
+
+def write_atomic(filename, data):
+    """Write bytes to a file so that it always holds either its previous or
+    its new contents, even if the process is killed while writing"""
+
+    temp = filename + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, filename)
+
+
+def load_checkpoint(filename):
+    with open(filename, 'rb') as f:
+        return unpack_checkpoint(f.read())
+
+
+class CheckpointWriter:
+    """Write checkpoints on a background thread.
+
+    The checkpoint is packed when it is saved, so later changes to the
+    training state don't leak into it, and written to disk by the thread while
+    the training goes on. close() waits for the pending writes.
+
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.error    = None
+        self.pending  = queue.Queue()
+        self.thread   = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            data = self.pending.get()
+            if data is None:
+                return
+            try:
+                write_atomic(self.filename, data)
+            except OSError as error:
+                self.error = error
+
+    def save(self, checkpoint):
+        if self.error is not None:
+            raise self.error
+        self.pending.put(pack_checkpoint(checkpoint))
+
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
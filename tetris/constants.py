@@ -0,0 +1,47 @@
+"""Board, timing and color constants shared by the game and the simulations"""
+
+##############################################################################
+# SETTING UP GENERAL CONSTANTS
+##############################################################################
+
+# Board config
+FPS          = 35
+WINDOWWIDTH  = 650
+WINDOWHEIGHT = 690
+BOXSIZE      = 25
+BOARDWIDTH   = 10
+BOARDHEIGHT  = 25
+BLANK        = '.'
+XMARGIN      = int((WINDOWWIDTH - BOARDWIDTH * BOXSIZE) / 2)
+TOPMARGIN    = WINDOWHEIGHT - (BOARDHEIGHT * BOXSIZE) - 5
+
+# Timing config
+MOVESIDEWAYSFREQ = 0.15
+MOVEDOWNFREQ     = 0.1
+
+# Colors
+#               R    G    B
+WHITE       = (255, 255, 255)
+GRAY        = (185, 185, 185)
+BLACK       = (  0,   0,   0)
+RED         = (155,   0,   0)
+LIGHTRED    = (175,  20,  20)
+GREEN       = (  0, 155,   0)
+LIGHTGREEN  = ( 20, 175,  20)
+BLUE        = (  0,   0, 155)
+LIGHTBLUE   = ( 20,  20, 175)
+YELLOW      = (155, 155,   0)
+LIGHTYELLOW = (175, 175,  20)
+PURPLE      = (128,   0, 128)
+ORANGE      = (255, 165,   0)
+LIGHTGRAY   = (211, 211, 211)
+
+BORDERCOLOR     = BLUE
+BGCOLOR         = BLACK
+TEXTCOLOR       = WHITE
+TEXTSHADOWCOLOR = GRAY
+COLORS          = (     BLUE,      GREEN,      RED,      YELLOW)
+LIGHTCOLORS     = (LIGHTBLUE, LIGHTGREEN, LIGHTRED, LIGHTYELLOW)
+
+# Each color must have light color
+assert len(COLORS) == len(LIGHTCOLORS)
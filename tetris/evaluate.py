@@ -0,0 +1,266 @@
+"""Multi-seed evaluation of chromosomes
+
+Every chromosome plays one game per seed, the seed dealing the pieces of the
+game, so all the chromosomes face the same games and a run can be repeated.
+The games are spread over a process pool and each result is written to a CSV
+or JSON lines file (by the file extension) as soon as its game finishes. The
+summary gives the mean, median, percentiles and confidence intervals of the
+scores of every chromosome.
+
+The chromosomes are read from files with 'Best Chromosome: [...]' lines (like
+best_chromosome.txt) or one list per line, or given as a list literal. Usage:
+
+    python -m tetris evaluate [CHROMOSOME ...] [--seeds START:STOP] [--pieces N] [--workers N] [--output FILE]
+"""
+
+import argparse
+import ast
+import csv
+import json
+import math
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+from .batch import LINE_CLEAR_NAMES
+from .pieces import PieceSource
+from .simulation import SIMULATION_ENGINES, run_tetris_game
+
+# Columns of a result, in the order they are written
+RESULT_FIELDS = ('chromosome', 'seed', 'score', 'pieces') + LINE_CLEAR_NAMES + ('seconds',)
+
+
+def load_chromosomes(filename):
+    """Return the chromosomes of a file, from its 'Best Chromosome:' lines or
+    its lines holding a list"""
+
+    chromosomes = []
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.startswith('Best Chromosome:'):
+                line = line.split(':', 1)[1]
+            line = line.strip()
+            if line.startswith('['):
+                chromosomes.append(list(ast.literal_eval(line)))
+
+    if not chromosomes:
+        raise ValueError(f"no chromosome found in {filename}")
+    return chromosomes
+
+
+def parse_seeds(text):
+    """Return the seeds of 'START:STOP' (a range) or 'A,B,C' (a list).
+
+    The results are matched to their games by seed, so an empty range or a
+    seed given twice raises an argparse.ArgumentTypeError.
+
+    """
+    if ':' in text:
+        start, stop = text.split(':')
+        seeds = list(range(int(start), int(stop)))
+    else:
+        seeds = [int(seed) for seed in text.split(',')]
+
+    if not seeds:
+        raise argparse.ArgumentTypeError(f"no seed in {text}")
+    if len(set(seeds)) != len(seeds):
+        raise argparse.ArgumentTypeError(f"duplicate seeds in {text}")
+    return seeds
+
+
+def evaluate_game(index, chromosome, seed, iterations, engine, bag, lookahead):
+    """Play the game of a seed with a chromosome and return its result, a dict
+    with the RESULT_FIELDS"""
+
+    stats  = run_tetris_game(chromosome, iterations, engine, pieces=PieceSource(seed, bag), lookahead=lookahead)
+    result = {'chromosome': index, 'seed': seed, 'score': stats['score'], 'pieces': stats['pieces']}
+    result.update(stats['lines'])
+    result['seconds'] = round(stats['seconds'], 4)
+    return result
+
+
+def _evaluate_task(task):
+    return evaluate_game(*task)
+
+
+def iter_evaluations(chromosomes, seeds, iterations=600, engine='list', bag=False, lookahead=False, workers=None,
+                     chunksize=1):
+    """Play every chromosome on the game of every seed and yield the result of
+    each game (see evaluate_game) as soon as it finishes.
+
+    Args:
+        chromosomes: heuristic weights to evaluate
+        seeds:       seeds of the games every chromosome plays
+        iterations:  maximum number of pieces of each game
+        engine:      board engine from SIMULATION_ENGINES
+        bag:         deal the pieces with the 7-bag randomizer
+        lookahead:   search one ply deeper with the next piece
+        workers:     number of processes playing the games, one per CPU by
+                     default, 1 to play them in this process
+        chunksize:   number of games sent to a worker at a time
+
+    The games are handed out seed by seed, so the chromosomes progress
+    together and the results of a run cut short are still comparable.
+
+    """
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"unknown engine {engine}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    tasks = [(index, chromosome, seed, iterations, engine, bag, lookahead)
+             for seed in seeds for index, chromosome in enumerate(chromosomes)]
+
+    if workers <= 1:
+        for task in tasks:
+            yield evaluate_game(*task)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap_unordered(_evaluate_task, tasks, chunksize)
+
+
+class ResultWriter:
+    """Write game results to a CSV file, or a JSON lines file unless the
+    filename ends with .csv, flushing each one"""
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w', newline='')
+        if filename.endswith('.csv'):
+            self.writer = csv.DictWriter(self.file, RESULT_FIELDS)
+            self.writer.writeheader()
+        else:
+            self.writer = None
+
+    def write(self, result):
+        if self.writer is None:
+            self.file.write(json.dumps(result) + '\n')
+        else:
+            self.writer.writerow(result)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def summarize_scores(scores, confidence=0.95):
+    """Return the statistics of a list of game scores.
+
+    The dict has the number of games, the mean and its standard error, the
+    standard deviation, the median, the min and max, the 5th, 25th, 75th and
+    95th percentiles, and the (low, high) confidence intervals of the mean
+    (normal approximation) and of the median (from the order statistics, so
+    it holds whatever the distribution of the scores).
+
+    """
+    if not scores:
+        raise ValueError("no scores to summarize")
+    n      = len(scores)
+    ranked = sorted(scores)
+    mean   = statistics.fmean(ranked)
+    stdev  = statistics.stdev(ranked) if n > 1 else 0.0
+    error  = stdev / math.sqrt(n)
+    z      = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+    # The median lies between the ranks n/2 -+ z sqrt(n)/2 (counted from 1)
+    # with the given confidence
+    low  = max(int(math.floor((n - z * math.sqrt(n)) / 2)) - 1, 0)
+    high = min(int(math.ceil((n + z * math.sqrt(n)) / 2)), n - 1)
+
+    percentiles = statistics.quantiles(ranked, n=100, method='inclusive') if n > 1 else ranked * 99
+    return {'games':     n,
+            'mean':      mean,
+            'stderr':    error,
+            'stdev':     stdev,
+            'median':    statistics.median(ranked),
+            'min':       ranked[0],
+            'max':       ranked[-1],
+            'p5':        percentiles[4],
+            'p25':       percentiles[24],
+            'p75':       percentiles[74],
+            'p95':       percentiles[94],
+            'mean_ci':   (mean - z * error, mean + z * error),
+            'median_ci': (ranked[low], ranked[high])}
+
+
+def evaluate_chromosomes(chromosomes, seeds, iterations=600, output=None, confidence=0.95, progress=False, **kwargs):
+    """Evaluate the chromosomes like iter_evaluations and return the summary
+    of the scores of each of them, from summarize_scores.
+
+    Args:
+        output:     file every result is written to as it comes, see
+                    ResultWriter
+        confidence: confidence level of the intervals
+        progress:   report the number of games played on stderr
+
+    The other arguments are the ones of iter_evaluations.
+
+    """
+    scores = [{} for _ in chromosomes]
+    total  = len(chromosomes) * len(seeds)
+    writer = ResultWriter(output) if output else None
+    start  = time.perf_counter()
+    try:
+        for done, result in enumerate(iter_evaluations(chromosomes, seeds, iterations, **kwargs), 1):
+            scores[result['chromosome']][result['seed']] = result['score']
+            if writer is not None:
+                writer.write(result)
+            if progress and (done % max(total // 100, 1) == 0 or done == total):
+                elapsed = time.perf_counter() - start
+                print(f"\r{done}/{total} games, {done / elapsed:.1f} games/s", end='', file=sys.stderr)
+    finally:
+        if writer is not None:
+            writer.close()
+        if progress:
+            print(file=sys.stderr)
+
+    return [summarize_scores([chrom_scores[seed] for seed in seeds], confidence) for chrom_scores in scores]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tetris evaluate', description=__doc__.split('\n')[0])
+    parser.add_argument('chromosomes', nargs='*', default=['best_chromosome.txt'],
+                        help='chromosome files or list literals')
+    parser.add_argument('--seeds', type=parse_seeds, default='0:100',
+                        help='START:STOP range or comma separated list of distinct seeds')
+    parser.add_argument('--pieces', type=int, default=600, help='maximum number of pieces per game')
+    parser.add_argument('--engine', default='list', choices=sorted(SIMULATION_ENGINES), help='board engine')
+    parser.add_argument('--bag', action='store_true', help='deal the pieces with the 7-bag randomizer')
+    parser.add_argument('--lookahead', action='store_true', help='search one ply deeper with the next piece')
+    parser.add_argument('--workers', type=int, help='processes playing the games, one per CPU by default')
+    parser.add_argument('--chunksize', type=int, default=1, help='games sent to a worker at a time')
+    parser.add_argument('--confidence', type=float, default=0.95, help='confidence level of the intervals')
+    parser.add_argument('--output', help='CSV (.csv) or JSON lines file the game results are streamed to')
+    args = parser.parse_args(argv)
+
+    chromosomes = []
+    for source in args.chromosomes:
+        if source.lstrip().startswith('['):
+            chromosomes.append(list(ast.literal_eval(source)))
+        else:
+            chromosomes.extend(load_chromosomes(source))
+
+    summaries = evaluate_chromosomes(chromosomes, args.seeds, args.pieces, output=args.output,
+                                     confidence=args.confidence, progress=True, engine=args.engine, bag=args.bag,
+                                     lookahead=args.lookahead, workers=args.workers, chunksize=args.chunksize)
+
+    level = f"{args.confidence:.0%}"
+    print(f"{'#':>3} {'games':>6} {'mean':>9} {f'mean {level} CI':>19} {'median':>9} {f'median {level} CI':>19} "
+          f"{'p5':>8} {'p95':>8} {'min':>7} {'max':>7}")
+    for index, summary in enumerate(summaries):
+        mean_ci, median_ci = summary['mean_ci'], summary['median_ci']
+        print(f"{index:>3} {summary['games']:>6} {summary['mean']:>9.1f} "
+              f"{f'{mean_ci[0]:.1f} - {mean_ci[1]:.1f}':>19} {summary['median']:>9.1f} "
+              f"{f'{median_ci[0]} - {median_ci[1]}':>19} {summary['p5']:>8.1f} {summary['p95']:>8.1f} "
+              f"{summary['min']:>7} {summary['max']:>7}")
+    for index, chromosome in enumerate(chromosomes):
+        print(f"{index:>3} {chromosome}")
+    return summaries
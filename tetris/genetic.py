@@ -0,0 +1,407 @@
+"""Genetic algorithm training the AI chromosome"""
+
+import math
+import multiprocessing
+import random
+import statistics
+import time
+
+from .checkpoint import CheckpointWriter, load_checkpoint, write_atomic
+from .evaluate import iter_evaluations
+from .pieces import generate_piece_sequence
+from .shared import SharedEvaluation, attach_worker, evaluate_shared_chromosome, evaluate_shared_sequence
+from .metrics import MetricsLog, generation_metrics
+from .simulation import POPULATION_ENGINES, TetrisGame, run_tetris_game, run_tetris_simulation
+
+
+def init_population(size, num_chromosomes):
+    return [[random.uniform(-5, 5) for _ in range(num_chromosomes)] for _ in range(size)]
+
+
+def crossover(parent1, parent2):
+    return [(a + b) / 2 for a, b in zip(parent1, parent2)]
+
+
+def mutate(chromosome, mutation_rate=0.1):
+    return [
+        gene + random.uniform(-1, 1) if random.random() < mutation_rate else gene
+        for gene in chromosome
+    ]
+
+
+# Number of best chromosomes kept from one generation to the next
+ELITE_SIZE = 5
+
+# Default racing schedule: (fraction of the pieces played, fraction of the
+# chromosomes kept) of every elimination round
+RACING_SCHEDULE = ((0.1, 0.5), (0.25, 0.5), (0.5, 0.75))
+
+
+def next_generation(ranked, population_size):
+    """Return the next population: the ELITE_SIZE best chromosomes of ranked
+    (best first) and mutated crossovers of two of them"""
+
+    top = ranked[:ELITE_SIZE]
+    new_population = top[:]
+    while len(new_population) < population_size:
+        p1, p2 = random.sample(top, 2)
+        child = mutate(crossover(p1, p2))
+        new_population.append(child)
+    return new_population
+
+
+# Statistics train_genetic_algorithm can use to turn the scores of a
+# chromosome's games into its fitness
+FITNESS_STATISTICS = {'mean':   statistics.mean,
+                      'median': statistics.median,
+                      'min':    min,
+                      'max':    max}
+
+
+def evaluate_chromosome(chromosome, iterations, sequences, engine='list', details=False):
+    """Return the scores of a chromosome on each of the piece sequences, or the
+    statistics of the games (from run_tetris_game) with details"""
+
+    if details:
+        return [run_tetris_game(chromosome, iterations, engine, pieces=sequence) for sequence in sequences]
+    return [run_tetris_simulation(chromosome, iterations, engine, pieces=sequence) for sequence in sequences]
+
+
+def evaluate_population(population, iterations, sequences, engine='list', pool=None, chunksize=1, details=False,
+                        shared=None):
+    """Return the scores of every chromosome on each of the piece sequences.
+
+    Every chromosome replays the same sequences, so they all face the same
+    games.
+
+    Args:
+        population: chromosomes to evaluate
+        iterations: maximum number of pieces of each game
+        sequences:  piece sequences from generate_piece_sequence, with at
+                    least iterations + 2 pieces each
+        engine:     board engine from SIMULATION_ENGINES, or from
+                    POPULATION_ENGINES to play each sequence for the whole
+                    population at once
+        pool:       multiprocessing pool to play the games on, or None to play
+                    them in this process
+        chunksize:  number of chromosomes sent to a pool worker at a time,
+                    with a population engine the pool gets one sequence per task
+        details:    return the statistics of every game instead of its score
+        shared:     SharedEvaluation the pool workers are attached to, to pass
+                    the sequences and scores through (see tetris.shared)
+
+    """
+    if shared is not None and pool is not None and not details:
+        shared.set_sequences(sequences)
+        if engine in POPULATION_ENGINES:
+            pool.starmap(evaluate_shared_sequence,
+                         [(game, population, iterations, engine) for game in range(len(sequences))])
+        else:
+            pool.starmap(evaluate_shared_chromosome,
+                         [(row, chrom, iterations, engine) for row, chrom in enumerate(population)], chunksize)
+        return shared.read_scores(len(population))
+
+    if engine in POPULATION_ENGINES:
+        tasks = [(population, iterations, sequence, details) for sequence in sequences]
+        if pool is None:
+            results = [POPULATION_ENGINES[engine](*task) for task in tasks]
+        else:
+            results = pool.starmap(POPULATION_ENGINES[engine], tasks)
+        # One list of scores per sequence, turned into one per chromosome
+        return [list(games) for games in zip(*results)]
+
+    tasks = [(chrom, iterations, sequences, engine, details) for chrom in population]
+
+    if pool is None:
+        return [evaluate_chromosome(*task) for task in tasks]
+
+    return pool.starmap(evaluate_chromosome, tasks, chunksize)
+
+
+def _advance_games(games, iterations):
+    for game in games:
+        game.advance(iterations)
+    return games
+
+
+def race_population(population, iterations, sequences, statistic, schedule=RACING_SCHEDULE, engine='list',
+                    pool=None, chunksize=1, details=False, min_keep=ELITE_SIZE):
+    """Evaluate a population racing the chromosomes against each other.
+
+    Every chromosome starts its games on the shared sequences. After each round
+    of the schedule the chromosomes are ranked by the fitness of their games so
+    far and only the best ones carry on, the last survivors playing the full
+    games. The survivors' results are the ones evaluate_population gives, and
+    as a game score never decreases, every survivor ranks above the
+    chromosomes dropped before it.
+
+    Args:
+        statistic: fitness of a chromosome from the list of its game scores
+        schedule:  (fraction of the pieces played, fraction of the chromosomes
+                   kept) of every round, in increasing order of pieces
+        min_keep:  number of chromosomes always kept, the ones selected for the
+                   next generation
+        pool:      multiprocessing pool advancing the games, which are sent to
+                   the workers and back every round
+
+    Return the scores of every chromosome's games, or their statistics with
+    details, as evaluate_population does.
+
+    """
+    games = [[TetrisGame(chrom, engine, pieces=sequence) for sequence in sequences] for chrom in population]
+    alive = list(range(len(population)))
+
+    for fraction, keep in list(schedule) + [(1.0, 1.0)]:
+        budget = max(1, int(iterations * fraction))
+        if pool is None:
+            for i in alive:
+                _advance_games(games[i], budget)
+        else:
+            advanced = pool.starmap(_advance_games, [(games[i], budget) for i in alive], chunksize)
+            for i, chrom_games in zip(alive, advanced):
+                games[i] = chrom_games
+
+        if fraction >= 1.0:
+            break
+
+        fitness = {i: statistic([game.score for game in games[i]]) for i in alive}
+        ranked  = sorted(alive, key=lambda i: fitness[i], reverse=True)
+        alive   = sorted(ranked[:max(math.ceil(keep * len(alive)), min_keep)])
+
+    if details:
+        return [[game.stats() for game in chrom_games] for chrom_games in games]
+    return [[game.score for game in chrom_games] for chrom_games in games]
+
+
+def write_best_chromosome(chromosome, score, filename='best_chromosome.txt'):
+    """Write the best chromosome file with write_atomic, so that it is always
+    whole, even if the run is killed while writing"""
+
+    write_atomic(filename, f"Best Chromosome: {chromosome}\nBest Score: {score}\n".encode())
+
+
+# First seed of the held-out games confirming a target score, above the
+# getrandbits(32) seeds of the training games
+HOLDOUT_SEED = 2 ** 32
+
+
+def holdout_fitness(chromosome, statistic, iterations, games, engine='list', bag=False, workers=None):
+    """Return the fitness of a chromosome on the games of held-out seeds, which
+    no training game uses, played with tetris.evaluate"""
+
+    if engine in POPULATION_ENGINES:
+        # The population engines give the scores of the list engine
+        engine = 'list'
+    seeds  = range(HOLDOUT_SEED, HOLDOUT_SEED + games)
+    scores = {result['seed']: result['score']
+              for result in iter_evaluations([chromosome], seeds, iterations, engine, bag, workers=workers or 1)}
+    return statistic([scores[seed] for seed in seeds])
+
+
+def train_genetic_algorithm(iterations=500, population_size=15, generations=10, eval_runs=5, engine='list',
+                            workers=None, chunksize=1, fitness='mean', bag=False, checkpoint=None,
+                            checkpoint_every=1, resume=None, metrics=None, racing=None, optimizer='ga',
+                            target=None, target_games=20):
+    """Train the AI chromosome with a genetic algorithm.
+
+    Every generation draws eval_runs seeds from the global random generator
+    and all the chromosomes play the same eval_runs games. The results are the
+    same whatever the number of workers.
+
+    Args:
+        eval_runs:        number of games each chromosome plays per generation
+        workers:          number of processes evaluating the population, None
+                          or 1 to evaluate it in this process
+        chunksize:        number of chromosomes sent to a worker at a time
+        fitness:          statistic of a chromosome's scores used as its
+                          fitness, a FITNESS_STATISTICS name or a function of
+                          the list of scores
+        bag:              deal the pieces of the games with the 7-bag randomizer
+        checkpoint:       file the training state is saved to, in the
+                          background, every checkpoint_every generations and
+                          after the last one
+        checkpoint_every: number of generations between checkpoints
+        resume:           checkpoint dict (from load_checkpoint) to carry on
+                          from, the run then goes on exactly as if it had
+                          never stopped
+        metrics:          JSON lines file the per generation and per
+                          chromosome statistics are appended to, see
+                          tetris.metrics
+        racing:           evaluate the population with race_population, True
+                          for the RACING_SCHEDULE or a schedule of rounds
+        optimizer:        'ga' for this genetic algorithm, or the name of a
+                          numpy optimizer from tetris.optimizers.OPTIMIZERS
+                          making the next generations instead; those can't
+                          race, checkpoint or resume
+        target:           stop after the first generation whose best
+                          chromosome reaches target, also on target_games
+                          held-out games (see holdout_fitness)
+        target_games:     number of held-out games confirming the target
+
+    """
+    statistic = FITNESS_STATISTICS[fitness] if isinstance(fitness, str) else fitness
+
+    if racing is True:
+        racing = RACING_SCHEDULE
+    if racing and engine in POPULATION_ENGINES:
+        raise ValueError(f"the {engine} engine can't race the population")
+
+    search = None
+    if optimizer != 'ga':
+        # Imported here as the optimizers build on this module
+        from .optimizers import OPTIMIZERS
+        if optimizer not in OPTIMIZERS:
+            raise ValueError(f"unknown optimizer {optimizer}")
+        if racing or checkpoint or resume is not None:
+            raise ValueError(f"the {optimizer} optimizer can't race, checkpoint or resume")
+        search = OPTIMIZERS[optimizer](population_size, 5, random.getrandbits(64))
+
+    if resume is None:
+        population = init_population(population_size, 5) if search is None else search.ask().tolist()
+        best_chromosome = None
+        best_score = -1
+        ranking = []
+        start = 0
+    else:
+        population = resume['population']
+        best_chromosome, best_score = resume['best_chromosome'], resume['best_score']
+        ranking = resume['ranking']
+        start = resume['generation']
+        random.setstate(resume['random_state'])
+
+    def training_state(generation):
+        return {'generation':      generation,
+                'generations':     generations,
+                'iterations':      iterations,
+                'eval_runs':       eval_runs,
+                'engine':          engine,
+                'fitness':         fitness if isinstance(fitness, str) else '',
+                'racing':          racing,
+                'bag':             bag,
+                'population':      population,
+                'ranking':         ranking,
+                'best_score':      best_score,
+                'best_chromosome': best_chromosome,
+                'random_state':    random.getstate()}
+
+    # Made in the try, so the finally releases whatever was made if setting
+    # up the rest fails
+    writer, log, pool, shared = None, None, None, None
+    try:
+        writer = CheckpointWriter(checkpoint) if checkpoint else None
+        log = MetricsLog(metrics) if metrics else None
+        if log is not None:
+            log.log('run', settings={'iterations': iterations, 'population_size': population_size,
+                                     'generations': generations, 'eval_runs': eval_runs, 'engine': engine,
+                                     'workers': workers, 'fitness': fitness if isinstance(fitness, str) else '',
+                                     'bag': bag, 'racing': racing, 'optimizer': optimizer, 'start': start})
+
+        # The workers get the sequences and give the scores back through
+        # shared memory, unless they send back whole games
+        if workers and workers > 1:
+            if racing or log is not None:
+                pool = multiprocessing.Pool(workers)
+            else:
+                shared = SharedEvaluation(population_size, eval_runs, iterations + 2)
+                pool   = multiprocessing.Pool(workers, attach_worker, (shared.spec,))
+
+        for gen in range(start, generations):
+            gen_start = time.perf_counter()
+            seeds     = [random.getrandbits(32) for _ in range(eval_runs)]
+            sequences = [generate_piece_sequence(seed, iterations + 2, bag) for seed in seeds]
+            if racing:
+                results = race_population(population, iterations, sequences, statistic, racing, engine, pool,
+                                          chunksize, details=log is not None)
+            else:
+                results = evaluate_population(population, iterations, sequences, engine, pool, chunksize,
+                                              details=log is not None, shared=shared)
+            gen_seconds = time.perf_counter() - gen_start
+
+            if log is not None:
+                details = results
+                results = [[game['score'] for game in games] for games in details]
+
+            scores = [(statistic(games), chrom, games) for chrom, games in zip(population, results)]
+            # Fitness of the chromosomes in population order, for the optimizer
+            population_fitness = [score for score, _, _ in scores]
+            if log is not None:
+                for i, (score, chrom, games) in enumerate(scores):
+                    log.log('chromosome', generation=gen, index=i, chromosome=chrom, fitness=score,
+                            games=details[i])
+            scores.sort(reverse=True, key=lambda x: x[0])
+
+            best_games = scores[0][2]
+            best_std   = statistics.stdev(best_games) if len(best_games) > 1 else 0.0
+            print(f"Generation {gen}: Best Score = {scores[0][0]:.1f} "
+                  f"(mean = {statistics.mean(best_games):.1f}, std = {best_std:.1f} over {eval_runs} games), "
+                  f"Population Mean = {statistics.mean(score for score, _, _ in scores):.1f}")
+            if log is not None:
+                log.log('generation', generation=gen, best_fitness=scores[0][0], best_chromosome=scores[0][1],
+                        best_mean=statistics.mean(best_games), best_std=best_std,
+                        population_mean=statistics.mean(score for score, _, _ in scores),
+                        **generation_metrics([game for games in details for game in games], gen_seconds))
+                log.flush()
+
+            best_score, best_chromosome = scores[0][:2]
+            ranking = scores
+            if search is None:
+                population = next_generation([chrom for _, chrom, _ in scores], population_size)
+            else:
+                search.tell(population_fitness)
+                population = search.ask().tolist()
+
+            reached = False
+            if target is not None and best_score >= target:
+                confirmed = holdout_fitness(best_chromosome, statistic, iterations, target_games, engine, bag,
+                                            workers)
+                reached   = confirmed >= target
+                print(f"Generation {gen}: Held-out Score = {confirmed:.1f} over {target_games} games, "
+                      f"target {target} {'reached' if reached else 'missed'}")
+                if log is not None:
+                    log.log('target', generation=gen, target=target, fitness=best_score,
+                            holdout_fitness=confirmed, games=target_games, reached=reached)
+
+            if writer is not None and ((gen + 1) % checkpoint_every == 0 or gen + 1 == generations or reached):
+                writer.save(training_state(gen + 1))
+            if reached:
+                break
+
+        if log is not None:
+            log.log('end', best_score=best_score, best_chromosome=best_chromosome)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if shared is not None:
+            shared.close()
+        if writer is not None:
+            writer.close()
+        if log is not None:
+            log.close()
+
+    write_best_chromosome(best_chromosome, best_score)
+    return best_chromosome
+
+
+def resume_genetic_algorithm(filename, generations=None, workers=None, chunksize=1, fitness=None,
+                             checkpoint=None, checkpoint_every=1):
+    """Carry on the training saved in a checkpoint file.
+
+    The settings of the run come from the checkpoint, generations can extend
+    it. The run keeps checkpointing to the same file unless another one is
+    given. fitness is only needed when the run used a fitness function rather
+    than a FITNESS_STATISTICS name.
+
+    """
+    state = load_checkpoint(filename)
+    if fitness is None:
+        if not state['fitness']:
+            raise ValueError("the checkpoint was made with a fitness function, pass it as fitness")
+        fitness = state['fitness']
+
+    return train_genetic_algorithm(iterations=state['iterations'], population_size=len(state['population']),
+                                   generations=state['generations'] if generations is None else generations,
+                                   eval_runs=state['eval_runs'], engine=state['engine'], workers=workers,
+                                   chunksize=chunksize, fitness=fitness, bag=state['bag'], racing=state['racing'],
+                                   checkpoint=filename if checkpoint is None else checkpoint,
+                                   checkpoint_every=checkpoint_every, resume=state)
@@ -0,0 +1,177 @@
+"""Heuristics the AI uses to rate a move"""
+
+from .constants import BOARDWIDTH, BOARDHEIGHT, BLANK
+from .pieces import TEMPLATEWIDTH, TEMPLATEHEIGHT, PIECE_CELLS, PIECE_BLANK_CELLS
+from .board import (apply_piece, undo_piece, is_valid_position, column_height, drop_piece,
+                    drop_piece_stepwise)
+
+
+def calc_move_info(board, piece, x, r, total_holes_bef, total_blocking_bloks_bef, heights=None):
+    """Calculate informations based on the current play
+
+    If the column heights of the board are given, the piece is dropped
+    straight to its landing row instead of one row at a time.
+
+    """
+
+    piece['rotation'] = r
+    piece['y']        = 0
+    piece['x']        = x
+
+    # Check if it's a valid position
+    if (not is_valid_position(board, piece)):
+        return [False]
+
+    # Goes down the piece while it's a valid position
+    if heights is None:
+        drop_piece_stepwise(board, piece)
+    else:
+        drop_piece(board, piece, heights)
+
+    # Calculate the sides in contact
+    piece_sides, floor_sides, wall_sides = calc_sides_in_contact(board, piece)
+
+    # Play the move on the board itself, read the board it leaves and take
+    # the piece back off
+    record = apply_piece(board, piece)
+
+    # Calculate removed lines
+    num_removed_lines = len(record[1])
+
+    total_blocking_block = 0
+    total_holes          = 0
+    max_height           = 0
+    bumpiness = calculate_bumpiness(board)
+
+    for x2 in range(0, BOARDWIDTH):
+        b = calc_heuristics(board, x2)
+        total_holes += b[0]
+        total_blocking_block += b[1]
+        max_height += b[2]
+
+    undo_piece(board, record)
+
+    new_holes           = total_holes - total_holes_bef
+    new_blocking_blocks = total_blocking_block - total_blocking_bloks_bef
+
+    return [True, max_height, num_removed_lines, new_holes, bumpiness, new_blocking_blocks, piece_sides, floor_sides, wall_sides]
+
+
+def calc_initial_move_info(board):
+    total_holes          = 0
+    total_blocking_bocks = 0
+
+    for x2 in range(0, BOARDWIDTH):
+        b = calc_heuristics(board, x2)
+
+        total_holes          += b[0]
+        total_blocking_bocks += b[1]
+
+    return total_holes, total_blocking_bocks
+
+
+def calc_heuristics(board, x):
+    """
+    Calculate heuristics
+    The heuristics are composed by: number of holes, number of blocks above
+    hole and maximum height
+    """
+    total_holes        = 0
+    locals_holes       = 0
+    blocks_above_holes = 0
+    is_hole_exist      = False
+    sum_heights        = 0
+
+    for y in range(BOARDHEIGHT-1, -1,-1):
+        if board[x][y] == BLANK:
+            locals_holes += 1
+        else:
+            sum_heights += BOARDHEIGHT-y
+
+            if locals_holes > 0:
+                total_holes += locals_holes
+                locals_holes = 0
+
+            if total_holes > 0:
+                blocks_above_holes += 1
+
+    return total_holes, blocks_above_holes, sum_heights
+
+
+def calc_sides_in_contact(board, piece):
+    """Calculate sides in contacts"""
+
+    piece_sides = 0
+    floor_sides = 0
+    wall_sides  = 0
+
+    for Px, Py in PIECE_CELLS[piece['shape']][piece['rotation']]:
+        x = piece['x'] + Px
+        y = piece['y'] + Py
+
+        # Wall
+        if x == 0 or x == BOARDWIDTH-1:
+            wall_sides += 1
+
+        if y == BOARDHEIGHT-1:
+            floor_sides += 1
+        else:
+        # Para outras opecas no contorno do template:
+            if Py == TEMPLATEHEIGHT-1 and not board[x][y+1] == BLANK:
+                piece_sides += 1
+
+        #os extremos do template sao colorido: confere se ha pecas do lado deles
+        if Px == 0 and x > 0 and not board[x-1][y] == BLANK:
+                piece_sides += 1
+
+        if Px == TEMPLATEWIDTH-1 and x < BOARDWIDTH -1 and not board[x+1][y] == BLANK:
+                piece_sides += 1
+
+    # Other pieces in general
+    for (Px, Py), neighbours in PIECE_BLANK_CELLS[piece['shape']][piece['rotation']]:
+        x = piece['x'] + Px
+        y = piece['y'] + Py
+
+        # O quadrante vazio do template esta colorido no tabuleiro
+        if x < BOARDWIDTH and x >= 0 and y < BOARDHEIGHT and not board[x][y] == BLANK:
+            piece_sides += neighbours
+
+    return  piece_sides, floor_sides, wall_sides
+
+##############################################################
+
+def rate_move(board, piece, chromosomes, heights=None):
+    move_info = calc_move_info(board, piece, piece['x'], piece['rotation'], *calc_initial_move_info(board), heights=heights)
+    if not move_info[0]:
+        return -1
+    return rate_features((move_info[2], move_info[1], move_info[3], move_info[4], move_info[5]), chromosomes)
+
+
+def rate_features(features, chromosomes):
+    """Rate the (lines cleared, max height, new holes, bumpiness, new blocking
+    blocks) features of a move with the weights of a chromosome"""
+
+    return (
+        chromosomes[0] * features[0] +  # lines cleared
+        chromosomes[1] * features[1] +  # max height
+        chromosomes[2] * features[2] +  # new holes
+        chromosomes[3] * features[3] +  # bumpiness
+        chromosomes[4] * features[4]    # new blocking blocks
+    )
+
+
+def count_holes(board):
+    holes = 0
+    for x in range(BOARDWIDTH):
+        block_found = False
+        for y in range(BOARDHEIGHT):
+            if board[x][y] != BLANK:
+                block_found = True
+            elif block_found:
+                holes += 1
+    return holes
+
+
+def calculate_bumpiness(board):
+    heights = [column_height(board, x) for x in range(BOARDWIDTH)]
+    return sum(abs(heights[i] - heights[i+1]) for i in range(len(heights) - 1))
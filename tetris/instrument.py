@@ -0,0 +1,203 @@
+"""Opt-in instrumentation of the simulation hot paths
+
+enable() wraps the hot functions and the simulation phases (search, drop and
+clear) with timers, disable() puts the original functions back, so there is
+no overhead at all while instrumentation is off. The profiler counts calls
+and accumulates the total and self time of every wrapped function, and keeps
+the self time of every call stack for a flame graph:
+
+    from tetris import instrument
+    with instrument.profiling() as profiler:
+        run_tetris_simulation(chromosome)
+    profiler.print_stats()
+    profiler.write_collapsed('tetris.folded')   # flamegraph.pl tetris.folded
+
+run_tetris_game adds the profile of the game to its statistics while a
+profiler is enabled.
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+
+# Module level functions timed under their own name, wherever they are
+# imported in the package
+HOT_FUNCTIONS = ('run_tetris_game', 'rate_placements', 'is_valid_position', 'calc_move_info',
+                 'calc_initial_move_info', 'calc_heuristics', 'calc_sides_in_contact', 'calculate_bumpiness',
+                 'remove_complete_lines', 'get_blank_board', 'drop_piece_stepwise', 'add_to_board',
+                 'apply_piece', 'undo_piece', 'evaluate_placements', 'bb_calc_move_info', 'bb_calc_heuristics',
+                 'bb_remove_complete_lines')
+
+# The simulation phases: the move search, and the drop and the line clears
+# of the board engines
+PHASE_FUNCTIONS = {'find_best_move': 'search'}
+PHASE_METHODS   = {'drop_piece': 'drop', 'add_piece': 'clear'}
+
+# Board engine methods timed as Engine.method
+HOT_METHODS = ('evaluate_move', '_evaluate_placed', 'apply_piece', 'undo_piece', 'rate_placements')
+
+_profiler = None
+_patches  = []
+
+
+class Profiler:
+    """Call counts and times of the instrumented functions.
+
+    stats maps a function or phase name to [calls, total seconds, self
+    seconds], stacks maps a call stack (tuple of names) to the self seconds
+    spent in it.
+
+    """
+
+    def __init__(self):
+        self.stats    = {}
+        self.stacks   = {}
+        self.stack    = []
+        self.children = []
+
+    def reset(self):
+        self.stats  = {}
+        self.stacks = {}
+
+    def snapshot(self):
+        return {name: entry[:] for name, entry in self.stats.items()}
+
+    def since(self, snapshot):
+        """Return the stats accumulated since a snapshot, as a dict of dicts"""
+
+        result = {}
+        for name, (calls, total, own) in self.stats.items():
+            before = snapshot.get(name, (0, 0.0, 0.0))
+            if calls > before[0]:
+                result[name] = {'calls': calls - before[0], 'seconds': total - before[1],
+                                'self_seconds': own - before[2]}
+        return result
+
+    def enter(self, name):
+        self.stack.append(name)
+        self.children.append(0.0)
+
+    def leave(self, elapsed):
+        stack = self.stack
+        own   = elapsed - self.children.pop()
+        key   = tuple(stack)
+        name  = stack.pop()
+
+        entry = self.stats.get(name)
+        if entry is None:
+            entry = self.stats[name] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += own
+        self.stacks[key] = self.stacks.get(key, 0.0) + own
+
+        if self.children:
+            self.children[-1] += elapsed
+
+    def print_stats(self, file=None):
+        print(f"{'function':<32} {'calls':>10} {'total s':>9} {'self s':>9} {'self us/call':>13}", file=file)
+        for name, (calls, total, own) in sorted(self.stats.items(), key=lambda item: -item[1][2]):
+            print(f"{name:<32} {calls:>10} {total:>9.3f} {own:>9.3f} {own / calls * 1e6:>13.2f}", file=file)
+
+    def write_collapsed(self, filename):
+        """Write the self time of every call stack in the collapsed format of
+        flamegraph.pl and speedscope, in microseconds"""
+
+        with open(filename, 'w') as f:
+            for stack, seconds in sorted(self.stacks.items()):
+                f.write(f"{';'.join(stack)} {int(round(seconds * 1e6))}\n")
+
+
+def _timed(name, function, profiler):
+    clock = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        stack = profiler.stack
+        if stack and stack[-1] == name:
+            # An override calling the method it overrides, time it once
+            return function(*args, **kwargs)
+
+        profiler.enter(name)
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.leave(clock() - start)
+
+    wrapper.__wrapped__ = function
+    wrapper.__name__    = getattr(function, '__name__', name)
+    wrapper.__doc__     = getattr(function, '__doc__', None)
+    return wrapper
+
+
+def _package_modules():
+    return [module for module_name, module in list(sys.modules.items())
+            if module is not None and (module_name == 'tetris' or module_name.startswith('tetris.'))]
+
+
+def enable(profiler=None):
+    """Start timing the hot paths and return the profiler"""
+
+    global _profiler
+
+    from .simulation import SIMULATION_ENGINES
+
+    if _profiler is not None:
+        disable()
+    _profiler = profiler if profiler is not None else Profiler()
+
+    names = dict(PHASE_FUNCTIONS)
+    names.update((name, name) for name in HOT_FUNCTIONS)
+
+    # A function imported in several modules gets the same wrapper everywhere
+    wrappers = {}
+    for module in _package_modules():
+        for attr, name in names.items():
+            function = module.__dict__.get(attr)
+            if not callable(function):
+                continue
+            wrapper = wrappers.get(id(function))
+            if wrapper is None:
+                wrapper = wrappers[id(function)] = _timed(name, function, _profiler)
+            _patches.append((module, attr, function))
+            setattr(module, attr, wrapper)
+
+    for engine in set(SIMULATION_ENGINES.values()):
+        methods = dict(PHASE_METHODS)
+        methods.update((attr, f'{engine.__name__}.{attr}') for attr in HOT_METHODS)
+        for attr, name in methods.items():
+            method = engine.__dict__.get(attr)
+            if method is None:
+                continue
+            _patches.append((engine, attr, method))
+            setattr(engine, attr, _timed(name, method, _profiler))
+
+    return _profiler
+
+
+def disable():
+    """Put the original functions back and return the profiler"""
+
+    global _profiler
+
+    while _patches:
+        owner, attr, original = _patches.pop()
+        setattr(owner, attr, original)
+
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def active_profiler():
+    """Return the enabled profiler, or None"""
+
+    return _profiler
+
+
+@contextmanager
+def profiling(profiler=None):
+    profiler = enable(profiler)
+    try:
+        yield profiler
+    finally:
+        disable()
@@ -0,0 +1,146 @@
+"""Island model genetic algorithm
+
+Every island is a population evolving in its own process with the selection,
+crossover and mutation of train_genetic_algorithm. Every migrate_every
+generations each island sends copies of its best chromosomes to the next
+island of a ring, over a multiprocessing queue, where they replace the
+island's last children. The main process tracks the best chromosome of all
+the islands and writes it to best_chromosome.txt whenever it improves.
+
+The islands are seeded from the global random generator and migrate in step,
+so a run gives the same result whatever the process scheduling.
+"""
+
+import multiprocessing
+import os
+import queue
+import random
+import statistics
+import traceback
+
+from .genetic import (ELITE_SIZE, FITNESS_STATISTICS, RACING_SCHEDULE, evaluate_population, init_population,
+                      next_generation, race_population, write_best_chromosome)
+from .pieces import generate_piece_sequence
+from .simulation import POPULATION_ENGINES
+
+
+def _run_island(index, seed, settings, inbox, outbox, reports):
+    try:
+        _evolve_island(index, seed, settings, inbox, outbox, reports)
+    except BaseException:
+        reports.put(('error', index, traceback.format_exc()))
+
+
+def _evolve_island(index, seed, settings, inbox, outbox, reports):
+    random.seed(seed)
+
+    fitness   = settings['fitness']
+    statistic = FITNESS_STATISTICS[fitness] if isinstance(fitness, str) else fitness
+    iterations, population_size = settings['iterations'], settings['population_size']
+    generations, migrate_every  = settings['generations'], settings['migrate_every']
+
+    population = init_population(population_size, 5)
+    for gen in range(generations):
+        seeds     = [random.getrandbits(32) for _ in range(settings['eval_runs'])]
+        sequences = [generate_piece_sequence(seed, iterations + 2, settings['bag']) for seed in seeds]
+        if settings['racing']:
+            results = race_population(population, iterations, sequences, statistic, settings['racing'],
+                                      settings['engine'])
+        else:
+            results = evaluate_population(population, iterations, sequences, settings['engine'])
+
+        scores = [(statistic(games), chrom) for chrom, games in zip(population, results)]
+        scores.sort(reverse=True, key=lambda x: x[0])
+        reports.put(('generation', index, gen, scores[0][0], scores[0][1],
+                     statistics.mean(score for score, _ in scores)))
+
+        ranked     = [chrom for _, chrom in scores]
+        population = next_generation(ranked, population_size)
+
+        if (gen + 1) % migrate_every == 0 and gen + 1 < generations:
+            # Every island sends before it receives, so the ring can't
+            # deadlock
+            migrants = settings['migrants']
+            outbox.put(ranked[:migrants])
+            population[population_size - migrants:] = inbox.get()
+
+    reports.put(('done', index))
+
+
+def train_islands(islands=None, iterations=500, population_size=15, generations=10, eval_runs=5, engine='list',
+                  fitness='mean', bag=False, racing=None, migrate_every=2, migrants=2,
+                  output='best_chromosome.txt'):
+    """Train the AI chromosome with a genetic algorithm on several islands,
+    one process each.
+
+    Args:
+        islands:       number of islands, one per CPU by default
+        migrate_every: number of generations between migrations
+        migrants:      number of best chromosomes an island sends to the next
+                       one at every migration, at most population_size -
+                       ELITE_SIZE as they replace children
+        output:        file the best chromosome of all the islands is written
+                       to whenever it improves
+
+    The other arguments are the ones of train_genetic_algorithm. Return the
+    best chromosome found by any island.
+
+    """
+    if islands is None:
+        islands = os.cpu_count() or 1
+    if not 0 <= migrants <= population_size - ELITE_SIZE:
+        raise ValueError(f"migrants must be between 0 and {population_size - ELITE_SIZE}")
+    if racing is True:
+        racing = RACING_SCHEDULE
+    if racing and engine in POPULATION_ENGINES:
+        raise ValueError(f"the {engine} engine can't race the population")
+
+    settings = {'iterations': iterations, 'population_size': population_size, 'generations': generations,
+                'eval_runs': eval_runs, 'engine': engine, 'fitness': fitness, 'bag': bag, 'racing': racing,
+                'migrate_every': migrate_every, 'migrants': migrants}
+
+    inboxes   = [multiprocessing.Queue() for _ in range(islands)]
+    reports   = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=_run_island, name=f'island-{i}',
+                                         args=(i, random.getrandbits(32), settings, inboxes[i],
+                                               inboxes[(i + 1) % islands], reports))
+                 for i in range(islands)]
+
+    best_score, best_chromosome, best_key = None, None, None
+    try:
+        for process in processes:
+            process.start()
+
+        running = islands
+        while running:
+            try:
+                report = reports.get(timeout=1)
+            except queue.Empty:
+                if any(process.exitcode not in (None, 0) for process in processes):
+                    raise RuntimeError("an island process died")
+                continue
+
+            if report[0] == 'error':
+                raise RuntimeError(f"island {report[1]} failed:\n{report[2]}")
+            if report[0] == 'done':
+                running -= 1
+                continue
+
+            _, index, gen, score, chromosome, population_mean = report
+            print(f"Island {index} generation {gen}: Best Score = {score:.1f}, "
+                  f"Population Mean = {population_mean:.1f}")
+            # Ties go to the earliest generation and island, not to the
+            # report that happened to arrive first
+            if best_score is None or score > best_score or (score == best_score and (gen, index) < best_key):
+                best_score, best_chromosome, best_key = score, chromosome, (gen, index)
+                write_best_chromosome(best_chromosome, best_score, output)
+
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    return best_chromosome
@@ -0,0 +1,146 @@
+"""Streaming JSON lines metrics of training runs
+
+MetricsLog appends one JSON record per line to a file: a 'run' record when a
+run starts, a 'chromosome' record per chromosome and generation with the
+statistics of its games, a 'generation' record per generation, a 'target'
+record when a target score is checked on held-out games and an 'end' record
+when the run finishes. The records are buffered and written in
+batches. read_metrics and summarize_metrics stream a file back one line at a
+time, so a long run is never loaded whole. Usage:
+
+    python -m tetris metrics FILE [FILE ...]
+"""
+
+import json
+import sys
+import time
+import uuid
+
+from .batch import LINE_CLEAR_NAMES
+
+
+class MetricsLog:
+    """Append-only JSON lines event log.
+
+    Args:
+        filename:       file the records are appended to
+        buffer_records: number of records kept in memory before they are
+                        written
+
+    """
+
+    def __init__(self, filename, buffer_records=256):
+        self.filename       = filename
+        self.buffer_records = buffer_records
+        self.run            = uuid.uuid4().hex[:12]
+        self.buffer         = []
+        self.file           = open(filename, 'a')
+
+    def log(self, event, **fields):
+        record = {'event': event, 'run': self.run, 'time': round(time.time(), 3)}
+        record.update(fields)
+        self.buffer.append(json.dumps(record))
+        if len(self.buffer) >= self.buffer_records:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def generation_metrics(games, seconds):
+    """Return the totals of a generation's games: number of games and pieces,
+    lines cleared by type, throughput and the feature cache counters"""
+
+    pieces = sum(game['pieces'] for game in games)
+    lines  = {name: sum(game['lines'][name] for game in games) for name in LINE_CLEAR_NAMES}
+    totals = {'games': len(games),
+              'pieces': pieces,
+              'lines': lines,
+              'seconds': seconds,
+              'evaluations_per_s': len(games) / seconds if seconds else 0.0,
+              'pieces_per_s': pieces / seconds if seconds else 0.0}
+
+    caches = [game['cache'] for game in games if 'cache' in game]
+    if caches:
+        hits   = sum(cache['hits'] for cache in caches)
+        misses = sum(cache['misses'] for cache in caches)
+        totals['cache'] = {'hits': hits, 'misses': misses,
+                           'hit_rate': hits / (hits + misses) if hits + misses else 0.0}
+    return totals
+
+
+def read_metrics(filename, event=None, run=None):
+    """Yield the records of a metrics file one at a time, optionally only the
+    ones of an event type or of a run"""
+
+    with open(filename, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if event is not None and record['event'] != event:
+                continue
+            if run is not None and record['run'] != run:
+                continue
+            yield record
+
+
+def summarize_metrics(filename):
+    """Return a summary of every run in a metrics file, in the order the runs
+    started, streaming the file"""
+
+    runs = {}
+    for record in read_metrics(filename):
+        if record['event'] == 'run':
+            runs[record['run']] = {'run': record['run'], 'settings': record.get('settings', {}),
+                                   'generations': 0, 'best_fitness': None, 'final_fitness': None,
+                                   'games': 0, 'pieces': 0, 'seconds': 0.0, 'finished': False}
+            continue
+
+        summary = runs.get(record['run'])
+        if summary is None:
+            continue
+        if record['event'] == 'generation':
+            summary['generations'] += 1
+            summary['final_fitness'] = record['best_fitness']
+            if summary['best_fitness'] is None or record['best_fitness'] > summary['best_fitness']:
+                summary['best_fitness'] = record['best_fitness']
+            summary['games']   += record['games']
+            summary['pieces']  += record['pieces']
+            summary['seconds'] += record['seconds']
+        elif record['event'] == 'end':
+            summary['finished'] = True
+
+    for summary in runs.values():
+        seconds = summary['seconds']
+        summary['pieces_per_s'] = summary['pieces'] / seconds if seconds else 0.0
+    return list(runs.values())
+
+
+def main(argv=None):
+    filenames = sys.argv[1:] if argv is None else argv
+    if not filenames:
+        print(__doc__.strip().split('\n')[-1].strip())
+        return
+
+    print(f"{'file':<24} {'run':<12} {'gens':>5} {'best':>9} {'final':>9} {'pieces/s':>9}  done")
+    for filename in filenames:
+        for summary in summarize_metrics(filename):
+            best, final = summary['best_fitness'], summary['final_fitness']
+            print(f"{filename[-24:]:<24} {summary['run']:<12} {summary['generations']:>5} "
+                  f"{best if best is not None else float('nan'):>9.1f} "
+                  f"{final if final is not None else float('nan'):>9.1f} "
+                  f"{summary['pieces_per_s']:>9.0f}  {summary['finished']}")
@@ -0,0 +1,200 @@
+"""NumPy population optimizers for train_genetic_algorithm
+
+Every optimizer keeps its population as a (chromosomes x genes) array and is
+driven with ask() / tell(): ask() returns the population to evaluate and
+tell() takes the fitness of each of its chromosomes. The operators are
+vectorized over the whole population.
+
+    ga-array  the elitist genetic algorithm of tetris.genetic, with blend
+              (BLX-alpha) crossover and gaussian mutation, so the children
+              don't collapse onto the average of their parents
+    cem       noisy cross-entropy method: a gaussian fitted to the best
+              chromosomes of every generation, plus some noise to keep it
+              from shrinking too fast on noisy fitness
+    cmaes     CMA-ES, adapting the full covariance and step size of its
+              search distribution
+
+numpy is only imported when an optimizer is first used (see tetris.optional),
+the rest of the package doesn't depend on it.
+"""
+
+import math
+
+from .genetic import ELITE_SIZE
+from .optional import import_numpy
+
+
+def _numpy():
+    return import_numpy("the array optimizers")
+
+
+def init_population_array(rng, size, genes):
+    """Return a (size x genes) population drawn like init_population"""
+
+    return rng.uniform(-5, 5, (size, genes))
+
+
+def crossover_array(rng, parents1, parents2, alpha=0.5):
+    """Return the BLX-alpha children of two (n x genes) arrays of parents:
+    every gene is drawn uniformly between the parents' genes, widened by alpha
+    times their distance on each side"""
+
+    np     = _numpy()
+    low    = np.minimum(parents1, parents2)
+    spread = np.abs(parents1 - parents2)
+    return low - alpha * spread + rng.random(parents1.shape) * (1 + 2 * alpha) * spread
+
+
+def mutate_array(rng, population, mutation_rate=0.1, scale=1.0):
+    """Return the population with each gene moved by a gaussian step of the
+    given scale with probability mutation_rate"""
+
+    mutated = rng.random(population.shape) < mutation_rate
+    return population + mutated * rng.normal(0, scale, population.shape)
+
+
+def next_generation_array(rng, population, fitness, population_size):
+    """Return the next population: the ELITE_SIZE fittest chromosomes and
+    mutated crossovers of two distinct of them, like next_generation"""
+
+    np       = _numpy()
+    elite    = population[np.argsort(-np.asarray(fitness), kind='stable')[:ELITE_SIZE]]
+    children = population_size - len(elite)
+    first    = rng.integers(0, len(elite), children)
+    # Adding 1 to len(elite) - 1 to the first parent picks another one
+    second   = (first + rng.integers(1, len(elite), children)) % len(elite)
+    return np.vstack([elite, mutate_array(rng, crossover_array(rng, elite[first], elite[second]))])
+
+
+class ArrayGeneticOptimizer:
+    """Elitist genetic algorithm on a population array.
+
+    Args:
+        population_size: number of chromosomes per generation
+        genes:           number of genes of a chromosome
+        seed:            seed of the optimizer's numpy generator
+
+    """
+
+    def __init__(self, population_size, genes=5, seed=None):
+        np = _numpy()
+        if population_size <= ELITE_SIZE:
+            raise ValueError(f"the population needs more than {ELITE_SIZE} chromosomes")
+        self.rng             = np.random.default_rng(seed)
+        self.population_size = population_size
+        self.population      = init_population_array(self.rng, population_size, genes)
+
+    def ask(self):
+        return self.population
+
+    def tell(self, fitness):
+        self.population = next_generation_array(self.rng, self.population, fitness, self.population_size)
+
+
+class CrossEntropyOptimizer:
+    """Noisy cross-entropy method.
+
+    Every generation is drawn from a gaussian with one standard deviation per
+    gene, which is then fitted to the elite fraction of the generation. noise
+    is added to the variances so the search doesn't stop on the lucky games of
+    a few chromosomes.
+
+    """
+
+    def __init__(self, population_size, genes=5, seed=None, elite=0.3, noise=0.25, initial_std=3.0):
+        np = _numpy()
+        self.rng             = np.random.default_rng(seed)
+        self.population_size = population_size
+        self.elite           = max(2, round(elite * population_size))
+        self.noise           = noise
+        self.mean            = np.zeros(genes)
+        self.std             = np.full(genes, initial_std)
+        self.population      = None
+
+    def ask(self):
+        self.population = self.mean + self.std * self.rng.standard_normal((self.population_size, len(self.mean)))
+        return self.population
+
+    def tell(self, fitness):
+        np        = _numpy()
+        elite     = self.population[np.argsort(-np.asarray(fitness), kind='stable')[:self.elite]]
+        self.mean = elite.mean(axis=0)
+        self.std  = np.sqrt(elite.var(axis=0) + self.noise)
+
+
+class CMAESOptimizer:
+    """CMA-ES with the default (mu / mu_w, lambda) settings.
+
+    The population size is lambda, the best half of every generation moves
+    the mean with log-rank weights, and the covariance is updated with the
+    rank-one (evolution path) and rank-mu rules.
+
+    """
+
+    def __init__(self, population_size, genes=5, seed=None, sigma=2.0):
+        np = _numpy()
+        n = genes
+        self.rng             = np.random.default_rng(seed)
+        self.population_size = population_size
+        self.mu              = population_size // 2
+
+        weights      = math.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff   = 1 / (self.weights ** 2).sum()
+
+        mueff = self.mueff
+        self.cc    = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+        self.cs    = (mueff + 2) / (n + mueff + 5)
+        self.c1    = 2 / ((n + 1.3) ** 2 + mueff)
+        self.cmu   = min(1 - self.c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+        self.damps = 1 + 2 * max(0, math.sqrt((mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chin  = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        self.mean       = np.zeros(n)
+        self.sigma      = sigma
+        self.C          = np.eye(n)
+        self.B          = np.eye(n)
+        self.D          = np.ones(n)
+        self.pc         = np.zeros(n)
+        self.ps         = np.zeros(n)
+        self.generation = 0
+        self.steps      = None
+
+    def ask(self):
+        # Steps drawn from N(0, C), kept for tell()
+        normal     = self.rng.standard_normal((self.population_size, len(self.mean)))
+        self.steps = normal @ (self.B * self.D).T
+        return self.mean + self.sigma * self.steps
+
+    def tell(self, fitness):
+        np       = _numpy()
+        n        = len(self.mean)
+        selected = self.steps[np.argsort(-np.asarray(fitness), kind='stable')[:self.mu]]
+        step     = self.weights @ selected
+        self.mean = self.mean + self.sigma * step
+
+        # Evolution paths, the step size one in the coordinates of C^-1/2
+        inv_sqrt_c = self.B @ np.diag(1 / self.D) @ self.B.T
+        cs, cc, mueff = self.cs, self.cc, self.mueff
+        self.ps = (1 - cs) * self.ps + math.sqrt(cs * (2 - cs) * mueff) * (inv_sqrt_c @ step)
+        self.generation += 1
+        ps_norm = np.linalg.norm(self.ps)
+        hsig    = ps_norm / math.sqrt(1 - (1 - cs) ** (2 * self.generation)) / self.chin < 1.4 + 2 / (n + 1)
+        self.pc = (1 - cc) * self.pc + hsig * math.sqrt(cc * (2 - cc) * mueff) * step
+
+        c1, cmu = self.c1, self.cmu
+        rank_one = np.outer(self.pc, self.pc) + (1 - hsig) * cc * (2 - cc) * self.C
+        rank_mu  = (selected.T * self.weights) @ selected
+        self.C   = (1 - c1 - cmu) * self.C + c1 * rank_one + cmu * rank_mu
+        self.sigma *= math.exp(cs / self.damps * (ps_norm / self.chin - 1))
+
+        self.C = (self.C + self.C.T) / 2
+        eigenvalues, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+
+# Optimizers train_genetic_algorithm can use besides its own list based
+# genetic algorithm ('ga'), by name
+OPTIMIZERS = {'ga-array': ArrayGeneticOptimizer,
+              'cem':      CrossEntropyOptimizer,
+              'cmaes':    CMAESOptimizer}
@@ -0,0 +1,17 @@
+"""Optional dependencies
+
+numpy is only used by the 'numpy' engine (tetris.batch) and the array
+optimizers (tetris.optimizers), which import it through import_numpy the
+first time they are used, so the rest of the package doesn't depend on it.
+"""
+
+
+def import_numpy(feature):
+    """Return the numpy module, or raise an ImportError saying that feature
+    needs it when it isn't installed"""
+
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(f"numpy isn't installed, {feature} needs it") from None
+    return numpy
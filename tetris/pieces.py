@@ -0,0 +1,307 @@
+"""Piece templates, their compiled geometry and the piece generators"""
+
+import random
+
+from .constants import BOARDWIDTH, BLANK, COLORS
+
+# Piece Templates
+# The TEMPLATEWIDTH and TEMPLATEHEIGHT constants simply set how large each row
+# and column for each shape’s rotation should be
+TEMPLATEWIDTH  = 5
+TEMPLATEHEIGHT = 5
+
+S_SHAPE_TEMPLATE = [['.....',
+                     '.....',
+                     '..OO.',
+                     '.OO..',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '..OO.',
+                     '...O.',
+                     '.....']]
+
+Z_SHAPE_TEMPLATE = [['.....',
+                     '.....',
+                     '.OO..',
+                     '..OO.',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '.OO..',
+                     '.O...',
+                     '.....']]
+
+I_SHAPE_TEMPLATE = [['..O..',
+                     '..O..',
+                     '..O..',
+                     '..O..',
+                     '.....'],
+                    ['.....',
+                     '.....',
+                     'OOOO.',
+                     '.....',
+                     '.....']]
+
+O_SHAPE_TEMPLATE = [['.....',
+                     '.....',
+                     '.OO..',
+                     '.OO..',
+                     '.....']]
+
+J_SHAPE_TEMPLATE = [['.....',
+                     '.O...',
+                     '.OOO.',
+                     '.....',
+                     '.....'],
+                    ['.....',
+                     '..OO.',
+                     '..O..',
+                     '..O..',
+                     '.....'],
+                    ['.....',
+                     '.....',
+                     '.OOO.',
+                     '...O.',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '..O..',
+                     '.OO..',
+                     '.....']]
+
+L_SHAPE_TEMPLATE = [['.....',
+                     '...O.',
+                     '.OOO.',
+                     '.....',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '..O..',
+                     '..OO.',
+                     '.....'],
+                    ['.....',
+                     '.....',
+                     '.OOO.',
+                     '.O...',
+                     '.....'],
+                    ['.....',
+                     '.OO..',
+                     '..O..',
+                     '..O..',
+                     '.....']]
+
+T_SHAPE_TEMPLATE = [['.....',
+                     '..O..',
+                     '.OOO.',
+                     '.....',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '..OO.',
+                     '..O..',
+                     '.....'],
+                    ['.....',
+                     '.....',
+                     '.OOO.',
+                     '..O..',
+                     '.....'],
+                    ['.....',
+                     '..O..',
+                     '.OO..',
+                     '..O..',
+                     '.....']]
+
+PIECES = {'S': S_SHAPE_TEMPLATE,
+          'Z': Z_SHAPE_TEMPLATE,
+          'J': J_SHAPE_TEMPLATE,
+          'L': L_SHAPE_TEMPLATE,
+          'I': I_SHAPE_TEMPLATE,
+          'O': O_SHAPE_TEMPLATE,
+          'T': T_SHAPE_TEMPLATE}
+
+
+def compile_piece_geometry():
+    """Compile the piece templates into geometry tables.
+
+    Every table is indexed by [shape][rotation]:
+        cells:      (x, y) template offsets of the filled cells
+        blank_cells: ((x, y), n) template offsets of the blank cells with n
+                    filled neighbours, as counted by calc_sides_in_contact
+        bounds:     (min_x, min_y, max_x, max_y) of the filled cells
+        bottoms:    (x, y) offset of the bottom-most filled cell of each column
+        x_range:    board x positions that keep the piece inside the board
+
+    """
+    cells, blank_cells, bounds, bottoms, x_range = {}, {}, {}, {}, {}
+
+    for shape, rotations in PIECES.items():
+        cells[shape], blank_cells[shape], bounds[shape], bottoms[shape], x_range[shape] = [], [], [], [], []
+
+        for template in rotations:
+            filled = tuple((x, y) for x in range(TEMPLATEWIDTH)
+                                  for y in range(TEMPLATEHEIGHT) if template[y][x] != BLANK)
+
+            neighbours = []
+            for x in range(TEMPLATEWIDTH):
+                for y in range(TEMPLATEHEIGHT):
+                    if template[y][x] != BLANK:
+                        continue
+                    n = 0
+                    if template[y-1][x] != BLANK:
+                        n += 1
+                    if x > 0 and template[y][x-1] != BLANK:
+                        n += 1
+                    if x < TEMPLATEWIDTH-1 and template[y][x+1] != BLANK:
+                        n += 1
+                    if n:
+                        neighbours.append(((x, y), n))
+
+            xs = [x for x, _ in filled]
+            ys = [y for _, y in filled]
+            column_bottoms = tuple((x, max(y for cx, y in filled if cx == x)) for x in sorted(set(xs)))
+
+            cells[shape].append(filled)
+            blank_cells[shape].append(tuple(neighbours))
+            bounds[shape].append((min(xs), min(ys), max(xs), max(ys)))
+            bottoms[shape].append(column_bottoms)
+            x_range[shape].append(range(-min(xs), BOARDWIDTH - max(xs)))
+
+    return cells, blank_cells, bounds, bottoms, x_range
+
+
+PIECE_CELLS, PIECE_BLANK_CELLS, PIECE_BOUNDS, PIECE_BOTTOMS, PIECE_X_RANGE = compile_piece_geometry()
+
+
+# Shapes in a fixed order, so a shape can be drawn or encoded without
+# rebuilding the list of PIECES keys
+SHAPES      = tuple(PIECES)
+SHAPE_INDEX = {shape: i for i, shape in enumerate(SHAPES)}
+
+
+def encode_piece(shape, rotation, color):
+    """Pack a piece into one byte: 3 bits of shape, 2 of rotation, 2 of color"""
+
+    return SHAPE_INDEX[shape] | (rotation << 3) | (color << 5)
+
+
+def decode_piece(code):
+    """Return the (shape, rotation, color) packed in a piece code"""
+
+    return SHAPES[code & 7], (code >> 3) & 3, code >> 5
+
+
+def encode_move(rotation, x):
+    """Pack the rotation and x a piece is played at into one byte: 2 bits of
+    rotation and 4 of x, offset since x can be as low as -2"""
+
+    return (rotation << 4) | (x + 2)
+
+
+def decode_move(code):
+    """Return the (rotation, x) packed in a move code"""
+
+    return code >> 4, (code & 15) - 2
+
+
+def get_new_piece(rng=random):
+    """Return a random new piece in a random rotation and color
+
+    Args:
+        rng: random number generator to draw the piece from, the global one
+             by default
+
+    """
+    shape = rng.choice(SHAPES)
+
+    return make_piece(shape, rng.randint(0, len(PIECES[shape]) - 1), rng.randint(0, len(COLORS)-1))
+
+
+def make_piece(shape, rotation, color):
+    """Return a new piece at the top of the board"""
+
+    new_piece = {'shape': shape,
+                'rotation': rotation,
+                'x': int(BOARDWIDTH / 2) - int(TEMPLATEWIDTH / 2),
+                'y': -2, # start it above the board (i.e. less than 0)
+                'color': color}
+
+    return new_piece
+
+
+class PieceSource:
+    """Endless stream of new pieces with its own random number generator.
+
+    Without bag the pieces are drawn like get_new_piece draws them, so a
+    source seeded with seed deals the same pieces as get_new_piece fed with
+    random.Random(seed). With bag=True the shapes are dealt from shuffled
+    bags holding each of the 7 shapes once.
+
+    Args:
+        seed: seed of the source's generator
+        bag:  deal the shapes with the 7-bag randomizer
+        rng:  generator to draw from instead of a new seeded one
+
+    """
+
+    def __init__(self, seed=None, bag=False, rng=None):
+        self.rng = random.Random(seed) if rng is None else rng
+        self.bag = bag
+        self._bag_shapes = []
+
+    def next_code(self):
+        """Draw the next piece and return its code"""
+
+        rng = self.rng
+        if self.bag:
+            if not self._bag_shapes:
+                self._bag_shapes = list(SHAPES)
+                rng.shuffle(self._bag_shapes)
+            shape = self._bag_shapes.pop()
+        else:
+            shape = rng.choice(SHAPES)
+
+        return encode_piece(shape, rng.randint(0, len(PIECES[shape]) - 1), rng.randint(0, len(COLORS)-1))
+
+    def next_piece(self):
+        return make_piece(*decode_piece(self.next_code()))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next_piece()
+
+    def generate_sequence(self, length):
+        """Draw the next length pieces as a byte string of piece codes"""
+
+        return bytes(self.next_code() for _ in range(length))
+
+
+def generate_piece_sequence(seed, length, bag=False):
+    """Return the first pieces of a game seeded with seed, as piece codes.
+
+    The sequence is a byte string, so it is cheap to keep and to send to other
+    processes, and many games can replay it with run_tetris_simulation(pieces=...).
+
+    """
+    return PieceSource(seed, bag).generate_sequence(length)
+
+
+def piece_from_code(code):
+    """Return a new piece from its code"""
+
+    return make_piece(*decode_piece(code))
+
+
+def iter_pieces(pieces):
+    """Iterate over new pieces from a PieceSource or a sequence of piece codes.
+
+    The iterator can be pickled when the pieces can, so a game can be carried
+    on in another process.
+
+    """
+    if isinstance(pieces, PieceSource):
+        return pieces
+
+    return map(piece_from_code, pieces)
@@ -0,0 +1,242 @@
+"""Compact binary replays of AI games
+
+A replay holds the pieces a game dealt and the (rotation, x) the AI played
+each of them at, one byte each, so boards can be rebuilt without running the
+move search again. The layout, all little endian:
+
+    header      magic, version, moves, score, genes
+    seed        kind (0 none, 1 int, 2 str, 3 bytes, 4 float), length,
+                value (a signed int, UTF-8 text, raw bytes or a double)
+    chromosome  genes doubles
+    pieces      moves + 2 piece codes (see pieces.encode_piece), the last
+                two are the current and next pieces when the game stopped
+    moves       moves move codes (see pieces.encode_move)
+
+Record a game with run_tetris_simulation(..., replay=FILE) and check replays
+with:
+
+    python -m tetris replay FILE [FILE ...]
+"""
+
+import struct
+import sys
+
+from .batch import LINE_SCORES, LINE_CLEAR_NAMES
+from .pieces import decode_move, piece_from_code
+from .state import BoardState
+
+MAGIC   = b'TGRP'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHIqB')
+SEED   = struct.Struct('<BH')
+
+# Kinds of seed, the types random.Random can be seeded with
+NO_SEED, INT_SEED, STR_SEED, BYTES_SEED, FLOAT_SEED = range(5)
+
+
+def _seed_kind(seed):
+    if seed is None:
+        return NO_SEED
+    if isinstance(seed, int):
+        return INT_SEED
+    if isinstance(seed, str):
+        return STR_SEED
+    if isinstance(seed, (bytes, bytearray)):
+        return BYTES_SEED
+    if isinstance(seed, float):
+        return FLOAT_SEED
+    raise ValueError(f"a replay can't store a {type(seed).__name__} seed")
+
+
+def _seed_value(seed, kind):
+    if kind == INT_SEED:
+        return seed.to_bytes(seed.bit_length() // 8 + 1, 'little', signed=True)
+    if kind == STR_SEED:
+        return seed.encode('utf-8')
+    if kind == FLOAT_SEED:
+        return struct.pack('<d', seed)
+    return bytes(seed or b'')
+
+
+def _pack_seed(seed):
+    kind  = _seed_kind(seed)
+    value = _seed_value(seed, kind)
+    if len(value) > 0xFFFF:
+        raise ValueError("the seed is too long for a replay")
+    return SEED.pack(kind, len(value)) + value
+
+
+def check_seed(seed):
+    """Raise ValueError if a replay can't store the seed, so a recorded game
+    fails before it is played rather than when its replay is written"""
+
+    _pack_seed(seed)
+
+
+def _unpack_seed(data, offset):
+    kind, length = SEED.unpack_from(data, offset)
+    offset += SEED.size
+    value   = bytes(data[offset:offset + length])
+    if kind == NO_SEED:
+        seed = None
+    elif kind == INT_SEED:
+        seed = int.from_bytes(value, 'little', signed=True)
+    elif kind == STR_SEED:
+        seed = value.decode('utf-8')
+    elif kind == BYTES_SEED:
+        seed = value
+    elif kind == FLOAT_SEED:
+        seed, = struct.unpack('<d', value)
+    else:
+        raise ValueError(f"unknown seed kind {kind}")
+    return seed, offset + length
+
+
+def pack_replay(replay):
+    """Return the bytes of a replay dict.
+
+    The dict has the keys seed (None when the game drew from the global
+    random generator), chromosome, score (the recorded score), pieces and
+    moves (byte strings of piece and move codes).
+
+    """
+    seed, chromosome, moves = replay['seed'], replay['chromosome'], replay['moves']
+    if len(replay['pieces']) != len(moves) + 2:
+        raise ValueError("a replay needs two more pieces than moves")
+
+    return b''.join([HEADER.pack(MAGIC, VERSION, len(moves), replay['score'], len(chromosome)),
+                     _pack_seed(seed),
+                     struct.pack(f'<{len(chromosome)}d', *chromosome),
+                     bytes(replay['pieces']),
+                     bytes(moves)])
+
+
+def unpack_replay(data):
+    """Return the replay dict packed in data"""
+
+    magic, version, num_moves, score, genes = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a game replay")
+    if version != VERSION:
+        raise ValueError(f"unsupported replay version {version}")
+    seed, offset = _unpack_seed(data, HEADER.size)
+
+    chromosome = list(struct.unpack_from(f'<{genes}d', data, offset))
+    offset    += 8 * genes
+    pieces     = data[offset:offset + num_moves + 2]
+    moves      = data[offset + num_moves + 2:offset + 2 * num_moves + 2]
+    if len(moves) != num_moves:
+        raise ValueError("truncated replay")
+
+    return {'seed':       seed,
+            'chromosome': chromosome,
+            'score':      score,
+            'pieces':     bytes(pieces),
+            'moves':      bytes(moves)}
+
+
+def write_replay(filename, replay):
+    with open(filename, 'wb') as f:
+        f.write(pack_replay(replay))
+
+
+def load_replay(filename):
+    with open(filename, 'rb') as f:
+        return unpack_replay(f.read())
+
+
+class ReplayPlayer:
+    """Rebuild the boards of a replay by playing its moves.
+
+    The board state is kept every KEYFRAME_EVERY moves on the way, so seeking
+    back or far ahead only replays the moves from the nearest of them.
+
+    """
+
+    KEYFRAME_EVERY = 50
+
+    def __init__(self, replay):
+        self.replay    = replay
+        self.pieces    = replay['pieces']
+        self.moves     = replay['moves']
+        self.board     = BoardState()
+        self.position  = 0
+        self.score     = 0
+        self.clears    = [0] * 5
+        self.last_move = None
+        self.keyframes = {0: self._keyframe()}
+
+    def __len__(self):
+        return len(self.moves)
+
+    def _keyframe(self):
+        return self.board.copy(), self.score, self.clears[:]
+
+    def current_piece(self):
+        """Return the piece played at the current position, at its spawn"""
+
+        return piece_from_code(self.pieces[self.position])
+
+    def next_piece(self):
+        return piece_from_code(self.pieces[self.position + 1])
+
+    def step(self):
+        """Play the move at the current position and return the lines it
+        cleared"""
+
+        piece = self.current_piece()
+        piece['rotation'], piece['x'] = decode_move(self.moves[self.position])
+        self.board.drop_piece(piece)
+        lines_cleared = self.board.add_piece(piece)
+        self.score += LINE_SCORES[lines_cleared] if lines_cleared < 5 else 0
+        self.clears[lines_cleared] += 1
+        self.last_move = piece
+
+        self.position += 1
+        if self.position % self.KEYFRAME_EVERY == 0 and self.position not in self.keyframes:
+            self.keyframes[self.position] = self._keyframe()
+        return lines_cleared
+
+    def seek(self, position):
+        """Rebuild the board after the first position moves"""
+
+        position = max(0, min(position, len(self)))
+        if position < self.position or position - self.position > self.KEYFRAME_EVERY:
+            start = max(frame for frame in self.keyframes if frame <= position)
+            if start > self.position or position < self.position:
+                board, self.score, clears = self.keyframes[start]
+                self.board, self.clears = board.copy(), clears[:]
+                self.position, self.last_move = start, None
+
+        while self.position < position:
+            self.step()
+
+    def play(self):
+        """Play the rest of the replay and return the statistics of the game,
+        like run_tetris_game"""
+
+        self.seek(len(self))
+        return {'score':  self.score,
+                'pieces': self.position,
+                'lines':  dict(zip(LINE_CLEAR_NAMES, self.clears[1:]))}
+
+
+def verify_replay(replay):
+    """Return whether playing the replay gives the score it recorded"""
+
+    return ReplayPlayer(replay).play()['score'] == replay['score']
+
+
+def main(argv=None):
+    filenames = sys.argv[1:] if argv is None else argv
+    if not filenames:
+        print(__doc__.strip().split('\n')[-1].strip())
+        return
+
+    print(f"{'file':<24} {'moves':>6} {'recorded':>9} {'replayed':>9}  ok")
+    for filename in filenames:
+        replay = load_replay(filename)
+        stats  = ReplayPlayer(replay).play()
+        print(f"{filename[-24:]:<24} {stats['pieces']:>6} {replay['score']:>9} {stats['score']:>9}  "
+              f"{stats['score'] == replay['score']}")
@@ -0,0 +1,124 @@
+"""Piece sequences and scores shared with the worker processes
+
+SharedEvaluation keeps the piece sequences of a generation's games (the
+sequence bank, one row of piece codes per game) and the scores of the games
+(a chromosomes x games matrix) in multiprocessing.shared_memory blocks. The
+pool workers attach to the blocks once, when they start, so a task only names
+its chromosome: the worker plays the sequences of the bank through
+memoryviews and writes the scores straight into the matrix, and neither the
+sequences nor the scores are pickled per task.
+"""
+
+from multiprocessing import shared_memory
+
+from .simulation import POPULATION_ENGINES, run_tetris_simulation
+
+
+class SharedEvaluation:
+    """Sequence bank and score matrix in shared memory.
+
+    Args:
+        population_size: number of rows of the score matrix
+        games:           number of sequences in the bank, and of columns of
+                         the score matrix
+        length:          number of piece codes of every sequence
+
+    The process creating it owns the blocks and unlinks them on close(), the
+    workers attach to them with SharedEvaluation.attach(spec).
+
+    """
+
+    def __init__(self, population_size, games, length, names=None):
+        self.population_size = population_size
+        self.games           = games
+        self.length          = length
+        self.owner           = names is None
+
+        if self.owner:
+            self._bank   = shared_memory.SharedMemory(create=True, size=games * length)
+            self._scores = shared_memory.SharedMemory(create=True, size=8 * population_size * games)
+        else:
+            self._bank   = shared_memory.SharedMemory(names[0])
+            self._scores = shared_memory.SharedMemory(names[1])
+
+        self.bank   = self._bank.buf
+        self.scores = self._scores.buf.cast('q')
+
+    @property
+    def spec(self):
+        """Picklable description of the blocks, for attach()"""
+
+        return self.population_size, self.games, self.length, (self._bank.name, self._scores.name)
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(*spec)
+
+    def set_sequences(self, sequences):
+        """Copy the piece sequences of the games into the bank"""
+
+        length = self.length
+        if len(sequences) != self.games:
+            raise ValueError(f"the bank holds {self.games} sequences, not {len(sequences)}")
+        for game, sequence in enumerate(sequences):
+            if len(sequence) < length:
+                raise ValueError(f"a sequence needs at least {length} pieces")
+            self.bank[game * length:(game + 1) * length] = sequence[:length]
+
+    def sequence(self, game):
+        """Return a view of the piece codes of a game in the bank"""
+
+        return self.bank[game * self.length:(game + 1) * self.length]
+
+    def read_scores(self, population_size):
+        """Return the scores of the first population_size chromosomes, one
+        list of games per chromosome"""
+
+        games = self.games
+        return [self.scores[row * games:(row + 1) * games].tolist() for row in range(population_size)]
+
+    def close(self):
+        self.bank.release()
+        self.scores.release()
+        self._bank.close()
+        self._scores.close()
+        if self.owner:
+            self._bank.unlink()
+            self._scores.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# SharedEvaluation of a pool worker, attached by attach_worker
+_shared = None
+
+
+def attach_worker(spec):
+    """Pool initializer attaching the worker to a SharedEvaluation"""
+
+    global _shared
+    _shared = SharedEvaluation.attach(spec)
+
+
+def evaluate_shared_chromosome(row, chromosome, iterations, engine):
+    """Play a chromosome on every sequence of the bank and write its scores to
+    its row of the matrix"""
+
+    games = _shared.games
+    for game in range(games):
+        _shared.scores[row * games + game] = run_tetris_simulation(chromosome, iterations, engine,
+                                                                  pieces=_shared.sequence(game))
+
+
+def evaluate_shared_sequence(game, population, iterations, engine):
+    """Play a sequence of the bank for the whole population at once, with an
+    engine from POPULATION_ENGINES, and write the scores to its column of the
+    matrix"""
+
+    games = _shared.games
+    for row, score in enumerate(POPULATION_ENGINES[engine](population, iterations, _shared.sequence(game))):
+        _shared.scores[row * games + game] = score
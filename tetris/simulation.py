@@ -0,0 +1,275 @@
+"""Headless AI games"""
+
+import random
+import time
+
+from . import instrument
+from .pieces import PIECES, PIECE_X_RANGE, PieceSource, encode_move, encode_piece, iter_pieces
+from .heuristics import rate_features
+from .state import BoardState
+from .bitboard import BitBoardState
+from .batch import LINE_SCORES, LINE_CLEAR_NAMES, BatchBoardState, simulate_population
+from .cache import CachedBoardState
+from .replay import check_seed, write_replay
+
+
+# Board engines run_tetris_simulation can play on
+SIMULATION_ENGINES = {'list':     BoardState,
+                      'bitboard': BitBoardState,
+                      'numpy':    BatchBoardState,
+                      'cached':   CachedBoardState}
+
+# Engines playing the games of a whole population at once, function of
+# (chromosomes, iterations, piece sequence) returning the scores
+POPULATION_ENGINES = {'lockstep': simulate_population}
+
+
+def rate_placements(board, piece, chromosome):
+    """Rate every placement of the piece that fits at the top of the board.
+
+    Return a list of (score, rotation, x, features, placed piece) in search
+    order, where the placed piece has already been dropped to its landing row.
+    Engines that rate the placements in one batch do it themselves.
+
+    """
+    if hasattr(board, 'rate_placements'):
+        return board.rate_placements(piece, chromosome)
+
+    shape       = piece['shape']
+    placements  = []
+
+    for r in range(len(PIECES[shape])):
+        for x in PIECE_X_RANGE[shape][r]:
+            test_piece = {
+                'shape': shape,
+                'rotation': r,
+                'x': x,
+                'y': 0,
+                'color': piece['color']
+            }
+            features = board.evaluate_move(test_piece)
+            if features is None:
+                continue
+            placements.append((rate_features(features, chromosome), r, x, features, test_piece))
+
+    return placements
+
+
+def find_best_move(board, piece, chromosome, next_piece=None, beam_width=5):
+    """Return the (rotation, x) the AI plays the piece at, or None if it can't
+    be placed.
+
+    Without next_piece the move is chosen greedily. With it, the beam_width
+    best placements of the piece are searched one ply deeper: each is played
+    on the board with apply_piece, scored by the best placement of next_piece
+    that follows it, and taken back with undo_piece. The two moves are rated
+    together, with their lines, new holes and new blocking blocks added up and
+    the height and bumpiness of the board they leave.
+
+    """
+    placements = rate_placements(board, piece, chromosome)
+    if not placements:
+        return None
+
+    best = max(placements, key=lambda placement: placement[0])
+    if next_piece is None:
+        return best[1], best[2]
+
+    best_move  = best[1], best[2]
+    best_score = float('-inf')
+    beam = sorted(placements, key=lambda placement: placement[0], reverse=True)[:beam_width]
+
+    for _, r, x, features, placed_piece in beam:
+        _, undo = board.apply_piece(placed_piece)
+        # The next piece wouldn't fit after a move ending the game
+        next_placements = rate_placements(board, next_piece, chromosome) \
+            if board.is_valid_position(next_piece) else []
+        board.undo_piece(undo)
+
+        for _, _, _, next_features, _ in next_placements:
+            combined = (features[0] + next_features[0],
+                        next_features[1],
+                        features[2] + next_features[2],
+                        next_features[3],
+                        features[4] + next_features[4])
+            move_score = rate_features(combined, chromosome)
+            if move_score > best_score:
+                best_score = move_score
+                best_move  = r, x
+
+    return best_move
+
+
+class TetrisGame:
+    """A headless AI game played a few pieces at a time.
+
+    Takes the arguments of run_tetris_simulation but the number of pieces,
+    which is given to advance(). A game playing a sequence of piece codes or a
+    seeded PieceSource can be pickled between two calls, to carry on in
+    another process. With record, the pieces dealt and the moves played are
+    kept for replay().
+
+    """
+
+    def __init__(self, chromosome, engine='list', seed=None, pieces=None, lookahead=False, beam_width=5,
+                 record=False):
+        start = time.perf_counter()
+        if record:
+            check_seed(seed)
+        if pieces is None:
+            pieces = PieceSource(rng=random) if seed is None else PieceSource(seed)
+
+        self.chromosome = chromosome
+        self.seed       = seed
+        self.lookahead  = lookahead
+        self.beam_width = beam_width
+        self.new_pieces = iter_pieces(pieces)
+        self.board      = SIMULATION_ENGINES[engine]()
+
+        self.score         = 0
+        self.pieces_played = 0
+        self.clears        = [0] * 5
+        self.over          = False
+        self.cache_hits    = 0
+        self.cache_misses  = 0
+
+        self.current_piece = next(self.new_pieces)
+        self.next_piece    = next(self.new_pieces)
+
+        # Piece codes dealt and move codes played, when recording
+        self.dealt = self.moves = None
+        if record:
+            self.dealt = bytearray(encode_piece(piece['shape'], piece['rotation'], piece['color'])
+                                   for piece in (self.current_piece, self.next_piece))
+            self.moves = bytearray()
+        self.seconds = time.perf_counter() - start
+
+    def advance(self, iterations, move=None):
+        """Play until iterations pieces have been played in all or the game is
+        over, and return whether it is over. move is the (rotation, x) of the
+        current piece when it was already searched, so it isn't searched
+        again"""
+
+        start = time.perf_counter()
+        board = self.board
+        cache = getattr(board, 'cache', None)
+        if cache is not None:
+            hits, misses = cache.hits, cache.misses
+
+        chromosome, lookahead, beam_width = self.chromosome, self.lookahead, self.beam_width
+        new_pieces    = self.new_pieces
+        current_piece = self.current_piece
+        next_piece    = self.next_piece
+        score         = self.score
+        pieces_played = self.pieces_played
+        clears        = self.clears
+        dealt, moves  = self.dealt, self.moves
+
+        while not self.over and pieces_played < iterations:
+            if move is None:
+                move = find_best_move(board, current_piece, chromosome, next_piece if lookahead else None,
+                                      beam_width)
+                if move is None:
+                    self.over = True
+                    break
+            current_piece['rotation'], current_piece['x'] = move
+            board.drop_piece(current_piece)
+            lines_cleared = board.add_piece(current_piece)
+            score += LINE_SCORES[lines_cleared] if lines_cleared < 5 else 0
+            clears[lines_cleared] += 1
+            current_piece = next_piece
+            next_piece = next(new_pieces)
+            pieces_played += 1
+            if moves is not None:
+                moves.append(encode_move(*move))
+                dealt.append(encode_piece(next_piece['shape'], next_piece['rotation'], next_piece['color']))
+            move = None
+            if not board.is_valid_position(current_piece):
+                self.over = True
+
+        self.current_piece, self.next_piece = current_piece, next_piece
+        self.score, self.pieces_played = score, pieces_played
+
+        if cache is not None:
+            self.cache_hits   += cache.hits - hits
+            self.cache_misses += cache.misses - misses
+        self.seconds += time.perf_counter() - start
+        return self.over
+
+    def stats(self):
+        """Return the statistics of the game so far, see run_tetris_game"""
+
+        game = {'score':   self.score,
+                'pieces':  self.pieces_played,
+                'lines':   dict(zip(LINE_CLEAR_NAMES, self.clears[1:])),
+                'seconds': self.seconds}
+        if hasattr(self.board, 'cache'):
+            game['cache'] = {'hits': self.cache_hits, 'misses': self.cache_misses}
+        return game
+
+    def replay(self):
+        """Return the replay of a recorded game so far, see tetris.replay"""
+
+        return {'seed':       self.seed,
+                'chromosome': list(self.chromosome),
+                'score':      self.score,
+                'pieces':     bytes(self.dealt),
+                'moves':      bytes(self.moves)}
+
+
+def run_tetris_game(chromosome, iterations=500, engine='list', seed=None, pieces=None, lookahead=False,
+                    beam_width=5, record=False):
+    """Play a headless game with the AI and return its statistics.
+
+    Takes the arguments of run_tetris_simulation. The statistics are a dict:
+        score:   the game score
+        pieces:  number of pieces played
+        lines:   number of moves clearing 1, 2, 3 and 4 lines, by name
+        seconds: wall time of the game
+        cache:   hits and misses of the engine's feature cache during the
+                 game, for the engines that have one
+        profile: calls and times of the instrumented functions during the
+                 game, while tetris.instrument is enabled
+        replay:  replay of the game (see tetris.replay), with record
+
+    """
+    profiler = instrument.active_profiler()
+    if profiler is not None:
+        profile_start = profiler.snapshot()
+
+    game = TetrisGame(chromosome, engine, seed, pieces, lookahead, beam_width, record)
+    game.advance(iterations)
+
+    stats = game.stats()
+    if record:
+        stats['replay'] = game.replay()
+    if profiler is not None:
+        stats['profile'] = profiler.since(profile_start)
+    return stats
+
+
+def run_tetris_simulation(chromosome, iterations=500, engine='list', seed=None, pieces=None, lookahead=False,
+                          beam_width=5, replay=None):
+    """Play a headless game with the AI and return its score.
+
+    Args:
+        chromosome: heuristic weights used to rate the moves
+        iterations: maximum number of pieces to play
+        engine:     board engine from SIMULATION_ENGINES ('list', 'bitboard', 'numpy'
+                    or 'cached')
+        seed:       seed of the game's own PieceSource, or None to draw the
+                    pieces from the global random generator
+        pieces:     PieceSource or sequence of piece codes (from
+                    generate_piece_sequence) to play instead; a sequence needs
+                    at least iterations + 2 pieces
+        lookahead:  search one ply deeper with the next piece
+        beam_width: number of placements searched deeper with lookahead
+        replay:     file the replay of the game is written to, see
+                    tetris.replay
+
+    """
+    stats = run_tetris_game(chromosome, iterations, engine, seed, pieces, lookahead, beam_width,
+                            record=replay is not None)
+    if replay is not None:
+        write_replay(replay, stats['replay'])
+    return stats['score']
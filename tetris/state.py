@@ -0,0 +1,276 @@
+"""Board state keeping the heuristics of a board up to date incrementally"""
+
+from .constants import BOARDWIDTH, BOARDHEIGHT, BLANK
+from .pieces import PIECE_CELLS, PIECE_BOUNDS
+from .board import (get_blank_board, add_to_board, apply_piece, undo_piece, is_valid_position,
+                    remove_complete_lines, get_column_heights, update_column_heights, drop_piece)
+from .heuristics import calc_heuristics, calculate_bumpiness
+
+
+def _build_piece_tables():
+    """Return the rows and columns tables used by BoardState.
+
+    rows:    (y, n) template rows of each rotation with n filled cells
+    columns: (x, top_y, bottom_y) filled span of each template column
+
+    """
+    rows, columns = {}, {}
+    for shape, rotations in PIECE_CELLS.items():
+        rows[shape], columns[shape] = [], []
+        for cells in rotations:
+            ys = sorted(set(y for _, y in cells))
+            rows[shape].append(tuple((y, sum(1 for _, cy in cells if cy == y)) for y in ys))
+
+            spans = []
+            for x in sorted(set(x for x, _ in cells)):
+                column_ys = [y for cx, y in cells if cx == x]
+                # The incremental updates rely on the cells of a column being contiguous
+                assert max(column_ys) - min(column_ys) + 1 == len(column_ys)
+                spans.append((x, min(column_ys), max(column_ys)))
+            columns[shape].append(tuple(spans))
+
+    return rows, columns
+
+
+PIECE_ROWS, PIECE_COLUMNS = _build_piece_tables()
+
+
+class BoardState:
+    """A board together with its heuristics, kept up to date incrementally.
+
+    The per column heights, holes, blocks above holes and sum of heights, the
+    per row cell counts and the bumpiness are updated as pieces are added and
+    lines are cleared, so rating a move only looks at the columns the piece
+    touches instead of copying and rescanning the whole board.
+
+    """
+
+    def __init__(self, board=None):
+        self.board = get_blank_board() if board is None else board
+        self.refresh()
+
+    def refresh(self):
+        """Recompute every heuristic from the board"""
+
+        board = self.board
+        self.heights     = get_column_heights(board)
+        self.holes       = []
+        self.blocking    = []
+        self.sum_heights = []
+
+        for x in range(BOARDWIDTH):
+            holes, blocking, sum_heights = calc_heuristics(board, x)
+            self.holes.append(holes)
+            self.blocking.append(blocking)
+            self.sum_heights.append(sum_heights)
+
+        self.row_counts = [sum(1 for x in range(BOARDWIDTH) if board[x][y] != BLANK)
+                           for y in range(BOARDHEIGHT)]
+
+        self.total_holes       = sum(self.holes)
+        self.total_blocking    = sum(self.blocking)
+        self.total_sum_heights = sum(self.sum_heights)
+        self.bumpiness         = self._calc_bumpiness(self.heights)
+
+    def copy(self):
+        """Return an independent copy of the board state"""
+
+        state = self.__class__.__new__(self.__class__)
+        state.board       = [column[:] for column in self.board]
+        state.heights     = self.heights[:]
+        state.holes       = self.holes[:]
+        state.blocking    = self.blocking[:]
+        state.sum_heights = self.sum_heights[:]
+        state.row_counts  = self.row_counts[:]
+
+        state.total_holes       = self.total_holes
+        state.total_blocking    = self.total_blocking
+        state.total_sum_heights = self.total_sum_heights
+        state.bumpiness         = self.bumpiness
+
+        return state
+
+    @staticmethod
+    def _calc_bumpiness(heights):
+        return sum(abs(heights[i] - heights[i+1]) for i in range(BOARDWIDTH - 1))
+
+    def is_valid_position(self, piece, adj_X=0, adj_Y=0):
+        return is_valid_position(self.board, piece, adj_X, adj_Y)
+
+    def drop_piece(self, piece):
+        drop_piece(self.board, piece, self.heights)
+
+    def add_piece(self, piece):
+        """Add a dropped piece to the board and return the lines cleared"""
+
+        board = self.board
+        shape, rotation = piece['shape'], piece['rotation']
+        piece_y = piece['y']
+
+        # A piece locked at the top of a topped out board can overlap filled
+        # cells, which the row counts can't tell apart from new ones
+        overlaps = not self._covers_blank_cells(piece)
+        add_to_board(board, piece)
+
+        if overlaps or piece_y + PIECE_BOUNDS[shape][rotation][1] < 0:
+            # Cells above the board wrap around, start over from the board
+            lines_cleared = remove_complete_lines(board)
+            self.refresh()
+            return lines_cleared
+
+        is_line_complete = False
+        for y, n in PIECE_ROWS[shape][rotation]:
+            self.row_counts[piece_y + y] += n
+            if self.row_counts[piece_y + y] == BOARDWIDTH:
+                is_line_complete = True
+
+        if is_line_complete:
+            lines_cleared = remove_complete_lines(board)
+            self.refresh()
+            return lines_cleared
+
+        self._update_columns(piece)
+        return 0
+
+    def _covers_blank_cells(self, piece):
+        """Return whether every cell of the piece is blank on the board"""
+
+        board, piece_x, piece_y = self.board, piece['x'], piece['y']
+        for x, y in PIECE_CELLS[piece['shape']][piece['rotation']]:
+            if board[x + piece_x][y + piece_y] != BLANK:
+                return False
+        return True
+
+    def _update_columns(self, piece):
+        """Update the heuristics of the columns of a piece just added without
+        clearing lines"""
+
+        board, piece_x = self.board, piece['x']
+        for x, _, _ in PIECE_COLUMNS[piece['shape']][piece['rotation']]:
+            x += piece_x
+            holes, blocking, sum_heights = calc_heuristics(board, x)
+            self.total_holes       += holes - self.holes[x]
+            self.total_blocking    += blocking - self.blocking[x]
+            self.total_sum_heights += sum_heights - self.sum_heights[x]
+            self.holes[x], self.blocking[x], self.sum_heights[x] = holes, blocking, sum_heights
+
+        update_column_heights(self.heights, piece)
+        self.bumpiness = self._calc_bumpiness(self.heights)
+
+    def apply_piece(self, piece):
+        """Add a dropped piece like add_piece, so that undo_piece can take it
+        back off.
+
+        Return the lines cleared and the undo record: the cells and rows
+        apply_piece changed on the board, and the heuristics before the move.
+
+        """
+        saved = (self.heights[:], self.holes[:], self.blocking[:], self.sum_heights[:], self.row_counts[:],
+                 self.total_holes, self.total_blocking, self.total_sum_heights, self.bumpiness)
+
+        shape, rotation = piece['shape'], piece['rotation']
+        piece_x, piece_y = piece['x'], piece['y']
+
+        if piece_y + PIECE_BOUNDS[shape][rotation][1] >= 0 and \
+                all(self.row_counts[piece_y + y] + n < BOARDWIDTH for y, n in PIECE_ROWS[shape][rotation]) and \
+                self._covers_blank_cells(piece):
+            # No line is cleared, the record is the cells of the piece
+            board, color = self.board, piece['color']
+            cells = []
+            for x, y in PIECE_CELLS[shape][rotation]:
+                x += piece_x
+                y += piece_y
+                cells.append((x, y, board[x][y]))
+                board[x][y] = color
+            for y, n in PIECE_ROWS[shape][rotation]:
+                self.row_counts[piece_y + y] += n
+            self._update_columns(piece)
+            return 0, ((cells, []), saved)
+
+        record = apply_piece(self.board, piece)
+        self.refresh()
+        return len(record[1]), (record, saved)
+
+    def undo_piece(self, undo):
+        """Take back a piece added by apply_piece"""
+
+        record, saved = undo
+        undo_piece(self.board, record)
+        (self.heights, self.holes, self.blocking, self.sum_heights, self.row_counts,
+         self.total_holes, self.total_blocking, self.total_sum_heights, self.bumpiness) = saved
+
+    def evaluate_move(self, piece):
+        """Return the features of dropping the piece from the top of the board.
+
+        The piece rotation and x are kept, its y is set to the landing row.
+        Return None if the piece doesn't fit at the top of the board, otherwise
+        (lines cleared, max height, new holes, bumpiness, new blocking blocks)
+        with the same values calc_move_info gives.
+
+        """
+        piece['y'] = 0
+        if not is_valid_position(self.board, piece):
+            return None
+
+        drop_piece(self.board, piece, self.heights)
+
+        shape, rotation = piece['shape'], piece['rotation']
+        piece_x, piece_y = piece['x'], piece['y']
+
+        for y, n in PIECE_ROWS[shape][rotation]:
+            if self.row_counts[piece_y + y] + n == BOARDWIDTH:
+                return self._evaluate_placed(piece)
+
+        heights      = self.heights
+        new_heights  = heights[:]
+        new_holes    = 0
+        new_blocking = 0
+        sum_heights  = self.total_sum_heights
+
+        for x, top_y, bottom_y in PIECE_COLUMNS[shape][rotation]:
+            x += piece_x
+            top = BOARDHEIGHT - heights[x]
+            gap = top - (piece_y + bottom_y) - 1
+            if gap < 0:
+                # The piece slid under an overhang
+                return self._evaluate_placed(piece)
+
+            # Every empty cell between the piece and the column is a new hole,
+            # and the piece blocks a hole if there is any below it
+            num_cells     = bottom_y - top_y + 1
+            new_holes    += gap
+            if gap or self.holes[x]:
+                new_blocking += num_cells
+
+            sum_heights += num_cells * (2 * BOARDHEIGHT - 2 * piece_y - top_y - bottom_y) // 2
+            new_heights[x] = BOARDHEIGHT - (piece_y + top_y)
+
+        columns   = PIECE_COLUMNS[shape][rotation]
+        bumpiness = self.bumpiness
+        for i in range(max(piece_x + columns[0][0] - 1, 0), min(piece_x + columns[-1][0] + 1, BOARDWIDTH - 1)):
+            bumpiness += abs(new_heights[i] - new_heights[i+1]) - abs(heights[i] - heights[i+1])
+
+        return 0, sum_heights, new_holes, bumpiness, new_blocking
+
+    def _evaluate_placed(self, piece):
+        """Evaluate a dropped piece by adding it to the board, reading the
+        whole board and taking it back off, for the moves that clear lines or
+        don't land on top of the columns"""
+
+        board  = self.board
+        record = apply_piece(board, piece)
+
+        total_holes          = 0
+        total_blocking_block = 0
+        max_height           = 0
+        for x in range(BOARDWIDTH):
+            holes, blocking, sum_heights = calc_heuristics(board, x)
+            total_holes          += holes
+            total_blocking_block += blocking
+            max_height           += sum_heights
+        bumpiness = calculate_bumpiness(board)
+
+        undo_piece(board, record)
+
+        return (len(record[1]), max_height, total_holes - self.total_holes,
+                bumpiness, total_blocking_block - self.total_blocking)
@@ -1,170 +1,29 @@
-import random, time, pygame, sys
-from pygame.locals import *
-import os
+import random, time, sys, threading
+from collections import deque
+
+from tetris.constants import *
+from tetris import (PIECES, PIECE_CELLS, SIMULATION_ENGINES, BoardState, TetrisGame, ReplayPlayer, get_new_piece,
+                    get_blank_board, is_valid_position, add_to_board, remove_complete_lines, find_best_move,
+                    load_replay, train_genetic_algorithm)
+# Kept importable from here for the scripts written against this module
+from tetris import run_tetris_simulation
+
+# pygame is only imported when the UI is used, see load_pygame()
+pygame = None
 
-##############################################################################
-# SETTING UP GENERAL CONSTANTS
-##############################################################################
 
-# Board config
-FPS          = 35
-WINDOWWIDTH  = 650
-WINDOWHEIGHT = 690
-BOXSIZE      = 25
-BOARDWIDTH   = 10
-BOARDHEIGHT  = 25
-BLANK        = '.'
-XMARGIN      = int((WINDOWWIDTH - BOARDWIDTH * BOXSIZE) / 2)
-TOPMARGIN    = WINDOWHEIGHT - (BOARDHEIGHT * BOXSIZE) - 5
-
-# Timing config
-MOVESIDEWAYSFREQ = 0.15
-MOVEDOWNFREQ     = 0.1
-
-# Colors
-#               R    G    B
-WHITE       = (255, 255, 255)
-GRAY        = (185, 185, 185)
-BLACK       = (  0,   0,   0)
-RED         = (155,   0,   0)
-LIGHTRED    = (175,  20,  20)
-GREEN       = (  0, 155,   0)
-LIGHTGREEN  = ( 20, 175,  20)
-BLUE        = (  0,   0, 155)
-LIGHTBLUE   = ( 20,  20, 175)
-YELLOW      = (155, 155,   0)
-LIGHTYELLOW = (175, 175,  20)
-PURPLE      = (128,   0, 128)
-ORANGE      = (255, 165,   0)
-LIGHTGRAY   = (211, 211, 211)
-
-BORDERCOLOR     = BLUE
-BGCOLOR         = BLACK
-TEXTCOLOR       = WHITE
-TEXTSHADOWCOLOR = GRAY
-COLORS          = (     BLUE,      GREEN,      RED,      YELLOW)
-LIGHTCOLORS     = (LIGHTBLUE, LIGHTGREEN, LIGHTRED, LIGHTYELLOW)
-
-# Each color must have light color
-assert len(COLORS) == len(LIGHTCOLORS)
-
-random.seed(42)
-
-# Piece Templates
-# The TEMPLATEWIDTH and TEMPLATEHEIGHT constants simply set how large each row
-# and column for each shape’s rotation should be
-TEMPLATEWIDTH  = 5
-TEMPLATEHEIGHT = 5
-
-S_SHAPE_TEMPLATE = [['.....',
-                     '.....',
-                     '..OO.',
-                     '.OO..',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '..OO.',
-                     '...O.',
-                     '.....']]
-
-Z_SHAPE_TEMPLATE = [['.....',
-                     '.....',
-                     '.OO..',
-                     '..OO.',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '.OO..',
-                     '.O...',
-                     '.....']]
-
-I_SHAPE_TEMPLATE = [['..O..',
-                     '..O..',
-                     '..O..',
-                     '..O..',
-                     '.....'],
-                    ['.....',
-                     '.....',
-                     'OOOO.',
-                     '.....',
-                     '.....']]
-
-O_SHAPE_TEMPLATE = [['.....',
-                     '.....',
-                     '.OO..',
-                     '.OO..',
-                     '.....']]
-
-J_SHAPE_TEMPLATE = [['.....',
-                     '.O...',
-                     '.OOO.',
-                     '.....',
-                     '.....'],
-                    ['.....',
-                     '..OO.',
-                     '..O..',
-                     '..O..',
-                     '.....'],
-                    ['.....',
-                     '.....',
-                     '.OOO.',
-                     '...O.',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '..O..',
-                     '.OO..',
-                     '.....']]
-
-L_SHAPE_TEMPLATE = [['.....',
-                     '...O.',
-                     '.OOO.',
-                     '.....',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '..O..',
-                     '..OO.',
-                     '.....'],
-                    ['.....',
-                     '.....',
-                     '.OOO.',
-                     '.O...',
-                     '.....'],
-                    ['.....',
-                     '.OO..',
-                     '..O..',
-                     '..O..',
-                     '.....']]
-
-T_SHAPE_TEMPLATE = [['.....',
-                     '..O..',
-                     '.OOO.',
-                     '.....',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '..OO.',
-                     '..O..',
-                     '.....'],
-                    ['.....',
-                     '.....',
-                     '.OOO.',
-                     '..O..',
-                     '.....'],
-                    ['.....',
-                     '..O..',
-                     '.OO..',
-                     '..O..',
-                     '.....']]
-
-PIECES = {'S': S_SHAPE_TEMPLATE,
-          'Z': Z_SHAPE_TEMPLATE,
-          'J': J_SHAPE_TEMPLATE,
-          'L': L_SHAPE_TEMPLATE,
-          'I': I_SHAPE_TEMPLATE,
-          'O': O_SHAPE_TEMPLATE,
-          'T': T_SHAPE_TEMPLATE}
+def load_pygame():
+    """Import pygame and its constants the first time the UI needs them"""
+
+    global pygame
+    if pygame is None:
+        import pygame
+        import pygame.locals
+        globals().update((name, value) for name, value in vars(pygame.locals).items()
+                         if not name.startswith('_'))
+
+    return pygame
+
 
 # Define if the game is manual or not
 MANUAL_GAME = False
@@ -172,6 +31,7 @@ MANUAL_GAME = False
 
 def menu_screen():
     global MANUAL_GAME
+    load_pygame()
     pygame.init()
     screen = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
     font = pygame.font.Font('freesansbold.ttf', 36)
@@ -202,6 +62,7 @@ def menu_screen():
 ##############################################################################
 def main():
     global FPSCLOCK, DISPLAYSURF, BASICFONT, BIGFONT, BGCOLOR, TEXTCOLOR, BUTTONCOLOR
+    load_pygame()
     pygame.init()
 
     FPSCLOCK = pygame.time.Clock()
@@ -292,92 +153,211 @@ def draw_menu():
     draw_button(white_theme_button, "White Theme", mouse_x, mouse_y)
 
 
-def run_ai_game(best_chromosome):
-    board = get_blank_board()
-    score = 0
-    level, fall_freq = calc_level_and_fall_freq(score)
-    falling_piece = get_new_piece()
-    next_piece = get_new_piece()
+# AI playback speeds: factor the fall of the pieces is sped up by, None to
+# play as fast as possible without showing the pieces fall
+PLAYBACK_SPEEDS = {'1x': 1, '10x': 10, 'max': None}
+ROW_DELAY       = 0.06      # seconds a piece takes to fall one row at 1x
+PIECE_DELAY     = 1 / FPS   # seconds between two pieces at 1x
+
+
+def check_playback_engine(engine):
+    """Raise a ValueError unless engine is an engine from SIMULATION_ENGINES
+    keeping the board as a list of columns, which the UI draws"""
+
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"unknown engine {engine}")
+    if not issubclass(SIMULATION_ENGINES[engine], BoardState):
+        playable = ', '.join(sorted(name for name, state in SIMULATION_ENGINES.items()
+                                    if issubclass(state, BoardState)))
+        raise ValueError(f"the {engine} engine has no board to draw, use one of {playable}")
+
+
+class AIPlayback:
+    """An AI game played on a thread at a playback speed.
+
+    The game runs on its own, the UI calls sample() at its frame rate to get
+    the latest state. At 1x and 10x the falling piece is shown row by row,
+    at max the pieces are placed without the fall and a state is only copied
+    when the UI asks for one, so the game runs at full speed.
+
+    """
+
+    def __init__(self, chromosome, lookahead=False, engine='list', speed='1x'):
+        # The board is drawn from game.board.board, so the engine must keep one
+        check_playback_engine(engine)
+        self.game     = TetrisGame(chromosome, engine, lookahead=lookahead)
+        self.speed    = speed
+        self.running  = True
+        self.wanted   = False
+        self.falling  = None
+        self.snapshot = None
+        self._publish()
+        self.thread   = threading.Thread(target=self._run, name='ai-playback', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+
+    def sample(self):
+        """Return the latest state of the game, and ask for a new one"""
+
+        self.wanted = True
+        return self.snapshot
+
+    def _publish(self):
+        game = self.game
+        self.wanted   = False
+        self.snapshot = {'board':         [column[:] for column in game.board.board],
+                         'falling_piece': self.falling,
+                         'next_piece':    dict(game.next_piece),
+                         # The UI scores a point per piece on top of the lines
+                         'score':         game.score + game.pieces_played,
+                         'pieces':        game.pieces_played,
+                         'over':          game.over}
+
+    def _fall(self, factor):
+        """Show the current piece falling to where the AI puts it, and return
+        the move for game.advance to play"""
+
+        game  = self.game
+        piece = dict(game.current_piece)
+        move  = find_best_move(game.board, piece, game.chromosome, game.next_piece if game.lookahead else None,
+                               game.beam_width)
+        if move is None:
+            return None
+        piece['rotation'], piece['x'] = move
+        landed = dict(piece)
+        game.board.drop_piece(landed)
+
+        for y in range(piece['y'] + 1, landed['y'] + 1):
+            if not self.running or PLAYBACK_SPEEDS[self.speed] is None:
+                break
+            self.falling = dict(piece, y=y)
+            self._publish()
+            time.sleep(ROW_DELAY / factor)
+        return move
+
+    def _run(self):
+        game = self.game
+        while self.running and not game.over:
+            factor = PLAYBACK_SPEEDS[self.speed]
+            move   = self._fall(factor) if factor is not None else None
+
+            game.advance(game.pieces_played + 1, move)
+            self.falling = None
+            if factor is not None or self.wanted or game.over:
+                self._publish()
+            if factor is not None:
+                time.sleep(PIECE_DELAY / factor)
+
+
+def run_ai_game(best_chromosome, lookahead=False, engine='list', speed='1x'):
+    """Show the AI playing, the keys 1, 2 and 3 set the playback speed to 1x,
+    10x and max"""
+
+    check_playback_engine(engine)
+    load_pygame()
     pygame.init()
     global DISPLAYSURF, FPSCLOCK
     DISPLAYSURF = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
     FPSCLOCK = pygame.time.Clock()
     pygame.display.set_caption('Tetris AI Player')
+    renderer = Renderer(DISPLAYSURF, BGCOLOR, TEXTCOLOR)
+    speed_keys = {K_1: '1x', K_2: '10x', K_3: 'max'}
 
-    while True:
-        if falling_piece == None:
-            falling_piece = next_piece
-            next_piece = get_new_piece()
-            score += 1
-            if not is_valid_position(board, falling_piece):
-                show_game_over_screen()
-                return
+    playback = AIPlayback(best_chromosome, lookahead, engine, speed)
+    playback.start()
+    shown_pieces = None
+    rates = deque(maxlen=FPS)   # (time, pieces) of the last second of frames
+    try:
+        while True:
+            check_quit()
+            for event in pygame.event.get(KEYDOWN):
+                if event.key in speed_keys:
+                    playback.speed = speed_keys[event.key]
 
-        check_quit()
+            state = playback.sample()
+            if state['pieces'] != shown_pieces:
+                renderer.set_board(state['board'])
+                shown_pieces = state['pieces']
 
-        # Choose best move
-        best_score = float('-inf')
-        best_x = 0
-        best_rotation = 0
+            now = time.perf_counter()
+            rates.append((now, state['pieces']))
+            seconds = now - rates[0][0]
+            rate = (state['pieces'] - rates[0][1]) / seconds if seconds else 0.0
 
-        for r in range(len(PIECES[falling_piece['shape']])):
-            for x in range(-2, BOARDWIDTH - 2):
-                test_piece = falling_piece.copy()
-                test_piece['rotation'] = r
-                test_piece['x'] = x
-                test_piece['y'] = 0
+            level, fall_freq = calc_level_and_fall_freq(state['score'])
+            renderer.draw(state['falling_piece'], state['next_piece'], state['score'], level,
+                          (f'Speed: {playback.speed}', f'Pieces/s: {rate:.0f}', f'Pieces: {state["pieces"]}'))
+            if state['over']:
+                break
+            FPSCLOCK.tick(FPS)
+    finally:
+        playback.stop()
 
-                if not is_valid_position(board, test_piece):
-                    continue
+    show_game_over_screen()
 
-                score_val = rate_move(board, test_piece.copy(), best_chromosome)
 
-                if score_val > best_score:
-                    best_score = score_val
-                    best_rotation = r
-                    best_x = x
+# Moves per second a replay is played at, for the playback speeds
+REPLAY_RATES = {'1x': 1, '10x': 10, 'max': 1000}
 
-        # Apply best rotation and x position
-        falling_piece['rotation'] = best_rotation
-        falling_piece['x'] = best_x
 
-        while is_valid_position(board, falling_piece, adj_Y=1):
-            falling_piece['y'] += 1
+def run_replay(filename, speed='1x'):
+    """Watch a game replay (see tetris.replay) without running the AI.
 
-            # Draw the screen after each step
-            DISPLAYSURF.fill(BGCOLOR)
-            draw_board(board)
-            draw_status(score, level)
-            draw_next_piece(next_piece)
-            draw_piece(falling_piece)
-            pygame.display.update()
-            pygame.time.wait(60)  # Adjust the delay (ms) for desired speed
-
-        add_to_board(board, falling_piece)
-        lines_cleared = remove_complete_lines(board)
-
-        if lines_cleared == 1:
-            score += 40
-        elif lines_cleared == 2:
-            score += 120
-        elif lines_cleared == 3:
-            score += 300
-        elif lines_cleared == 4:
-            score += 1200
-
-        level, fall_freq = calc_level_and_fall_freq(score)
-        falling_piece = None
-
-        # Draw the screen
-        DISPLAYSURF.fill(BGCOLOR)
-        draw_board(board)
-        draw_status(score, level)
-        draw_next_piece(next_piece)
-        pygame.display.update()
-        FPSCLOCK.tick(FPS)
+    Space pauses, the left and right arrows step one move, the up and down
+    arrows seek 50 moves, Home and End go to the start and the end, and the
+    keys 1, 2 and 3 set the speed to 1x, 10x and max.
+
+    """
+    player = ReplayPlayer(load_replay(filename))
+
+    load_pygame()
+    pygame.init()
+    global DISPLAYSURF, FPSCLOCK
+    DISPLAYSURF = pygame.display.set_mode((WINDOWWIDTH, WINDOWHEIGHT))
+    FPSCLOCK = pygame.time.Clock()
+    pygame.display.set_caption(f'Tetris Replay: {filename}')
+    renderer = Renderer(DISPLAYSURF, BGCOLOR, TEXTCOLOR)
+    speed_keys = {K_1: '1x', K_2: '10x', K_3: 'max'}
+    seek_keys  = {K_LEFT: -1, K_RIGHT: 1, K_DOWN: -50, K_UP: 50}
+
+    paused   = False
+    shown    = None
+    position = 0.0   # moves played, with the fraction of the next one
+    while True:
+        check_quit()
+        for event in pygame.event.get(KEYDOWN):
+            if event.key in speed_keys:
+                speed = speed_keys[event.key]
+            elif event.key == K_SPACE:
+                paused = not paused
+            elif event.key in seek_keys:
+                paused   = True
+                position = player.position + seek_keys[event.key]
+            elif event.key == K_HOME:
+                position = 0
+            elif event.key == K_END:
+                position = len(player)
+
+        elapsed = FPSCLOCK.tick(FPS) / 1000
+        if not paused:
+            position += REPLAY_RATES[speed] * elapsed
+        position = max(0, min(position, len(player)))
+        player.seek(int(position))
+
+        if player.position != shown:
+            renderer.set_board(player.board.board)
+            shown = player.position
+
+        level, fall_freq = calc_level_and_fall_freq(player.score)
+        status = 'Paused' if paused else ('End' if player.position == len(player) else f'Speed: {speed}')
+        renderer.draw(None, player.current_piece(), player.score, level,
+                      (status, f'Move: {player.position}/{len(player)}'))
 
-        if falling_piece != None:
-            draw_piece(falling_piece)
 
 def show_game_over_screen():
     """Display the Game Over screen."""
@@ -408,6 +388,8 @@ def show_game_over_screen():
 
 
 def run_game():
+    load_pygame()
+
     # Setup variables
     board              = get_blank_board()
     last_movedown_time = time.time()
@@ -421,6 +403,7 @@ def run_game():
 
     falling_piece      = get_new_piece()
     next_piece         = get_new_piece()
+    renderer           = Renderer(DISPLAYSURF, BGCOLOR, TEXTCOLOR, BASICFONT)
 
     while True:
         # Game Loop
@@ -450,6 +433,7 @@ def run_game():
                     DISPLAYSURF.fill(BGCOLOR)
                     # Pause until a key press
                     show_text_screen('Paused')
+                    renderer.invalidate()
 
                     # Update times
                     last_fall_time     = time.time()
@@ -553,6 +537,7 @@ def run_game():
 
                 level, fall_freq = calc_level_and_fall_freq(score)
                 falling_piece    = None
+                renderer.set_board(board)
 
             else:
                 # Piece did not land, just move the piece down
@@ -560,15 +545,7 @@ def run_game():
                 last_fall_time      = time.time()
 
         # Drawing everything on the screen
-        DISPLAYSURF.fill(BGCOLOR)
-        draw_board(board)
-        draw_status(score, level)
-        draw_next_piece(next_piece)
-
-        if falling_piece != None:
-            draw_piece(falling_piece)
-
-        pygame.display.update()
+        renderer.draw(falling_piece, next_piece, score, level)
         FPSCLOCK.tick(FPS)
         pygame.time.wait(60)
 
@@ -653,105 +630,6 @@ def calc_level_and_fall_freq(score):
     return level, fall_freq
 
 
-def get_new_piece():
-    """Return a random new piece in a random rotation and color"""
-
-    shape     = random.choice(list(PIECES.keys()))
-    new_piece = {'shape': shape,
-                'rotation': random.randint(0, len(PIECES[shape]) - 1),
-                'x': int(BOARDWIDTH / 2) - int(TEMPLATEWIDTH / 2),
-                'y': -2, # start it above the board (i.e. less than 0)
-                'color': random.randint(0, len(COLORS)-1)}
-
-    return new_piece
-
-
-def add_to_board(board, piece):
-    """Fill in the board based on piece's location, shape, and rotation"""
-
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            if PIECES[piece['shape']][piece['rotation']][y][x] != BLANK:
-                board[x + piece['x']][y + piece['y']] = piece['color']
-
-
-def get_blank_board():
-    """Create and return a new blank board data structure"""
-
-    board = []
-    for i in range(BOARDWIDTH):
-        board.append([BLANK] * BOARDHEIGHT)
-
-    return board
-
-
-def is_on_board(x, y):
-    """Check if the piece is on the board"""
-
-    return x >= 0 and x < BOARDWIDTH and y < BOARDHEIGHT
-
-
-def is_valid_position(board, piece, adj_X=0, adj_Y=0):
-    """Return True if the piece is within the board and not colliding"""
-
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            is_above_board = y + piece['y'] + adj_Y < 0
-
-            if is_above_board or PIECES[piece['shape']][piece['rotation']][y][x] == BLANK:
-                continue
-
-            if not is_on_board(x + piece['x'] + adj_X, y + piece['y'] + adj_Y):
-                return False
-
-            if board[x + piece['x'] + adj_X][y + piece['y'] + adj_Y] != BLANK:
-                return False
-
-    return True
-
-
-def is_complete_line(board, y):
-    """Return True if the line filled with boxes with no gaps"""
-
-    for x in range(BOARDWIDTH):
-        if board[x][y] == BLANK:
-            return False
-
-    return True
-
-
-def remove_complete_lines(board):
-    """Remove any completed lines on the board.
-
-    After remove any completed lines, move everything above them dowm and
-    return the number of complete lines.
-
-    """
-    num_removed_lines = 0
-    y = BOARDHEIGHT - 1     # Start y at the bottom of the board
-
-    while y >= 0:
-        if is_complete_line(board, y):
-            # Remove the line and pull boxes down by one line.
-            for pullDownY in range(y, 0, -1):
-                for x in range(BOARDWIDTH):
-                    board[x][pullDownY] = board[x][pullDownY-1]
-
-            # Set very top line to blank.
-            for x in range(BOARDWIDTH):
-                board[x][0] = BLANK
-
-            num_removed_lines += 1
-
-            # Note on the next iteration of the loop, y is the same.
-            # This is so that if the line that was pulled down is also
-            # complete, it will be removed.
-        else:
-            y -= 1  # Move on to check next row up
-
-    return num_removed_lines
-
-
 def conv_to_pixels_coords(boxx, boxy):
     """Convert the given xy coordinates to the screen coordinates
 
@@ -762,341 +640,147 @@ def conv_to_pixels_coords(boxx, boxy):
     return (XMARGIN + (boxx * BOXSIZE)), (TOPMARGIN + (boxy * BOXSIZE))
 
 
-def draw_box(boxx, boxy, color, pixelx=None, pixely=None):
-    """Draw box
-
-    Draw a single box (each tetromino piece has four boxes) at xy coordinates
-    on the board. Or, if pixelx and pixely are specified, draw to the pixel
-    coordinates stored in pixelx and pixely (this is used for the "Next" piece).
-
-    """
-    if color == BLANK:
-        return
-
-    if pixelx == None and pixely == None:
-        pixelx, pixely = conv_to_pixels_coords(boxx, boxy)
-
-    pygame.draw.rect(DISPLAYSURF, COLORS[color], (pixelx + 1, pixely + 1, BOXSIZE - 1, BOXSIZE - 1))
-    pygame.draw.rect(DISPLAYSURF, LIGHTCOLORS[color], (pixelx + 1, pixely + 1, BOXSIZE - 4, BOXSIZE - 4))
-
-
-def draw_board(board):
-    """Draw board"""
-
-    # Draw the border around the board
-    pygame.draw.rect(DISPLAYSURF, BORDERCOLOR, (XMARGIN - 3, TOPMARGIN - 7, (BOARDWIDTH * BOXSIZE) + 8, (BOARDHEIGHT * BOXSIZE) + 8), 5)
-
-    # Fill the background of the board
-    pygame.draw.rect(DISPLAYSURF, BGCOLOR, (XMARGIN, TOPMARGIN, BOXSIZE * BOARDWIDTH, BOXSIZE * BOARDHEIGHT))
-
-    # Draw the individual boxes on the board
-    for x in range(BOARDWIDTH):
-        for y in range(BOARDHEIGHT):
-            draw_box(x, y, board[x][y])
-
-
-def draw_status(score, level):
-    """Draw status"""
-
-    # Draw the score text
-    score_surf = BASICFONT.render('Score: %s' % score, True, TEXTCOLOR)
-    score_rect = score_surf.get_rect()
-    score_rect.topleft = (WINDOWWIDTH - 150, 80)
-    DISPLAYSURF.blit(score_surf, score_rect)
-
-    # draw the level text
-    levelSurf = BASICFONT.render('Level: %s' % level, True, TEXTCOLOR)
-    levelRect = levelSurf.get_rect()
-    levelRect.topleft = (WINDOWWIDTH - 150, 110)
-    DISPLAYSURF.blit(levelSurf, levelRect)
-
-
-def draw_piece(piece, pixelx=None, pixely=None):
-    """Draw piece"""
-
-    shape_to_draw = PIECES[piece['shape']][piece['rotation']]
-
-    if pixelx == None and pixely == None:
-        # If pixelx and pixely hasn't been specified, use the location stored
-        # in the piece data structure
-        pixelx, pixely = conv_to_pixels_coords(piece['x'], piece['y'])
-
-    # Draw each of the boxes that make up the piece
-    for x in range(TEMPLATEWIDTH):
-        for y in range(TEMPLATEHEIGHT):
-            if shape_to_draw[y][x] != BLANK:
-                draw_box(None, None, piece['color'], pixelx + (x * BOXSIZE), pixely + (y * BOXSIZE))
-
-
-def draw_next_piece(piece):
-    """Draw next piece"""
-
-    # draw the "next" text
-    next_surf = BASICFONT.render('Next:', True, TEXTCOLOR)
-    next_rect = next_surf.get_rect()
-    next_rect.topleft = (WINDOWWIDTH - 150, 160)
-    DISPLAYSURF.blit(next_surf, next_rect)
-
-    # draw the "next" piece
-    draw_piece(piece, pixelx=WINDOWWIDTH-150, pixely=160)
-
-
 ##############################################################################
-# GAME STATISTICS FUNCTIONS
+# RENDERING
 ##############################################################################
 
-def calc_move_info(board, piece, x, r, total_holes_bef, total_blocking_bloks_bef):
-    """Calculate informations based on the current play"""
-
-    piece['rotation'] = r
-    piece['y']        = 0
-    piece['x']        = x
-
-    # Check if it's a valid position
-    if (not is_valid_position(board, piece)):
-        return [False]
-
-    # Goes down the piece while it's a valid position
-    while is_valid_position(board, piece, adj_X=0, adj_Y=1):
-        piece['y']+=1
-
-    # Create a hypothetical board
-    new_board = get_blank_board()
-    for x2 in range(BOARDWIDTH):
-        for y in range(BOARDHEIGHT):
-            new_board[x2][y] = board[x2][y]
-
-    # Add the piece to the new_board
-    add_to_board(new_board, piece)
-
-    # Calculate the sides in contact
-    piece_sides, floor_sides, wall_sides = calc_sides_in_contact(board, piece)
+class Renderer:
+    """Draw the game on a surface, updating only what changed.
 
-    # Calculate removed lines
-    num_removed_lines = remove_complete_lines(new_board)
+    The boxes are pre-rendered once per color, and the background, the border
+    and the locked boxes of the board are kept on an off-screen surface that
+    is only redrawn by set_board, when a piece locks or lines clear. Every
+    frame, draw copies the areas of the pieces and texts that changed back
+    from that surface, draws them again and passes the changed rectangles to
+    pygame.display.update. The average time of the last frames is shown in
+    the top left corner.
 
-    total_blocking_block = 0
-    total_holes          = 0
-    max_height           = 0
-    bumpiness = calculate_bumpiness(new_board)
-
-    for x2 in range(0, BOARDWIDTH):
-        b = calc_heuristics(new_board, x2)
-        total_holes += b[0]
-        total_blocking_block += b[1]
-        max_height += b[2]
-
-    new_holes           = total_holes - total_holes_bef
-    new_blocking_blocks = total_blocking_block - total_blocking_bloks_bef
-
-    return [True, max_height, num_removed_lines, new_holes, bumpiness, new_blocking_blocks, piece_sides, floor_sides, wall_sides]
-
-def calc_initial_move_info(board):
-    total_holes          = 0
-    total_blocking_bocks = 0
-
-    for x2 in range(0, BOARDWIDTH):
-        b = calc_heuristics(board, x2)
-
-        total_holes          += b[0]
-        total_blocking_bocks += b[1]
-
-    return total_holes, total_blocking_bocks
-
-def calc_heuristics(board, x):
     """
-    Calculate heuristics
-    The heuristics are composed by: number of holes, number of blocks above
-    hole and maximum height
-    """
-    total_holes        = 0
-    locals_holes       = 0
-    blocks_above_holes = 0
-    is_hole_exist      = False
-    sum_heights        = 0
-
-    for y in range(BOARDHEIGHT-1, -1,-1):
-        if board[x][y] == BLANK:
-            locals_holes += 1
-        else:
-            sum_heights += BOARDHEIGHT-y
-
-            if locals_holes > 0:
-                total_holes += locals_holes
-                locals_holes = 0
-
-            if total_holes > 0:
-                blocks_above_holes += 1
 
-    return total_holes, blocks_above_holes, sum_heights
-
-def calc_sides_in_contact(board, piece):
-    """Calculate sides in contacts"""
-
-    piece_sides = 0
-    floor_sides = 0
-    wall_sides  = 0
+    FRAME_TIME_EVERY = 30   # frames between two refreshes of the frame time
+
+    def __init__(self, surface, bgcolor=BGCOLOR, textcolor=TEXTCOLOR, font=None):
+        self.surface    = surface
+        self.bgcolor    = bgcolor
+        self.textcolor  = textcolor
+        self.font       = font if font is not None else pygame.font.Font('freesansbold.ttf', 18)
+        self.board_rect = pygame.Rect(XMARGIN, TOPMARGIN, BOXSIZE * BOARDWIDTH, BOXSIZE * BOARDHEIGHT)
+        self.tiles      = [self._make_tile(color) for color in range(len(COLORS))]
+
+        self.drawn       = {}     # name -> (key, screen rect) of what is on screen
+        self.restored    = []     # areas copied back from the static surface
+        self.full        = True
+        self.frames      = 0
+        self.frame_time  = 0.0
+        self.frame_label = 'Frame: -'
+
+        self.static = pygame.Surface(surface.get_size()).convert(surface)
+        self.static.fill(bgcolor)
+        pygame.draw.rect(self.static, BORDERCOLOR,
+                         (XMARGIN - 3, TOPMARGIN - 7, (BOARDWIDTH * BOXSIZE) + 8, (BOARDHEIGHT * BOXSIZE) + 8), 5)
+        self.set_board(get_blank_board())
+
+    def _make_tile(self, color):
+        tile = pygame.Surface((BOXSIZE - 1, BOXSIZE - 1)).convert(self.surface)
+        tile.fill(COLORS[color])
+        pygame.draw.rect(tile, LIGHTCOLORS[color], (0, 0, BOXSIZE - 4, BOXSIZE - 4))
+        return tile
+
+    def invalidate(self):
+        """Redraw the whole screen on the next frame, after something else
+        drew on it"""
+
+        self.full = True
+
+    def set_board(self, board):
+        """Redraw the locked boxes of the board"""
+
+        self.static.fill(self.bgcolor, self.board_rect)
+        tiles = self.tiles
+        self.static.blits([(tiles[board[x][y]], (XMARGIN + x * BOXSIZE + 1, TOPMARGIN + y * BOXSIZE + 1))
+                           for x in range(BOARDWIDTH) for y in range(BOARDHEIGHT) if board[x][y] != BLANK],
+                          doreturn=False)
+        self._restore(self.board_rect)
+
+    def _restore(self, rect):
+        self.surface.blit(self.static, rect, rect)
+        self.restored.append(rect)
+
+    def _text(self, text, topleft):
+        def draw():
+            surf = self.font.render(text, True, self.textcolor)
+            rect = surf.get_rect(topleft=topleft)
+            self.surface.blit(surf, rect)
+            return rect
+        return text, draw
+
+    def _piece(self, piece, pixelx, pixely):
+        if piece is None:
+            return None, None
+
+        def draw():
+            cells = [pygame.Rect(pixelx + x * BOXSIZE + 1, pixely + y * BOXSIZE + 1, BOXSIZE - 1, BOXSIZE - 1)
+                     for x, y in PIECE_CELLS[piece['shape']][piece['rotation']]]
+            tile = self.tiles[piece['color']]
+            self.surface.blits([(tile, cell) for cell in cells], doreturn=False)
+            return cells[0].unionall(cells[1:])
+        return (piece['shape'], piece['rotation'], piece['color'], pixelx, pixely), draw
+
+    def draw(self, falling_piece, next_piece, score, level, info=()):
+        """Draw a frame and update the changed parts of the display, info is
+        lines of text shown under the next piece"""
+
+        start = time.perf_counter()
+        if self.full:
+            self.surface.blit(self.static, (0, 0))
+            self.restored = [self.surface.get_rect()]
+            self.drawn    = {}
+            self.full     = False
+
+        items = {'score': self._text(f'Score: {score}', (WINDOWWIDTH - 150, 80)),
+                 'level': self._text(f'Level: {level}', (WINDOWWIDTH - 150, 110)),
+                 'label': self._text('Next:', (WINDOWWIDTH - 150, 160)),
+                 'frame': self._text(self.frame_label, (10, 10)),
+                 'next':  self._piece(next_piece, WINDOWWIDTH - 150, 160),
+                 'piece': self._piece(falling_piece, *conv_to_pixels_coords(falling_piece['x'], falling_piece['y']))
+                          if falling_piece is not None else (None, None)}
+        for i, line in enumerate(info):
+            items[f'info{i}'] = self._text(line, (WINDOWWIDTH - 150, 320 + i * 30))
+
+        # Erase what changed, then draw it again along with whatever the
+        # erased areas overlapped
+        for name, (key, rect) in list(self.drawn.items()):
+            if items.get(name, (None, None))[0] != key:
+                self._restore(rect)
+                del self.drawn[name]
+
+        restored, dirty = self.restored, self.restored[:]
+        for name, (key, draw) in items.items():
+            if key is None:
+                continue
+            current = self.drawn.get(name)
+            if current is None or current[1].collidelist(restored) != -1:
+                rect = draw()
+                self.drawn[name] = (key, rect)
+                dirty.append(rect)
 
-    for Px in range(TEMPLATEWIDTH):
-        for Py in range(TEMPLATEHEIGHT):
+        self.restored = []
+        if dirty:
+            pygame.display.update(dirty)
 
-            # Wall
-            if not PIECES[piece['shape']][piece['rotation']][Py][Px] == BLANK: # Quadrante faz parte da peça
-                if piece['x']+Px == 0 or piece['x']+Px == BOARDWIDTH-1:
-                    wall_sides += 1
-
-                if piece['y']+Py == BOARDHEIGHT-1:
-                    floor_sides += 1
-                else:
-                # Para outras opecas no contorno do template:
-                    if Py == TEMPLATEHEIGHT-1 and not board[piece['x']+Px][piece['y']+Py+1] == BLANK:
-                        piece_sides += 1
-
-                #os extremos do template sao colorido: confere se ha pecas do lado deles
-                if Px == 0 and piece['x']+Px > 0 and not board[piece['x']+Px-1][piece['y']+Py] == BLANK:
-                        piece_sides += 1
-
-                if Px == TEMPLATEWIDTH-1 and piece['x']+Px < BOARDWIDTH -1 and not board[piece['x']+Px+1][piece['y']+Py] == BLANK:
-                        piece_sides += 1
-
-            # Other pieces in general
-            elif piece['x']+Px < BOARDWIDTH and piece['x']+Px >= 0 and piece['y']+Py < BOARDHEIGHT and not board[piece['x']+Px][piece['y']+Py] == BLANK:  #quadrante do tabuleiro colorido mas nao do template
-
-                # O quadrante vazio do template esta colorido no tabuleiro
-                if not PIECES[piece['shape']][piece['rotation']][Py-1][Px] == BLANK:
-                    piece_sides += 1
-
-                if Px > 0 and not PIECES[piece['shape']][piece['rotation']][Py][Px-1] == BLANK:
-                    piece_sides += 1
-
-                if Px < TEMPLATEWIDTH-1 and not PIECES[piece['shape']][piece['rotation']][Py][Px+1] == BLANK:
-                    piece_sides += 1
-
-                    #(nao pode haver pecas em cima)
-
-    return  piece_sides, floor_sides, wall_sides
-
-##############################################################
-
-def rate_move(board, piece, chromosomes):
-    move_info = calc_move_info(board, piece, piece['x'], piece['rotation'], *calc_initial_move_info(board))
-    if not move_info[0]:
-        return -1
-    score = (
-        chromosomes[0] * move_info[2] +  # lines cleared
-        chromosomes[1] * move_info[1] +  # max height
-        chromosomes[2] * move_info[3] +  # new holes
-        chromosomes[3] * move_info[4] +  # bumpiness
-        chromosomes[4] * move_info[5]    # new blocking blocks
-    )
-    return score
-
-def column_height(board, x):
-    for y in range(BOARDHEIGHT):
-        if board[x][y] != BLANK:
-            return BOARDHEIGHT - y
-    return 0
-
-
-def count_holes(board):
-    holes = 0
-    for x in range(BOARDWIDTH):
-        block_found = False
-        for y in range(BOARDHEIGHT):
-            if board[x][y] != BLANK:
-                block_found = True
-            elif block_found:
-                holes += 1
-    return holes
-
-
-def calculate_bumpiness(board):
-    heights = [column_height(board, x) for x in range(BOARDWIDTH)]
-    return sum(abs(heights[i] - heights[i+1]) for i in range(len(heights) - 1))
-
-
-def init_population(size, num_chromosomes):
-    return [[random.uniform(-5, 5) for _ in range(num_chromosomes)] for _ in range(size)]
-
-
-def crossover(parent1, parent2):
-    return [(a + b) / 2 for a, b in zip(parent1, parent2)]
-
-
-def mutate(chromosome, mutation_rate=0.1):
-    return [
-        gene + random.uniform(-1, 1) if random.random() < mutation_rate else gene
-        for gene in chromosome
-    ]
-
-
-def train_genetic_algorithm(iterations=500, population_size=15, generations=10, eval_runs=5):
-    population = init_population(population_size, 5)
-    best_chromosome = None
-    best_score = -1
-    for gen in range(generations):
-        scores = []
-        for chrom in population:
-            score = run_tetris_simulation(chrom, iterations)
-            scores.append((score, chrom))
-        scores.sort(reverse=True, key=lambda x: x[0])
-        print(f"Generation {gen}: Best Score = {scores[0][0]}")
-        best_score, best_chromosome = scores[0]
-        top = [chrom for _, chrom in scores[:5]]
-        new_population = top[:]
-        while len(new_population) < population_size:
-            p1, p2 = random.sample(top, 2)
-            child = mutate(crossover(p1, p2))
-            new_population.append(child)
-        population = new_population
-    with open('best_chromosome.txt', 'w') as file:
-        file.write(f"Best Chromosome: {best_chromosome}\n")
-        file.write(f"Best Score: {best_score}\n")
-    return best_chromosome
-
-
-def run_tetris_simulation(chromosome, iterations=500):
-    board = get_blank_board()
-    score = 0
-    pieces_played = 0
-    current_piece = get_new_piece()
-    next_piece = get_new_piece()
-    while pieces_played < iterations:
-        best_score = float('-inf')
-        best_x = None
-        best_rotation = None
-        for r in range(len(PIECES[current_piece['shape']])):
-            for x in range(-2, BOARDWIDTH - 2):
-                test_piece = {
-                    'shape': current_piece['shape'],
-                    'rotation': r,
-                    'x': x,
-                    'y': 0,
-                    'color': current_piece['color']
-                }
-                if not is_valid_position(board, test_piece):
-                    continue
-                move_score = rate_move(board, test_piece.copy(), chromosome)
-                if move_score > best_score:
-                    best_score = move_score
-                    best_x = x
-                    best_rotation = r
-        if best_x is None or best_rotation is None:
-            break
-        current_piece['x'] = best_x
-        current_piece['rotation'] = best_rotation
-        while is_valid_position(board, current_piece, adj_Y=1):
-            current_piece['y'] += 1
-        add_to_board(board, current_piece)
-        lines_cleared = remove_complete_lines(board)
-        score += [0, 40, 120, 300, 1200][lines_cleared] if lines_cleared < 5 else 0
-        current_piece = next_piece
-        next_piece = get_new_piece()
-        pieces_played += 1
-        if not is_valid_position(board, current_piece):
-            break
-    return score
+        self.frame_time += time.perf_counter() - start
+        self.frames += 1
+        if self.frames == self.FRAME_TIME_EVERY:
+            self.frame_label = f'Frame: {self.frame_time / self.frames * 1000:.2f} ms'
+            self.frames, self.frame_time = 0, 0.0
 
 
 if __name__ == '__main__':
-    main()
+    # Seeded here rather than on import, so importing the game or the tetris
+    # package leaves the global random generator alone
+    random.seed(42)
+    if len(sys.argv) > 1:
+        # python tetris_game.py REPLAY watches a recorded game
+        run_replay(sys.argv[1])
+    else:
+        main()